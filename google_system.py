@@ -1,10 +1,13 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google.auth.oauthlib import flow
 from googleapiclient.discovery import build
 import pandas as pd
 
+from modules import http_client
+
 def get_credentials():
     creds = None
     if os.path.exists('token.json'):
@@ -24,18 +27,56 @@ def get_credentials():
 def get_drive_service(creds):
     return build('drive', 'v3', credentials=creds)
 
-def download_files_from_folder(drive_service, folder_id, download_path):
+def list_folder(drive_service, folder_id):
     query = f"'{folder_id}' in parents and trashed=false"
-    results = drive_service.files().list(q=query).execute()
-    files = results.get('files', [])
-    for file in files:
-        file_id = file['id']
-        file_name = file['name']
-        request = drive_service.files().get_media(fileId=file_id)
-        file_path = f"{download_path}/{file_name}"
+    files, page_token = [], None
+    while True:
+        results = drive_service.files().list(
+            q=query, pageSize=1000, pageToken=page_token,
+            fields="nextPageToken, files(id, name)").execute()
+        files.extend(results.get('files', []))
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return files
+
+def _download(creds, file, download_path):
+    file_path = f"{download_path}/{file['name']}"
+    resp = http_client.get(f"https://www.googleapis.com/drive/v3/files/{file['id']}?alt=media",
+                           headers={"Authorization": f"Bearer {creds.token}"}, stream=True)
+    try:
+        if resp.status_code != 200:
+            raise RuntimeError(f"HTTP {resp.status_code}: {resp.text[:200]}")
         with open(file_path, 'wb') as f:
-            f.write(request.execute())
-        print(f"Downloaded {file_name} to {file_path}")
+            for chunk in resp.iter_bytes():
+                f.write(chunk)
+    finally:
+        resp.close()
+    return file_path
+
+def download_files_from_folder(drive_service, folder_id, download_path, creds=None, workers=4):
+    """Download every file in a Drive folder.
+
+    With *creds*, files are fetched *workers* at a time over the shared
+    keep-alive pool; without, one by one through the API client.
+    """
+    files = list_folder(drive_service, folder_id)
+    if creds is None:
+        for file in files:
+            request = drive_service.files().get_media(fileId=file['id'])
+            file_path = f"{download_path}/{file['name']}"
+            with open(file_path, 'wb') as f:
+                f.write(request.execute())
+            print(f"Downloaded {file['name']} to {file_path}")
+        return
+    if not creds.valid:
+        creds.refresh(Request())
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_download, creds, file, download_path): file for file in files}
+        for future, file in futures.items():
+            try:
+                print(f"Downloaded {file['name']} to {future.result()}")
+            except Exception as e:
+                print(f"Failed to download {file['name']}: {e}")
 
 def process_files(local_path):
     # Your processing logic here
@@ -57,5 +98,5 @@ if __name__ == "__main__":
         download_path = './downloads'
         os.makedirs(download_path, exist_ok=True)
 
-        download_files_from_folder(drive_service, folder_id, download_path)
+        download_files_from_folder(drive_service, folder_id, download_path, creds)
         process_files(download_path)
@@ -0,0 +1,250 @@
+"""
+Pluggable AI backends.
+
+Every backend offers the same four operations:
+
+    chat(messages, model, temperature, timeout)   -> reply text
+    stream(messages, model, temperature, timeout) -> iterator of text fragments
+    image(prompt, size, n, timeout)               -> list of image bytes (PNG/JPEG)
+    embed(texts, timeout)                         -> list of float vectors
+
+`OpenAIBackend` uses the openai 0.28 SDK, `HTTPBackend` talks to any
+OpenAI-compatible server (including modules/mock_ai_server.py) and
+`FakeBackend` answers in-process with configurable latency and errors, so the
+ASK/IMAGE pipeline can be exercised without a network.
+"""
+import base64
+import json
+import os
+import random
+import struct
+import time
+import zlib
+
+from modules import http_client
+from modules.logger import Logger
+
+
+class BackendError(Exception):
+    """Error from a backend, carrying the HTTP status and headers when known."""
+
+    def __init__(self, message, http_status=None, headers=None):
+        super().__init__(message)
+        self.http_status = http_status
+        self.headers = headers or {}
+
+
+class AIBackend:
+    name = "base"
+    requires_key = False
+    image_model = "dall-e-2"
+
+    def set_api_key(self, key: str):
+        self.api_key = key
+
+    def chat(self, messages, model, temperature=0.7, timeout=None) -> str:
+        raise NotImplementedError
+
+    def stream(self, messages, model, temperature=0.7, timeout=None):
+        yield self.chat(messages, model, temperature, timeout)
+
+    def image(self, prompt, size="512x512", n=1, timeout=None) -> list:
+        raise NotImplementedError
+
+    def embed(self, texts, timeout=None) -> list:
+        raise NotImplementedError
+
+
+class OpenAIBackend(AIBackend):
+    name = "openai"
+    requires_key = True
+
+    def __init__(self, api_key=None, embed_model="text-embedding-3-small"):
+        import openai
+        self.openai = openai
+        # Keep-alive connections shared with every other outbound call
+        openai.requestssession = http_client.session()
+        self.embed_model = embed_model
+        self.api_key = None
+        if api_key:
+            self.set_api_key(api_key)
+
+    def set_api_key(self, key: str):
+        self.api_key = key
+        self.openai.api_key = key
+
+    def chat(self, messages, model, temperature=0.7, timeout=None) -> str:
+        resp = self.openai.ChatCompletion.create(
+            model=model, messages=messages, temperature=temperature, request_timeout=timeout,
+        )
+        return resp["choices"][0]["message"]["content"]
+
+    def stream(self, messages, model, temperature=0.7, timeout=None):
+        for chunk in self.openai.ChatCompletion.create(
+            model=model, messages=messages, temperature=temperature,
+            stream=True, request_timeout=timeout,
+        ):
+            delta = chunk["choices"][0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+    def image(self, prompt, size="512x512", n=1, timeout=None) -> list:
+        resp = self.openai.Image.create(prompt=prompt, n=n, size=size, request_timeout=timeout)
+        return [http_client.get(d["url"], timeout=timeout).content for d in resp["data"]]
+
+    def embed(self, texts, timeout=None) -> list:
+        resp = self.openai.Embedding.create(model=self.embed_model, input=list(texts),
+                                            request_timeout=timeout)
+        return [d["embedding"] for d in resp["data"]]
+
+
+class HTTPBackend(AIBackend):
+    """Any server speaking the OpenAI REST API under *base_url* (e.g. http://host:8800/v1).
+
+    Requests go through the shared `http_client` pool; connection failures
+    and timeouts propagate as ConnectionError/TimeoutError so the retry
+    policy treats them as transient.
+    """
+
+    name = "http"
+
+    def __init__(self, base_url, api_key=None, embed_model="text-embedding-3-small"):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.embed_model = embed_model
+
+    def _post(self, path, payload, timeout, stream=False):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        resp = http_client.post(f"{self.base_url}{path}", json=payload, headers=headers,
+                                timeout=timeout, stream=stream)
+        if resp.status_code >= 400:
+            detail = resp.text[:200]
+            resp.close()
+            raise BackendError(f"{path}: HTTP {resp.status_code} {detail}",
+                               resp.status_code, resp.headers)
+        return resp
+
+    def chat(self, messages, model, temperature=0.7, timeout=None) -> str:
+        resp = self._post("/chat/completions",
+                          {"model": model, "messages": messages, "temperature": temperature},
+                          timeout)
+        return resp.json()["choices"][0]["message"]["content"]
+
+    def stream(self, messages, model, temperature=0.7, timeout=None):
+        resp = self._post("/chat/completions",
+                          {"model": model, "messages": messages, "temperature": temperature,
+                           "stream": True},
+                          timeout, stream=True)
+        try:
+            for line in resp.iter_lines():
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+        finally:
+            resp.close()
+
+    def image(self, prompt, size="512x512", n=1, timeout=None) -> list:
+        resp = self._post("/images/generations",
+                          {"prompt": prompt, "size": size, "n": n, "response_format": "b64_json"},
+                          timeout)
+        return [base64.b64decode(d["b64_json"]) for d in resp.json()["data"]]
+
+    def embed(self, texts, timeout=None) -> list:
+        resp = self._post("/embeddings", {"model": self.embed_model, "input": list(texts)}, timeout)
+        return [d["embedding"] for d in resp.json()["data"]]
+
+
+def _png(width: int, height: int, rgb) -> bytes:
+    """A solid-colour PNG, built by hand so the fake backend needs no Pillow."""
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+    row = b"\x00" + bytes(rgb) * width
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(row * height))
+            + chunk(b"IEND", b""))
+
+
+class FakeBackend(AIBackend):
+    """In-process stand-in with configurable latency, jitter and error rate.
+
+    Replies are deterministic for a given prompt; streaming emits one word
+    per `1 / tokens_per_sec` seconds after the initial latency.
+    """
+
+    name = "fake"
+    image_model = "fake"
+
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, error_rate: float = 0.0,
+                 tokens_per_sec: float = 40.0, reply_words: int = 60, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.tokens_per_sec = tokens_per_sec
+        self.reply_words = reply_words
+        self.api_key = None
+        self._rng = random.Random(seed)
+
+    def _wait(self):
+        time.sleep(max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter)))
+        if self._rng.random() < self.error_rate:
+            status = self._rng.choice((429, 500, 503))
+            raise BackendError(f"fake backend error {status}", status,
+                               {"Retry-After": "1"} if status == 429 else {})
+
+    def _reply(self, messages) -> str:
+        prompt = messages[-1]["content"]
+        words = prompt.split() or ["..."]
+        seed = zlib.crc32(prompt.encode("utf-8"))
+        return " ".join(words[(seed + i) % len(words)] for i in range(self.reply_words))
+
+    def chat(self, messages, model, temperature=0.7, timeout=None) -> str:
+        self._wait()
+        return self._reply(messages)
+
+    def stream(self, messages, model, temperature=0.7, timeout=None):
+        self._wait()
+        for i, word in enumerate(self._reply(messages).split()):
+            time.sleep(1.0 / self.tokens_per_sec)
+            yield word if i == 0 else " " + word
+
+    def image(self, prompt, size="512x512", n=1, timeout=None) -> list:
+        self._wait()
+        width, height = (int(x) for x in size.split("x"))
+        seed = zlib.crc32(prompt.encode("utf-8"))
+        return [_png(width, height, ((seed >> 16) & 255, (seed >> 8) & 255, (seed + i * 40) & 255))
+                for i in range(n)]
+
+    def embed(self, texts, timeout=None) -> list:
+        from modules.semantic_cache import embed
+        self._wait()
+        return [embed(t).tolist() for t in texts]
+
+
+def backend_from_env(logger=None) -> AIBackend:
+    """Pick a backend from PIKIT_AI_BACKEND (openai | http | fake).
+
+    `http` reads PIKIT_AI_BASE_URL (default http://127.0.0.1:8800/v1);
+    `fake` reads PIKIT_FAKE_LATENCY, PIKIT_FAKE_JITTER and PIKIT_FAKE_ERROR_RATE.
+    """
+    logger = logger or Logger()
+    kind = os.environ.get("PIKIT_AI_BACKEND", "openai").lower()
+    if kind == "http":
+        url = os.environ.get("PIKIT_AI_BASE_URL", "http://127.0.0.1:8800/v1")
+        logger.info(f"Using OpenAI-compatible HTTP backend at {url}")
+        return HTTPBackend(url, os.environ.get("PIKIT_AI_API_KEY"))
+    if kind == "fake":
+        logger.info("Using in-process fake AI backend")
+        return FakeBackend(
+            latency=float(os.environ.get("PIKIT_FAKE_LATENCY", 0.3)),
+            jitter=float(os.environ.get("PIKIT_FAKE_JITTER", 0.1)),
+            error_rate=float(os.environ.get("PIKIT_FAKE_ERROR_RATE", 0.0)),
+        )
+    return OpenAIBackend()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Load-test the ASK and IMAGE paths against whichever backend
+PIKIT_AI_BACKEND selects (use `fake` or `http` + mock_ai_server offline).
+
+    PIKIT_AI_BACKEND=fake python -m modules.ai_bench --requests 200 --concurrency 16
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from modules import image_generator, image_pipeline
+from modules.ai_backends import backend_from_env
+from modules.ai_interface import AIInterface
+from modules.logger import Logger
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(kind, fn, count, concurrency):
+    """Call `fn(i)` *count* times on *concurrency* threads; return a stats dict."""
+    latencies, errors = [], 0
+
+    def timed(i):
+        start = time.perf_counter()
+        fn(i)
+        return time.perf_counter() - start
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in as_completed([pool.submit(timed, i) for i in range(count)]):
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    wall = time.perf_counter() - began
+    return {
+        "kind": kind,
+        "requests": count,
+        "errors": errors,
+        "wall": wall,
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "mean": statistics.mean(latencies) if latencies else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def report(stats):
+    print(f"{stats['kind']:<6} {stats['requests']:>5} req  {stats['errors']:>4} err  "
+          f"{stats['throughput']:7.1f} req/s  mean {stats['mean'] * 1000:7.1f} ms  "
+          f"p50 {stats['p50'] * 1000:7.1f}  p95 {stats['p95'] * 1000:7.1f}  "
+          f"p99 {stats['p99'] * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ASK/IMAGE pipeline")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--images", type=int, default=None, help="IMAGE requests (default: requests // 10)")
+    parser.add_argument("--stream", action="store_true", help="Stream ASK replies")
+    args = parser.parse_args()
+
+    logger = Logger()
+    ai = AIInterface(logger=logger, use_cache=False, backend=backend_from_env(logger))
+
+    def ask(i):
+        prompt = f"Please expand on this: benchmark question number {i}"
+        if args.stream:
+            return "".join(ai.query(prompt, stream=True))
+        return ai.query(prompt)
+
+    def image(i):
+        # The GUI's path: single-flight fetch over the shared HTTP session, then decode
+        data = image_generator.image_bytes(f"benchmark illustration {i}", "256x256",
+                                           backend=ai.backend, cache=False)
+        return image_pipeline.render(data, {image_pipeline.TILE: image_pipeline.TILE_BOX})
+
+    print(f"Backend: {ai.backend.name}, concurrency {args.concurrency}")
+    report(run("ASK", ask, args.requests, args.concurrency))
+    images = args.requests // 10 if args.images is None else args.images
+    if images:
+        report(run("IMAGE", image, images, args.concurrency))
+    print(f"Resilience: {ai.resilience.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
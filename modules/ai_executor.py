@@ -0,0 +1,185 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.ai_metrics import note_queue_wait
+from modules.logger import Logger
+
+
+class AIJobExecutor:
+    """Run slow calls (AI requests, file I/O, decoding) on a worker pool and hand results back to Tk.
+
+    Workers never touch widgets or the SQLite store: they push
+    `(job_id, kind, value)` onto a queue that the Tk main loop drains with
+    `after()`, and the `on_item` / `on_done` / `on_error` callbacks run there.
+    With a shared `TaskPump` (*pump*) results travel through its single
+    `after()` loop instead of one per executor. Errors of jobs without an
+    `on_error` go to *on_unhandled_error(label, exc)*, or the log.
+    """
+
+    def __init__(self, tk_root, max_workers: int = 5, poll_ms: int = 50, pump=None,
+                 on_unhandled_error=None, logger=None):
+        self.root = tk_root
+        self.poll_ms = poll_ms
+        self.pump = pump
+        self.on_unhandled_error = on_unhandled_error
+        self.logger = logger or Logger()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai-job")
+        self._results = queue.Queue()
+        self._ids = itertools.count(1)
+        self._jobs = {}          # job_id -> {"label", "future", "on_item", "on_done", "on_error"}
+        self._cancelled = set()
+        self._lock = threading.Lock()
+        self._polling = False
+        self._listeners = []
+
+    # ---------- public API ----------
+    def submit(self, fn, *args, on_done=None, on_error=None, on_cancel=None,
+               label: str = "", **kwargs) -> int:
+        return self._submit(self._run, fn, args, kwargs, None, on_done, on_error, on_cancel, label)
+
+    def submit_stream(self, fn, *args, on_item=None, on_done=None, on_error=None,
+                      on_cancel=None, label: str = "", **kwargs) -> int:
+        """Run an iterator-returning *fn*; each item reaches `on_item` on the main thread.
+
+        `on_done(None)` follows the last item.
+        """
+        return self._submit(self._run_stream, fn, args, kwargs, on_item, on_done, on_error,
+                            on_cancel, label)
+
+    def _submit(self, runner, fn, args, kwargs, on_item, on_done, on_error, on_cancel,
+                label) -> int:
+        job_id = next(self._ids)
+        with self._lock:
+            self._jobs[job_id] = {
+                "label": label, "future": None, "on_item": on_item,
+                "on_done": on_done, "on_error": on_error, "on_cancel": on_cancel,
+            }
+            self._jobs[job_id]["future"] = self._pool.submit(
+                runner, job_id, fn, args, kwargs, time.monotonic()
+            )
+        self.logger.info(f"AI job {job_id} queued: {label}")
+        self._notify()
+        if self.pump is None:
+            self._ensure_polling()
+        return job_id
+
+    def cancel(self, job_id: int) -> bool:
+        """Drop *job_id*: it never starts if still queued, and its result is discarded.
+
+        The job's `on_cancel()` runs, unless this is part of `shutdown()`.
+        """
+        return self._cancel(job_id, notify_job=True)
+
+    def _cancel(self, job_id: int, notify_job: bool) -> bool:
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                return False
+            self._cancelled.add(job_id)
+        if job["future"].cancel():
+            self._cancelled.discard(job_id)  # never started, nothing will report back
+        self.logger.info(f"AI job {job_id} cancelled")
+        if notify_job and job["on_cancel"]:
+            job["on_cancel"]()
+        self._notify()
+        return True
+
+    def cancel_all(self):
+        for job_id in list(self._jobs):
+            self.cancel(job_id)
+
+    def jobs(self) -> list:
+        """(job_id, label) for every job still in flight, oldest first."""
+        with self._lock:
+            return [(jid, job["label"]) for jid, job in sorted(self._jobs.items())]
+
+    def in_flight(self) -> int:
+        return len(self._jobs)
+
+    def add_listener(self, callback):
+        """Call `callback(in_flight)` on the main thread whenever the count changes."""
+        self._listeners.append(callback)
+
+    def shutdown(self):
+        for job_id in list(self._jobs):
+            self._cancel(job_id, notify_job=False)
+        self._pool.shutdown(wait=False)
+
+    # ---------- worker side ----------
+    def _put(self, job_id, kind, value):
+        if self.pump is not None:
+            self.pump.post(self._deliver, job_id, kind, value)
+        else:
+            self._results.put((job_id, kind, value))
+
+    def _run(self, job_id, fn, args, kwargs, submitted):
+        if job_id in self._cancelled:
+            return
+        note_queue_wait(time.monotonic() - submitted)
+        try:
+            self._put(job_id, "done", fn(*args, **kwargs))
+        except Exception as exc:
+            self._put(job_id, "error", exc)
+
+    def _run_stream(self, job_id, fn, args, kwargs, submitted):
+        if job_id in self._cancelled:
+            return
+        note_queue_wait(time.monotonic() - submitted)
+        try:
+            for item in fn(*args, **kwargs):
+                if job_id in self._cancelled:
+                    return
+                self._put(job_id, "item", item)
+            self._put(job_id, "done", None)
+        except Exception as exc:
+            self._put(job_id, "error", exc)
+
+    # ---------- main-thread side ----------
+    def _ensure_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._drain)
+
+    def _drain(self):
+        while True:
+            try:
+                job_id, kind, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._deliver(job_id, kind, value)
+        if self._jobs:
+            self.root.after(self.poll_ms, self._drain)
+        else:
+            self._polling = False
+
+    def _deliver(self, job_id, kind, value):
+        with self._lock:
+            if kind == "item":
+                job = self._jobs.get(job_id)
+            else:
+                self._cancelled.discard(job_id)
+                job = self._jobs.pop(job_id, None)
+        if job is None:
+            return  # cancelled while running
+        callback = job[f"on_{kind}"]
+        try:
+            if callback:
+                callback(value)
+            elif kind == "error":
+                self._unhandled(job, value)
+        except Exception as exc:
+            self._unhandled(job, exc)
+        if kind != "item":
+            self._notify()
+
+    def _unhandled(self, job, exc):
+        self.logger.error(f"Job {job['label']!r} failed: {exc}")
+        if self.on_unhandled_error:
+            self.on_unhandled_error(job["label"], exc)
+
+    def _notify(self):
+        for callback in self._listeners:
+            callback(len(self._jobs))
@@ -1,34 +1,189 @@
 import os
-import openai
+import time
+from modules.ai_backends import AIBackend, backend_from_env
+from modules.ai_metrics import AICallLog, take_queue_wait
+from modules.context_packer import count_tokens
 from modules.logger import Logger
+from modules.resilience import ResilientCaller, RetryPolicy, CircuitBreaker, CircuitOpenError
+from modules.response_cache import ResponseCache
+from modules.single_flight import SingleFlight
 
 
 class AIInterface:
     KEY_PATH = os.path.expanduser("~/openai.key")
 
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, cache: ResponseCache = None, use_cache: bool = True,
+                 timeout: float = 30.0, max_retries: int = 3,
+                 breaker_threshold: int = 5, breaker_reset: float = 30.0,
+                 backend: AIBackend = None, call_log: AICallLog = None):
         self.logger = logger or Logger()
         self.api_key = None
+        self.backend = backend or backend_from_env(self.logger)
+        self.model = "gpt-4o-mini"
+        self.temperature = 0.7
+        self.timeout = timeout
+        self.resilience = ResilientCaller(
+            RetryPolicy(max_retries=max_retries),
+            CircuitBreaker(breaker_threshold, breaker_reset),
+            logger=self.logger,
+        )
+        self.bypass_cache = False
+        self.inflight = SingleFlight()
+        # Pass call_log=False to stop recording per-call metrics
+        if call_log is None:
+            call_log = AICallLog(logger=self.logger)
+        self.call_log = call_log or None
+        self.cache = (cache or ResponseCache(logger=self.logger)) if use_cache else None
         if os.path.exists(self.KEY_PATH):
             self.set_api_key(open(self.KEY_PATH).read().strip())
 
     def set_api_key(self, key: str):
         self.api_key = key.strip()
-        openai.api_key = self.api_key
+        self.backend.set_api_key(self.api_key)
         self.logger.info("OpenAI API key set.")
 
-    def query(self, prompt: str) -> str:
-        if not self.api_key:
-            raise RuntimeError("OpenAI API key not set")
+    def query(self, prompt: str, bypass_cache: bool = None, stream: bool = False):
+        """Ask the model; replies are cached unless *bypass_cache* (or the
+        instance-wide `bypass_cache` flag) says to go to the API regardless.
+
+        With ``stream=True`` this returns an iterator of text fragments as the
+        model produces them instead of the finished reply.
+
+        Identical requests made while one is already in flight wait for it
+        and share its reply instead of calling the API again.
+        """
+        if bypass_cache is None:
+            bypass_cache = self.bypass_cache
+        started, queue_wait = time.monotonic(), take_queue_wait()
+        if stream:
+            return self._query_stream(prompt, bypass_cache, started, queue_wait)
+        messages = [{"role": "user", "content": prompt}]
+        cached, key = self._cached(messages, bypass_cache)
+        if cached is not None:
+            self._record("chat", prompt, cached, started, queue_wait, cache_hit=True)
+            return cached
+        self._check_key()
+        key = key or ResponseCache.make_key(self.model, messages, self.temperature)
+        leader = []
+        try:
+            reply = self.inflight.do(("chat", key), self._fetch, messages, key, leader)
+        except Exception as exc:
+            self._record("chat", prompt, "", started, queue_wait, leader=leader, error=exc)
+            raise
+        self._record("chat", prompt, reply, started, queue_wait, leader=leader)
+        return reply
+
+    def _fetch(self, messages, key, leader):
+        leader.append(True)
         try:
-            resp = openai.ChatCompletion.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-            )
-            reply = resp["choices"][0]["message"]["content"].strip()
+            reply = self.resilience.call(
+                self.backend.chat, messages, self.model, self.temperature, self.timeout
+            ).strip()
             self.logger.info(f"AI reply received ({len(reply)} chars)")
-            return reply
         except Exception as exc:
-            self.logger.error(f"OpenAI error: {exc}")
+            self.logger.error(f"{self.backend.name} error: {exc}")
             raise
+        self._store(messages, key, reply)
+        return reply
+
+    def _query_stream(self, prompt: str, bypass_cache: bool, started: float, queue_wait: float):
+        messages = [{"role": "user", "content": prompt}]
+        cached, key = self._cached(messages, bypass_cache)
+        if cached is not None:
+            self._record("stream", prompt, cached, started, queue_wait, cache_hit=True)
+            yield cached
+            return
+        self._check_key()
+        key = key or ResponseCache.make_key(self.model, messages, self.temperature)
+        leader, parts, first_at = [], [], None
+        try:
+            for fragment in self.inflight.stream(("stream", key), self._share_stream,
+                                                 messages, key, leader):
+                if first_at is None:
+                    first_at = time.monotonic()
+                parts.append(fragment)
+                yield fragment
+        except Exception as exc:
+            self._record("stream", prompt, "".join(parts), started, queue_wait,
+                         leader=leader, first_at=first_at, error=exc)
+            raise
+        self._record("stream", prompt, "".join(parts), started, queue_wait,
+                     leader=leader, first_at=first_at)
+
+    def _share_stream(self, messages, key, leader):
+        leader.append(True)
+        return self._fetch_stream(messages, key)
+
+    def _fetch_stream(self, messages, key):
+        parts = []
+        try:
+            # Only opening the stream (up to the first fragment) is retried;
+            # a stream that dies midway is not
+            first, rest = self.resilience.call(self._open_stream, messages)
+            if first is not None:
+                parts.append(first)
+                yield first
+            for delta in rest:
+                parts.append(delta)
+                yield delta
+        except Exception as exc:
+            self.logger.error(f"{self.backend.name} stream error: {exc}")
+            raise
+        reply = "".join(parts).strip()
+        self.logger.info(f"AI stream finished ({len(reply)} chars)")
+        self._store(messages, key, reply)
+
+    def _open_stream(self, messages):
+        fragments = self.backend.stream(messages, self.model, self.temperature, self.timeout)
+        return next(fragments, None), fragments
+
+    def _record(self, kind, prompt, reply, started, queue_wait, cache_hit=False,
+                leader=None, first_at=None, error=None):
+        if self.call_log is None:
+            return
+        now = time.monotonic()
+        coalesced = not cache_hit and not leader
+        self.call_log.record(
+            kind, self.model,
+            prompt_tokens=count_tokens(prompt),
+            completion_tokens=count_tokens(reply) if reply else 0,
+            queue_wait=queue_wait,
+            ttft=(first_at - started) if first_at else None,
+            latency=now - started,
+            retries=0 if cache_hit or coalesced else self.resilience.last_retries(),
+            cache_hit=cache_hit,
+            coalesced=coalesced,
+            error=str(error) if error else None,
+        )
+
+    def _check_key(self):
+        if self.backend.requires_key and not self.api_key:
+            raise RuntimeError("OpenAI API key not set")
+
+    def is_unreachable(self, exc) -> bool:
+        """True if *exc* means the backend could not be reached, so the request is worth retrying later."""
+        return isinstance(exc, CircuitOpenError) or self.resilience.policy.is_transient(exc)
+
+    def available(self) -> bool:
+        """False while the circuit breaker is refusing calls."""
+        return self.resilience.breaker.state != CircuitBreaker.OPEN
+
+    def metrics(self) -> dict:
+        """Retry, circuit-breaker and coalescing counters for this process."""
+        stats = self.resilience.metrics()
+        stats["coalesced"] = self.inflight.stats()["coalesced"]
+        return stats
+
+    def _cached(self, messages, bypass_cache):
+        """Return `(cached_reply_or_None, key)` for *messages*."""
+        if self.cache is None or bypass_cache:
+            return None, None
+        key = ResponseCache.make_key(self.model, messages, self.temperature)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.logger.info(f"AI reply served from cache ({len(cached)} chars)")
+        return cached, key
+
+    def _store(self, messages, key, reply):
+        if self.cache is not None:
+            self.cache.put(key, self.model, reply)
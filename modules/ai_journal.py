@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+from modules.logger import Logger
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class AIJournal:
+    """Append-only JSONL log of AI requests and their status changes.
+
+    `add()` writes the full request with its first status; every later
+    `mark()` appends a small ``{"id", "status", ...}`` line. Replaying the
+    file gives the latest state of each request, so nothing typed is lost if
+    the app dies or the network drops mid-request. Each line is fsynced
+    before the call returns.
+    """
+
+    def __init__(self, path: str = "storage/ai_journal.jsonl", compact_after: int = 500,
+                 logger=None):
+        self.path = path
+        self.logger = logger or Logger()
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        lines = self._load()
+        finished = sum(1 for e in self._entries.values() if e["status"] in (DONE, FAILED))
+        if finished > compact_after and finished * 2 > lines:
+            self.compact()
+        # Anything still "running" was cut off by a previous exit; try it again
+        for entry in list(self._entries.values()):
+            if entry["status"] == RUNNING:
+                self.mark(entry["id"], QUEUED, note="interrupted")
+
+    def _load(self) -> int:
+        lines = 0
+        if not os.path.exists(self.path):
+            return lines
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    self.logger.error(f"Skipping unreadable journal line {lines}")
+                    continue
+                self._entries.setdefault(record["id"], {}).update(record)
+        return lines
+
+    def _append(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def add(self, kind: str, status: str = QUEUED, **payload) -> str:
+        """Journal a new request (queued unless *status* says otherwise) and return its id."""
+        record = dict(payload, id=uuid.uuid4().hex[:12], kind=kind, status=status,
+                      created=time.time(), ts=time.time())
+        with self._lock:
+            self._append(record)
+            self._entries[record["id"]] = dict(record)
+        return record["id"]
+
+    def mark(self, entry_id: str, status: str, **extra):
+        record = dict(extra, id=entry_id, status=status, ts=time.time())
+        with self._lock:
+            if entry_id not in self._entries:
+                return
+            self._append(record)
+            self._entries[entry_id].update(record)
+
+    def get(self, entry_id: str):
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            return dict(entry) if entry else None
+
+    def pending(self, kind: str = None):
+        """Queued requests, oldest first."""
+        with self._lock:
+            entries = [dict(e) for e in self._entries.values()
+                       if e["status"] == QUEUED and (kind is None or e.get("kind") == kind)]
+        return sorted(entries, key=lambda e: e["created"])
+
+    def claim(self, kind: str = None, limit: int = 1):
+        """Mark up to *limit* of the oldest queued requests running and return them."""
+        entries = self.pending(kind)[:limit]
+        for entry in entries:
+            self.mark(entry["id"], RUNNING)
+        return entries
+
+    def counts(self) -> dict:
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for entry in self._entries.values():
+                counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
+
+    def compact(self):
+        """Rewrite the file keeping only requests that have not finished."""
+        with self._lock:
+            live = {i: e for i, e in self._entries.items() if e["status"] not in (DONE, FAILED)}
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for entry in live.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            dropped = len(self._entries) - len(live)
+            self._entries = live
+        self.logger.info(f"Compacted AI journal ({dropped} finished requests dropped)")
@@ -0,0 +1,161 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+
+from modules.logger import Logger
+
+# USD per million (prompt, completion) tokens; unknown models cost 0
+PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+HISTOGRAM_BOUNDS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16)
+
+_context = threading.local()
+
+
+def note_queue_wait(seconds: float):
+    """Tell the next AI call on this thread how long its job waited to start."""
+    _context.queue_wait = seconds
+
+
+def take_queue_wait() -> float:
+    wait = getattr(_context, "queue_wait", 0.0)
+    _context.queue_wait = 0.0
+    return wait
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def cost_of(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+class AICallLog:
+    """One row per AI call: tokens, queue wait, time to first token, latency,
+    retries and whether the cache (or an identical in-flight call) answered.
+
+    Rows are buffered and written *flush_every* at a time, and once more at
+    exit, so recording never adds a disk write to the request path.
+    """
+
+    COLUMNS = ("ts", "kind", "model", "prompt_tokens", "completion_tokens", "queue_wait",
+               "ttft", "latency", "retries", "cache_hit", "coalesced", "error")
+
+    def __init__(self, db_path="storage/ai_metrics.db", flush_every: int = 20, logger=None):
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.logger = logger or Logger()
+        self.flush_every = flush_every
+        self._buffer = []
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ai_calls ("
+            "ts REAL, kind TEXT, model TEXT, prompt_tokens INTEGER, completion_tokens INTEGER, "
+            "queue_wait REAL, ttft REAL, latency REAL, retries INTEGER, cache_hit INTEGER, "
+            "coalesced INTEGER, error TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ai_calls_ts ON ai_calls (ts)")
+        self.conn.commit()
+        atexit.register(self.flush)
+
+    def record(self, kind: str, model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+               queue_wait: float = 0.0, ttft: float = None, latency: float = 0.0,
+               retries: int = 0, cache_hit: bool = False, coalesced: bool = False,
+               error: str = None):
+        row = (time.time(), kind, model, prompt_tokens, completion_tokens, queue_wait,
+               latency if ttft is None else ttft, latency, retries, int(cache_hit),
+               int(coalesced), error)
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) < self.flush_every:
+                return
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            if rows:
+                self.conn.executemany(
+                    f"INSERT INTO ai_calls VALUES ({', '.join('?' * len(self.COLUMNS))})", rows
+                )
+                self.conn.commit()
+
+    def rows(self, since: float):
+        self.flush()
+        with self._lock:
+            cur = self.conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM ai_calls WHERE ts >= ? ORDER BY ts", (since,)
+            )
+            return [dict(zip(self.COLUMNS, row)) for row in cur]
+
+    def summary(self, days: int = 7) -> dict:
+        """Latency percentiles, histogram, hit rates and cost over the last *days*."""
+        rows = self.rows(time.time() - days * 86400)
+        upstream = [r for r in rows if not r["cache_hit"] and not r["coalesced"] and not r["error"]]
+        latencies = sorted(r["latency"] for r in upstream)
+        ttfts = sorted(r["ttft"] for r in upstream)
+        waits = sorted(r["queue_wait"] for r in rows)
+        histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        for value in latencies:
+            histogram[sum(value >= b for b in HISTOGRAM_BOUNDS)] += 1
+        per_day = {}
+        for r in upstream:
+            day = time.strftime("%Y-%m-%d", time.localtime(r["ts"]))
+            d = per_day.setdefault(day, {"calls": 0, "prompt_tokens": 0,
+                                         "completion_tokens": 0, "cost": 0.0})
+            d["calls"] += 1
+            d["prompt_tokens"] += r["prompt_tokens"]
+            d["completion_tokens"] += r["completion_tokens"]
+            d["cost"] += cost_of(r["model"], r["prompt_tokens"], r["completion_tokens"])
+        return {
+            "calls": len(rows),
+            "upstream": len(upstream),
+            "cache_hits": sum(r["cache_hit"] for r in rows),
+            "coalesced": sum(r["coalesced"] for r in rows),
+            "errors": sum(1 for r in rows if r["error"]),
+            "retries": sum(r["retries"] for r in rows),
+            "latency": {p: percentile(latencies, p) for p in (50, 95, 99)},
+            "ttft": {p: percentile(ttfts, p) for p in (50, 95, 99)},
+            "queue_wait": {p: percentile(waits, p) for p in (50, 95, 99)},
+            "histogram": histogram,
+            "per_day": per_day,
+        }
+
+
+def format_summary(s: dict, days: int) -> str:
+    """Text report of `AICallLog.summary()` for the STATS command."""
+    lines = [
+        f"AI calls, last {days} days: {s['calls']} total, {s['upstream']} to the API, "
+        f"{s['cache_hits']} cached, {s['coalesced']} coalesced, {s['errors']} failed, "
+        f"{s['retries']} retries",
+    ]
+    for label, key in (("Latency", "latency"), ("First token", "ttft"), ("Queue wait", "queue_wait")):
+        p = s[key]
+        lines.append(f"{label:<12} p50 {p[50]:6.2f}s  p95 {p[95]:6.2f}s  p99 {p[99]:6.2f}s")
+    lines.append("Latency histogram:")
+    peak = max(s["histogram"]) or 1
+    edges = ("0",) + tuple(f"{b:g}" for b in HISTOGRAM_BOUNDS)
+    for i, count in enumerate(s["histogram"]):
+        label = f"{edges[i]}-{HISTOGRAM_BOUNDS[i]:g}s" if i < len(HISTOGRAM_BOUNDS) else f">{edges[i]}s"
+        lines.append(f"  {label:>9} {count:6d} {'#' * round(40 * count / peak)}")
+    lines.append("Cost per day (estimated tokens):")
+    for day, d in sorted(s["per_day"].items()):
+        lines.append(f"  {day}  {d['calls']:5d} calls  {d['prompt_tokens']:8d} in  "
+                     f"{d['completion_tokens']:8d} out  ${d['cost']:.4f}")
+    return "\n".join(lines)
@@ -0,0 +1,192 @@
+import re
+import time
+from collections import deque
+
+from modules.link_validator import LINK_PATTERN
+from modules.logger import Logger
+
+_HEADING = re.compile(r"^#{1,6}\s+(.+?)\s*#*\s*$", re.MULTILINE)
+_BOLD = re.compile(r"\*\*([^*\n]{3,80})\*\*")
+
+
+def headings(body: str):
+    """Text of every markdown heading in *body*, in order."""
+    return _HEADING.findall(body or "")
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: finds every occurrence of every pattern in one pass."""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]   # node -> [(pattern_length, value)]
+        self._built = False
+
+    def add(self, pattern: str, value):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), value))
+        self._built = False
+
+    def build(self):
+        """Compute failure links breadth-first; call after the last `add()`."""
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[child] = self._goto[f].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+        self._built = True
+        return self
+
+    def finditer(self, text: str):
+        """Yield `(start, end, value)` for every match, in order of end position."""
+        if not self._built:
+            self.build()
+        node = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, value in out[node]:
+                yield i + 1 - length, i + 1, value
+
+    def __len__(self):
+        return len(self._goto) - 1
+
+
+def _fold(text: str) -> str:
+    """Lower-case *text* without changing its length, so offsets stay valid."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class LocalAutolinker:
+    """Suggest `[text](doc:N)` links by matching document titles and key phrases.
+
+    Phrases are every document title plus its markdown headings and
+    **bold** terms. Titles shared by several documents (e.g. "AI Response")
+    are ambiguous and skipped. Matching is case-insensitive, whole-word,
+    leftmost-longest, never inside an existing link and at most once per
+    target per document.
+    """
+
+    def __init__(self, doc_store, min_length: int = 4, logger=None):
+        self.doc_store = doc_store
+        self.min_length = min_length
+        self.logger = logger or Logger()
+        self.matcher = None
+
+    def _phrases(self):
+        owners = {}
+        for doc_id in self.doc_store.document_ids():
+            doc = self.doc_store.get_document(doc_id)
+            body = doc["body"] or ""
+            phrases = {doc["title"] or ""}
+            phrases.update(headings(body))
+            phrases.update(_BOLD.findall(body))
+            for phrase in phrases:
+                phrase = _fold(" ".join(phrase.split()))
+                if len(phrase) >= self.min_length and "[" not in phrase and "]" not in phrase:
+                    owners.setdefault(phrase, set()).add(doc_id)
+        return {p: ids.pop() for p, ids in owners.items() if len(ids) == 1}
+
+    def build(self):
+        started = time.perf_counter()
+        phrases = self._phrases()
+        matcher = AhoCorasick()
+        for phrase, doc_id in phrases.items():
+            matcher.add(phrase, doc_id)
+        self.matcher = matcher.build()
+        self.logger.info(
+            f"Autolink automaton: {len(phrases)} phrases, {len(matcher)} states "
+            f"in {time.perf_counter() - started:.3f}s"
+        )
+        return self
+
+    def suggest(self, doc_id: int, body: str):
+        """Proposed links for *body* as dicts with start, end, text and target_id."""
+        if self.matcher is None:
+            self.build()
+        existing = list(LINK_PATTERN.finditer(body))
+        linked = [(m.start(), m.end()) for m in existing]
+        folded = _fold(body)
+        candidates = []
+        for start, end, target in self.matcher.finditer(folded):
+            if target == doc_id:
+                continue
+            if (start and body[start - 1].isalnum()) or (end < len(body) and body[end].isalnum()):
+                continue
+            if any(s < end and start < e for s, e in linked):
+                continue
+            candidates.append((start, end, target))
+        # Leftmost-longest, non-overlapping, one link per target (counting existing ones)
+        candidates.sort(key=lambda c: (c[0], c[0] - c[1]))
+        chosen, last_end, seen = [], 0, {int(m.group(2)) for m in existing}
+        for start, end, target in candidates:
+            if start < last_end or target in seen:
+                continue
+            chosen.append({"start": start, "end": end, "text": body[start:end], "target_id": target})
+            last_end = end
+            seen.add(target)
+        return chosen
+
+    @staticmethod
+    def apply(body: str, suggestions) -> str:
+        """*body* with every suggestion wrapped as `[text](doc:N)`."""
+        parts, pos = [], 0
+        for s in sorted(suggestions, key=lambda s: s["start"]):
+            parts.append(body[pos:s["start"]])
+            parts.append(f"[{s['text']}](doc:{s['target_id']})")
+            pos = s["end"]
+        parts.append(body[pos:])
+        return "".join(parts)
+
+    def link_all(self, doc_ids, write: bool = True, batch_size: int = 200) -> dict:
+        """Suggest (and with *write*, apply) links across *doc_ids*.
+
+        Updated bodies are written `batch_size` documents per transaction.
+        """
+        if self.matcher is None:
+            self.build()
+        stats = {"documents": 0, "changed": 0, "links": 0}
+        pending = []
+        started = time.perf_counter()
+        for doc_id in doc_ids:
+            doc = self.doc_store.get_document(doc_id)
+            if not doc:
+                continue
+            stats["documents"] += 1
+            body = doc["body"] or ""
+            suggestions = self.suggest(doc_id, body)
+            if not suggestions:
+                continue
+            stats["changed"] += 1
+            stats["links"] += len(suggestions)
+            if write:
+                pending.append((doc_id, self.apply(body, suggestions)))
+                if len(pending) >= batch_size:
+                    self.doc_store.update_documents(pending)
+                    pending = []
+        if pending:
+            self.doc_store.update_documents(pending)
+        stats["seconds"] = time.perf_counter() - started
+        return stats
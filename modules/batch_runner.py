@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from modules.ai_metrics import note_queue_wait
+from modules.logger import Logger
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough OpenAI token count (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at *rate_per_min*."""
+
+    def __init__(self, rate_per_min: float, capacity: float = None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity or rate_per_min
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0):
+        """Block until *amount* tokens are available, then take them."""
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait_for = (amount - self.tokens) / self.rate
+            time.sleep(wait_for)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits applied together."""
+
+    def __init__(self, rpm: float = 60, tpm: float = 90000):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def acquire(self, tokens: int):
+        self.requests.acquire(1)
+        self.tokens.acquire(tokens)
+
+
+class Checkpoint:
+    """Set of finished item ids, persisted to a JSON file after every flush."""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.done = set(json.load(f).get("done", []))
+
+    def update(self, ids):
+        self.done.update(ids)
+        if not self.path:
+            return
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"done": sorted(self.done)}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        self.done = set()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BatchRunner:
+    """Apply *work_fn* to many documents with bounded concurrency.
+
+    Workers only run `work_fn(text)`. Loading text via `load_fn(item_id)`,
+    flushing results via `on_flush([(item_id, result), ...])` and
+    checkpointing all happen on the calling thread, so SQLite connections
+    never cross threads. At most `2 * max_workers` items are in flight, so
+    input is loaded only as fast as it is consumed.
+
+    With *pass_limiter*, `work_fn(text, limiter)` gets the `RateLimiter` and
+    charges each of its own API calls, for work that makes several per item.
+    """
+
+    def __init__(self, work_fn, max_workers: int = 4, rpm: float = 60, tpm: float = 90000,
+                 checkpoint_path: str = None, flush_every: int = 25, pass_limiter: bool = False,
+                 logger=None):
+        self.work_fn = work_fn
+        self.pass_limiter = pass_limiter
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rpm, tpm)
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.flush_every = flush_every
+        self.logger = logger or Logger()
+
+    def _call(self, text, submitted):
+        if self.pass_limiter:
+            note_queue_wait(time.monotonic() - submitted)
+            return self.work_fn(text, self.limiter)
+        self.limiter.acquire(estimate_tokens(text))
+        # Time spent waiting for a worker and for the rate limiter
+        note_queue_wait(time.monotonic() - submitted)
+        return self.work_fn(text)
+
+    def run(self, item_ids, load_fn, on_flush, on_failure=None) -> dict:
+        """Process *item_ids*, skipping ids already checkpointed.
+
+        `load_fn(item_id)` returns the text to work on, or None to skip it.
+        `on_failure(item_id, exc)` is called, on this thread, for each item whose work failed.
+        """
+        stats = {"done": 0, "failed": 0, "skipped": 0}
+        pending = {}
+        results = []
+        items = iter(item_ids)
+
+        def flush():
+            if results:
+                on_flush(list(results))
+                self.checkpoint.update(item_id for item_id, _ in results)
+                results.clear()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch") as pool:
+            try:
+                self._loop(pool, items, load_fn, pending, results, stats, flush, on_failure)
+            finally:
+                # Keep whatever finished before an interrupt; the rest is redone on resume
+                for future in pending:
+                    future.cancel()
+                flush()
+        self.logger.info(
+            f"Batch finished: {stats['done']} done, {stats['failed']} failed, "
+            f"{stats['skipped']} already done"
+        )
+        return stats
+
+    def _loop(self, pool, items, load_fn, pending, results, stats, flush, on_failure):
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < 2 * self.max_workers:
+                try:
+                    item_id = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if item_id in self.checkpoint.done:
+                    stats["skipped"] += 1
+                    continue
+                text = load_fn(item_id)
+                if text is None:
+                    stats["skipped"] += 1
+                    continue
+                pending[pool.submit(self._call, text, time.monotonic())] = item_id
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                item_id = pending.pop(future)
+                try:
+                    results.append((item_id, future.result()))
+                    stats["done"] += 1
+                except Exception as exc:
+                    stats["failed"] += 1
+                    self.logger.error(f"Batch item {item_id} failed: {exc}")
+                    if on_failure:
+                        on_failure(item_id, exc)
+            if len(results) >= self.flush_every:
+                flush()
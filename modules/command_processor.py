@@ -1,12 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import openai
+from modules.ai_journal import AIJournal, DONE, FAILED, QUEUED, RUNNING
+from modules.context_packer import ContextPacker
 from modules.logger import Logger
 from modules.document_store import DocumentStore
+from modules.semantic_cache import SemanticCache
+
+
+class StreamingReply:
+    """Accumulate a streamed AI reply for one document.
+
+    Fragments are kept in memory and written to the store only every
+    *checkpoint_secs* and once more by `finish()`, not per token.
+    """
+
+    def __init__(self, doc_store, doc_id: int, checkpoint_secs: float = 2.0, logger=None):
+        self.doc_store = doc_store
+        self.doc_id = doc_id
+        self.checkpoint_secs = checkpoint_secs
+        self.logger = logger or Logger()
+        self.parts = []
+        self.started = time.monotonic()
+        self.first_token_at = None
+        self._last_checkpoint = self.started
+
+    def append(self, fragment: str):
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+            self.logger.info(f"First token after {self.first_token_at - self.started:.2f}s")
+        self.parts.append(fragment)
+        if time.monotonic() - self._last_checkpoint >= self.checkpoint_secs:
+            self.doc_store.update_document(self.doc_id, "".join(self.parts))
+            self._last_checkpoint = time.monotonic()
+
+    def finish(self) -> str:
+        text = "".join(self.parts).strip()
+        self.doc_store.update_document(self.doc_id, text)
+        return text
+
+    @property
+    def latency(self) -> float:
+        return time.monotonic() - self.started
+
 
 class CommandProcessor:
-    def __init__(self, store: DocumentStore, ai_interface, logger=None):
+    QUEUED_PLACEHOLDER = "(Queued: this will be answered when the AI backend is reachable again.)"
+
+    def __init__(self, store: DocumentStore, ai_interface, logger=None, semantic_cache=None,
+                 journal=None, context_budget: int = 600):
         self.doc_store = store
         self.ai = ai_interface
         self.logger = logger if logger else Logger()
+        # Tokens of linked-document context added to ASK prompts; 0 turns it off
+        self.context_budget = context_budget
+        self.packer = ContextPacker(store, logger=self.logger)
+        # Pass semantic_cache=False to turn near-duplicate detection off
+        if semantic_cache is None:
+            semantic_cache = SemanticCache(logger=self.logger)
+        self.semantic_cache = semantic_cache or None
+        # Pass journal=False to stop journaling (and queueing) ASKs
+        if journal is None:
+            journal = AIJournal(logger=self.logger)
+        self.journal = journal or None
 
     def ask_question(self, prompt: str) -> str:
         try:
@@ -22,44 +79,301 @@ class CommandProcessor:
                  on_success, on_link_created,
                  prefix: str = None,
                  sel_start: int = None,
-                 sel_end: int = None):
-        if prefix:
-            prompt = f"{prefix} {selected_text}"
-        else:
-            prompt = f"Please expand on this: {selected_text}"
+                 sel_end: int = None,
+                 stream: bool = False,
+                 on_token=None,
+                 on_error=None,
+                 on_queued=None,
+                 context_budget: int = None):
+        """Ask the AI about *selected_text*, store the reply and link it.
+
+        Failures are logged and handed to `on_error(exc)` when given, so the
+        caller can tell the user instead of the request silently vanishing.
+        If the backend is unreachable the request stays in the journal and
+        `on_queued(entry_id)` is called instead; see `flush_queue()`.
+        *context_budget* overrides `self.context_budget` for this request.
+        """
+        prompt = self.build_prompt(selected_text, prefix, current_doc_id, context_budget)
         self.logger.info(f"Sending prompt: {prompt}")
 
+        if stream:
+            writer = self.start_streamed_reply(selected_text, current_doc_id,
+                                               on_link_created, sel_start, sel_end)
+            entry_id = self.journal_ask(selected_text, current_doc_id, prefix,
+                                        sel_start, sel_end, answer_id=writer.doc_id,
+                                        prompt=prompt)
+            try:
+                for fragment in self.ai.query(prompt, stream=True):
+                    writer.append(fragment)
+                    if on_token:
+                        on_token(fragment)
+            except Exception as e:
+                self.logger.error(f"AI stream failed: {e}")
+                writer.finish()
+                self._report_failure(entry_id, e, on_error, on_queued, writer.doc_id,
+                                     current_doc_id)
+                return
+            self.finish_streamed_reply(writer, selected_text, on_success, prefix)
+            self.journal_done(entry_id, writer.doc_id)
+            return
+
+        entry_id = self.journal_ask(selected_text, current_doc_id, prefix, sel_start, sel_end,
+                                    prompt=prompt)
         try:
-            reply = self.ai.query(prompt)
+            reply, latency = self.run_query(prompt)
         except Exception as e:
             self.logger.error(f"AI query failed: {e}")
+            self._report_failure(entry_id, e, on_error, on_queued)
             return
         self.logger.info("AI query successful")
+        new_doc_id = self.complete_query(reply, selected_text, current_doc_id,
+                                         on_success, on_link_created, sel_start, sel_end,
+                                         prefix=prefix, latency=latency)
+        self.journal_done(entry_id, new_doc_id)
 
-        new_doc_id = self.doc_store.add_document("AI Response", reply)
-        self.logger.info(f"Created new document {new_doc_id}")
-        original = self.doc_store.get_document(current_doc_id)
-        if original:
-            # sqlite3.Row behaves like a mapping (dict-like) but has no .get()
-            body = original["body"] if isinstance(original, (dict,)) else original[2]
+    def _report_failure(self, entry_id, exc, on_error, on_queued, answer_id=None,
+                        source_id=None):
+        if self.defer_ask(entry_id, exc, answer_id):
+            if on_queued:
+                on_queued(entry_id)
+            return
+        if answer_id:
+            self.discard_reply(source_id, answer_id)
+        if on_error:
+            on_error(exc)
+
+    # ───────── request journal / offline queue ─────────
+    def journal_ask(self, selected_text: str, current_doc_id: int, prefix: str = None,
+                    sel_start: int = None, sel_end: int = None, answer_id: int = None,
+                    prompt: str = None):
+        """Journal an ASK as running before it is sent; returns its entry id (or None).
+
+        *current_doc_id* may be None for a standalone question with nothing to link.
+        """
+        if self.journal is None:
+            return None
+        return self.journal.add(
+            "ask", status=RUNNING, prompt=prompt or self.build_prompt(selected_text, prefix),
+            selected_text=selected_text, doc_id=current_doc_id, prefix=prefix,
+            sel_start=sel_start, sel_end=sel_end, answer_id=answer_id,
+        )
+
+    def journal_done(self, entry_id, answer_id: int):
+        if self.journal is not None and entry_id:
+            self.journal.mark(entry_id, DONE, answer_id=answer_id)
+
+    def defer_ask(self, entry_id, exc, answer_id: int = None) -> bool:
+        """Keep a failed ASK queued if the backend was unreachable (True), else mark it failed.
+
+        A streamed ASK's empty answer document (*answer_id*) gets a
+        placeholder and is filled in when the request is replayed.
+        """
+        if self.journal is None or not entry_id:
+            return False
+        if not self.ai.is_unreachable(exc):
+            self.journal.mark(entry_id, FAILED, error=str(exc))
+            return False
+        self.journal.mark(entry_id, QUEUED, error=str(exc))
+        if answer_id:
+            self.doc_store.update_document(answer_id, self.QUEUED_PLACEHOLDER)
+        self.logger.info(f"AI backend unreachable; ASK {entry_id} queued for later")
+        return True
 
-            link_md = f"[{selected_text}](doc:{new_doc_id})"
-            if sel_start is not None and sel_end is not None and sel_start < sel_end <= len(body):
-                updated = body[:sel_start] + link_md + body[sel_end:]
-                self.logger.info(f"Embedded link at offsets {sel_start}-{sel_end}")
+    def cancel_ask(self, entry_id):
+        if self.journal is not None and entry_id:
+            self.journal.mark(entry_id, FAILED, error="cancelled")
+
+    def discard_reply(self, source_id: int, answer_id: int):
+        """Undo `start_streamed_reply` for an ASK that was cancelled or failed for good:
+        the link to *answer_id* in *source_id* is unwrapped and the answer deleted."""
+        if source_id:
+            self.doc_store.unwrap_links(source_id, answer_id)
+        self.doc_store.delete_document(answer_id)
+        self.logger.info(f"Discarded answer document {answer_id}")
+
+    def pending_asks(self):
+        return self.journal.pending("ask") if self.journal is not None else []
+
+    def claim_queued(self, limit: int = 1):
+        """Mark up to *limit* queued ASKs running and return them for replay."""
+        return self.journal.claim("ask", limit) if self.journal is not None else []
+
+    def complete_queued(self, entry: dict, reply: str, latency: float,
+                        on_success, on_link_created=None) -> int:
+        """Store the reply to a replayed ASK; the store-side half of `flush_queue`."""
+        answer_id = entry.get("answer_id")
+        if not entry.get("doc_id") or (answer_id and self.doc_store.get_document(answer_id)):
+            # Standalone question, or a streamed ASK whose linked answer already exists
+            if answer_id and self.doc_store.get_document(answer_id):
+                self.doc_store.update_document(answer_id, reply)
             else:
-                if selected_text in body:
-                    updated = body.replace(selected_text, link_md, 1)
-                    self.logger.info("Embedded link by substring replace")
-                else:
-                    updated = body
-                    self.logger.info("Selected text not found; no link embedded")
-            self.doc_store.update_document(current_doc_id, updated)
+                answer_id = self.doc_store.add_document("AI Response", reply)
+            if self.semantic_cache is not None:
+                self.semantic_cache.record(entry["selected_text"], answer_id, latency,
+                                           entry.get("prefix") or "")
+            on_success(answer_id)
         else:
-            self.logger.error(f"Original document {current_doc_id} not found")
+            answer_id = self.complete_query(
+                reply, entry["selected_text"], entry["doc_id"], on_success, on_link_created,
+                entry.get("sel_start"), entry.get("sel_end"),
+                prefix=entry.get("prefix"), latency=latency,
+            )
+        self.journal_done(entry["id"], answer_id)
+        return answer_id
+
+    def flush_queue(self, on_success=lambda _id: None, max_workers: int = 2) -> dict:
+        """Replay queued ASKs, *max_workers* at a time.
+
+        Workers only call the AI; replies are stored on the calling thread.
+        Stops sending new requests as soon as one finds the backend still
+        unreachable, leaving the rest queued.
+        """
+        stats = {"done": 0, "failed": 0, "queued": 0}
+        offline = False
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="replay") as pool:
+            running = {}
+            while True:
+                while not offline and len(running) < max_workers:
+                    claimed = self.claim_queued(1)
+                    if not claimed:
+                        break
+                    entry = claimed[0]
+                    running[pool.submit(self.run_query, entry["prompt"])] = entry
+                if not running:
+                    break
+                future = next(as_completed(running))
+                entry = running.pop(future)
+                try:
+                    reply, latency = future.result()
+                except Exception as exc:
+                    if self.defer_ask(entry["id"], exc):
+                        offline = True
+                        stats["queued"] += 1
+                    else:
+                        stats["failed"] += 1
+                    continue
+                self.complete_queued(entry, reply, latency, on_success)
+                stats["done"] += 1
+        stats["queued"] = len(self.pending_asks())
+        return stats
+
+    def run_query(self, prompt: str):
+        """Query the AI and return `(reply, seconds)`; safe to call off the main thread."""
+        started = time.monotonic()
+        reply = self.ai.query(prompt)
+        return reply, time.monotonic() - started
+
+    def find_similar(self, selected_text: str, prefix: str = None):
+        """An earlier answer to a near-identical question, if its document still exists."""
+        if self.semantic_cache is None:
+            return None
+        hit = self.semantic_cache.lookup(selected_text, prefix or "")
+        if hit and self.doc_store.get_document(hit["doc_id"]):
+            return hit
+        return None
+
+    def reuse_answer(self, hit: dict, selected_text: str, current_doc_id: int,
+                     on_success, on_link_created,
+                     sel_start: int = None, sel_end: int = None):
+        """Link the selection to the answer in *hit* instead of asking again."""
+        self.semantic_cache.mark_reused(hit)
+        self.embed_link(current_doc_id, selected_text, hit["doc_id"],
+                        on_link_created, sel_start, sel_end)
+        on_success(hit["doc_id"])
+        return hit["doc_id"]
+
+    def build_prompt(self, selected_text: str, prefix: str = None, doc_id: int = None,
+                     context_budget: int = None, packer: ContextPacker = None) -> str:
+        """The ASK prompt, preceded by relevant passages from *doc_id* and its
+        linked documents when a context budget is set."""
+        question = f"{prefix} {selected_text}" if prefix else f"Please expand on this: {selected_text}"
+        budget = self.context_budget if context_budget is None else context_budget
+        packer = packer or self.packer
+        context = packer.pack(selected_text, doc_id, budget) if doc_id and budget else ""
+        if not context:
+            return question
+        return f"Context from related documents:\n{context}\n\n{question}"
+
+    def build_prompt_in_worker(self, selected_text: str, prefix: str = None, doc_id: int = None,
+                               context_budget: int = None) -> str:
+        """`build_prompt` for a worker thread: the context is read through a
+        connection of its own, the store's belongs to the thread that opened it."""
+        store = DocumentStore(self.doc_store.db_path)
+        try:
+            packer = ContextPacker(store, self.packer.max_neighbours, self.packer.passage_tokens,
+                                   logger=self.logger)
+            return self.build_prompt(selected_text, prefix, doc_id, context_budget, packer)
+        finally:
+            store.close()
+
+    def complete_query(self, reply: str, selected_text: str, current_doc_id: int,
+                       on_success, on_link_created,
+                       sel_start: int = None, sel_end: int = None,
+                       prefix: str = None, latency: float = None):
+        """Store *reply* and link it from the source span.
 
-        on_link_created(selected_text)
+        This is the store-side half of `query_ai`; callers that run the AI
+        call off the main thread invoke it once the reply is back.
+        """
+        new_doc_id = self.doc_store.add_document("AI Response", reply)
+        self.logger.info(f"Created new document {new_doc_id}")
+        if self.semantic_cache is not None:
+            self.semantic_cache.record(selected_text, new_doc_id, latency or 0.0, prefix or "")
+        self.embed_link(current_doc_id, selected_text, new_doc_id,
+                        on_link_created, sel_start, sel_end)
         on_success(new_doc_id)
+        return new_doc_id
+
+    def start_streamed_reply(self, selected_text: str, current_doc_id: int,
+                             on_link_created=None,
+                             sel_start: int = None, sel_end: int = None,
+                             checkpoint_secs: float = 2.0) -> StreamingReply:
+        """Create the (empty) answer document up front and link to it."""
+        new_doc_id = self.doc_store.add_document("AI Response", "")
+        self.logger.info(f"Created new document {new_doc_id} for streamed reply")
+        self.embed_link(current_doc_id, selected_text, new_doc_id,
+                        on_link_created, sel_start, sel_end)
+        return StreamingReply(self.doc_store, new_doc_id, checkpoint_secs, self.logger)
+
+    def finish_streamed_reply(self, writer: StreamingReply, selected_text: str,
+                              on_success, prefix: str = None):
+        writer.finish()
+        if self.semantic_cache is not None:
+            self.semantic_cache.record(selected_text, writer.doc_id, writer.latency, prefix or "")
+        on_success(writer.doc_id)
+        return writer.doc_id
+
+    def embed_link(self, doc_id: int, selected_text: str, target_id: int,
+                   on_link_created=None, sel_start: int = None, sel_end: int = None):
+        """Wrap the selected span of *doc_id* in a link to *target_id*.
+
+        With selection offsets the span is patched in place by the store in a
+        single transaction; without them the first occurrence of the text is
+        used. `on_link_created(link_md, start)` fires only if the body changed.
+        """
+        if sel_start is None or sel_end is None or not sel_start < sel_end:
+            original = self.doc_store.get_document(doc_id)
+            if not original:
+                self.logger.error(f"Original document {doc_id} not found")
+                return None
+            # sqlite3.Row behaves like a mapping (dict-like) but has no .get()
+            body = original["body"] if isinstance(original, (dict,)) else original[2]
+            sel_start = body.find(selected_text)
+            if sel_start < 0:
+                self.logger.info("Selected text not found; no link embedded")
+                return None
+            sel_end = sel_start + len(selected_text)
+
+        link_md = self.doc_store.wrap_span_with_link(
+            doc_id, sel_start, sel_end, target_id, expected=selected_text
+        )
+        if link_md is None:
+            self.logger.info(f"Span {sel_start}-{sel_end} of doc {doc_id} changed; no link embedded")
+            return None
+        self.logger.info(f"Embedded link at offsets {sel_start}-{sel_end}")
+        if on_link_created:
+            on_link_created(link_md, sel_start)
+        return link_md
 
     def set_api_key(self, api_key: str):
         try:
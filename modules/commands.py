@@ -1,15 +1,121 @@
-import pandas as pd
+import hashlib
 import os
 import re
 from modules import logger, ai_interface
+from modules.ai_metrics import format_summary
+from modules.autolinker import LocalAutolinker
+from modules.batch_runner import BatchRunner
+from modules.summarizer import MapReduceSummarizer, extractive_summary
+
+valid_commands = ["NEW", "LIST", "VIEW", "EDIT", "SAVE", "LOAD", "FOLLOW", "LINKS", "ASK", "SUMMARIZE", "SETOPENAI", "HELP", "AUTOLINK", "LOGS", "STATS"]
+
+AUTOLINK_PROMPT = "Analyze this text and suggest hypertext links using Engelbart [[Text | Target]] syntax:\n"
+
+
+def run_batch(cmd, ids, doc_store, ai, summarizer, workers=4, restart=False, logger=None):
+    """Run SUMMARIZE or AUTOLINK over *ids* concurrently, resuming a prior run of the same ids.
+
+    Used by the `SUMMARIZE/AUTOLINK --all|--ids|--query` commands and by the
+    `summarize` / `autolink` subcommands of modules_cli.
+    """
+    if cmd == 'SUMMARIZE':
+        # Long documents take several calls; the summarizer charges each to the limiter
+        work = lambda text, limiter: summarizer.summarize(text, limiter=limiter)
+        on_flush = doc_store.save_summaries
+    else:
+        work = lambda text: ai.query(AUTOLINK_PROMPT + text)
+        on_flush = lambda rows: doc_store.append_to_documents(
+            [(doc_id, "\n" + text) for doc_id, text in rows]
+        )
+
+    def load(doc_id):
+        doc = doc_store.get_document(doc_id)
+        return doc['body'] if doc else None
+
+    run_key = hashlib.sha1(','.join(map(str, ids)).encode()).hexdigest()[:10]
+    runner = BatchRunner(
+        work,
+        max_workers=workers,
+        checkpoint_path=f"storage/batch_{cmd.lower()}_{run_key}.json",
+        pass_limiter=cmd == 'SUMMARIZE',
+        logger=logger,
+    )
+    if restart:
+        runner.checkpoint.clear()
+    stats = runner.run(ids, load, on_flush)
+    if not stats['failed']:
+        runner.checkpoint.clear()
+    print(f"{cmd}: {stats['done']} done, {stats['failed']} failed, {stats['skipped']} skipped "
+          f"(of {len(ids)})")
+    runner.logger.info(f"{cmd}: batch of {len(ids)}")
+    return stats
+
+
+def summarize_document(doc_store, summarizer, doc_id: int) -> str:
+    """Map-reduce summary of one document; raises KeyError if it does not exist."""
+    rec = doc_store.get_document(doc_id)
+    if rec is None:
+        raise KeyError(f"Document {doc_id} not found")
+    return summarizer.summarize(rec["body"] or "")
+
+
+def autolink_document(doc_store, ai, doc_id: int) -> str:
+    """Append the AI's link suggestions to one document and return them."""
+    rec = doc_store.get_document(doc_id)
+    if rec is None:
+        raise KeyError(f"Document {doc_id} not found")
+    suggestion = ai.query(AUTOLINK_PROMPT + (rec["body"] or ""))
+    doc_store.append_to_documents([(doc_id, "\n" + suggestion)])
+    return suggestion
+
+
+def summarize_local(doc_store, ids, count: int = 5) -> int:
+    """Store extractive summaries (no AI call) of *ids*; returns how many were summarized."""
+    rows, done = [], 0
+    for doc_id in ids:
+        doc = doc_store.get_document(doc_id)
+        if doc:
+            rows.append((doc_id, extractive_summary(doc['body'] or "", count)))
+            done += 1
+        if len(rows) >= 200:
+            doc_store.save_summaries(rows)
+            rows = []
+    if rows:
+        doc_store.save_summaries(rows)
+    print(f"SUMMARIZE --local: {done} of {len(ids)} documents summarized")
+    return done
+
+
+def autolink_local(doc_store, ids=None, doc_id: int = None, apply: bool = False, logger=None):
+    """Title/key-phrase autolinking without the AI over *ids*, or one *doc_id* (its
+    suggestions are listed); links are only written with *apply*."""
+    linker = LocalAutolinker(doc_store, logger=logger).build()
+    if ids is None:
+        doc = doc_store.get_document(doc_id)
+        if not doc:
+            print("Document not found.")
+            return
+        suggestions = linker.suggest(doc_id, doc['body'] or "")
+        for s in suggestions:
+            print(f"  @{s['start']}-{s['end']}: [{s['text']}](doc:{s['target_id']})")
+        if apply and suggestions:
+            doc_store.update_document(doc_id, linker.apply(doc['body'], suggestions))
+        print(f"{len(suggestions)} links {'added' if apply else 'suggested'}.")
+        ids = [doc_id]
+    else:
+        stats = linker.link_all(ids, write=apply)
+        print(f"AUTOLINK --local: {stats['links']} links in {stats['changed']} of "
+              f"{stats['documents']} documents {'added' if apply else 'suggested'} "
+              f"({stats['seconds'] * 1000:.0f} ms)")
+    linker.logger.info(f"AUTOLINK --local over {len(ids)} docs (apply={apply})")
 
-valid_commands = ["NEW", "LIST", "VIEW", "EDIT", "SAVE", "LOAD", "FOLLOW", "LINKS", "ASK", "SUMMARIZE", "SETOPENAI", "HELP", "AUTOLINK", "LOGS"]
 
 class CommandProcessor:
     def __init__(self, doc_store):
         self.doc_store = doc_store
         self.logger = logger.Logger()
         self.ai = ai_interface.AIInterface()
+        self.summarizer = MapReduceSummarizer(self.ai, logger=self.logger)
 
     def parse_links(self, body):
         engel_links = re.findall(r'\[\[(.*?)\|(.*?)\]\]', body)
@@ -18,6 +124,45 @@ class CommandProcessor:
         combined += [('M', text.strip(), target.strip()) for text, target in md_links]
         return combined
 
+    def _batch_ids(self, parts):
+        """Parse `--all`, `--ids 1,2,3` or `--query text` into document ids."""
+        if '--all' in parts:
+            return self.doc_store.document_ids()
+        if '--ids' in parts:
+            raw = parts[parts.index('--ids') + 1]
+            return [int(x) for x in raw.split(',') if x.strip()]
+        if '--query' in parts:
+            words = []
+            for word in parts[parts.index('--query') + 1:]:
+                if word.startswith('--'):
+                    break
+                words.append(word)
+            return self.doc_store.document_ids(' '.join(words))
+        return None
+
+    def _run_batch(self, cmd, parts, ids):
+        """Run SUMMARIZE / AUTOLINK over *ids* concurrently, resuming a prior run."""
+        workers = int(parts[parts.index('--workers') + 1]) if '--workers' in parts else 4
+        run_batch(cmd, ids, self.doc_store, self.ai, self.summarizer, workers,
+                  restart='--restart' in parts, logger=self.logger)
+
+    def _summarize_local(self, parts, ids):
+        """Extractive LexRank summaries; a single doc is printed, batches are stored."""
+        count = int(parts[parts.index('--sentences') + 1]) if '--sentences' in parts else 5
+        if ids is None:
+            doc = self.doc_store.get_document(int(parts[1]))
+            if not doc:
+                print("Document not found.")
+                return
+            print("Summary:\n", extractive_summary(doc['body'] or "", count))
+            return
+        summarize_local(self.doc_store, ids, count)
+
+    def _autolink_local(self, parts, ids):
+        """Title/key-phrase autolinking without the AI; lists links unless `--apply`."""
+        single = int(parts[1]) if ids is None else None
+        autolink_local(self.doc_store, ids, single, apply='--apply' in parts, logger=self.logger)
+
     def process(self, user_input):
         parts = user_input.split()
         if not parts:
@@ -27,12 +172,13 @@ class CommandProcessor:
 
         if cmd == 'NEW':
             title = ' '.join(parts[1:])
-            doc_id = self.doc_store.new_document(title)
+            doc_id = self.doc_store.add_document(title, "")
             print(f"Document {doc_id} created.")
-            self.logger.log("user", "NEW", doc_id, title)
+            self.logger.info(f"NEW {doc_id}: {title}")
 
         elif cmd == 'LIST':
-            print(self.doc_store.list_documents())
+            for row in self.doc_store.get_document_index():
+                print(f"{row['id']}: {row['title']} - {row['description']}")
 
         elif cmd == 'VIEW':
             if len(parts) < 2:
@@ -40,10 +186,10 @@ class CommandProcessor:
                 return
             doc_id = int(parts[1])
             doc = self.doc_store.get_document(doc_id)
-            if doc.empty:
+            if doc is None:
                 print("Document not found.")
             else:
-                print(doc.iloc[0]['body'])
+                print(doc['body'])
 
         elif cmd == 'EDIT':
             if len(parts) < 2:
@@ -51,9 +197,9 @@ class CommandProcessor:
                 return
             doc_id = int(parts[1])
             new_body = input("Enter text to append:\n")
-            self.doc_store.edit_document(doc_id, new_body)
+            self.doc_store.append_to_documents([(doc_id, new_body)])
             print(f"Document {doc_id} updated.")
-            self.logger.log("user", "EDIT", doc_id, f"{len(new_body)} chars appended")
+            self.logger.info(f"EDIT {doc_id}: {len(new_body)} chars appended")
 
         elif cmd == 'SAVE':
             if len(parts) < 3:
@@ -62,13 +208,13 @@ class CommandProcessor:
             doc_id = int(parts[1])
             filename = parts[2]
             doc = self.doc_store.get_document(doc_id)
-            if doc.empty:
+            if doc is None:
                 print("Document not found.")
             else:
                 with open(filename, "w") as f:
-                    f.write(doc.iloc[0]['body'])
+                    f.write(doc['body'] or "")
                 print(f"Document {doc_id} saved to {filename}.")
-                self.logger.log("user", "SAVE", doc_id, filename)
+                self.logger.info(f"SAVE {doc_id} -> {filename}")
 
         elif cmd == 'LOAD':
             if len(parts) < 3:
@@ -81,9 +227,9 @@ class CommandProcessor:
                 return
             with open(filename, "r") as f:
                 content = f.read()
-            self.doc_store.edit_document(doc_id, content)
+            self.doc_store.append_to_documents([(doc_id, content)])
             print(f"Loaded content from {filename} into document {doc_id}.")
-            self.logger.log("user", "LOAD", doc_id, filename)
+            self.logger.info(f"LOAD {filename} -> {doc_id}")
 
         elif cmd == 'LINKS':
             if len(parts) < 2:
@@ -91,10 +237,10 @@ class CommandProcessor:
                 return
             doc_id = int(parts[1])
             doc = self.doc_store.get_document(doc_id)
-            if doc.empty:
+            if doc is None:
                 print("Document not found.")
             else:
-                body = doc.iloc[0]['body']
+                body = doc['body'] or ""
                 links = self.parse_links(body)
                 for idx, (kind, text, target) in enumerate(links, 1):
                     print(f"{kind}{idx}) Text: '{text}' --> Target: '{target}'")
@@ -106,10 +252,10 @@ class CommandProcessor:
             doc_id = int(parts[1])
             link_id = int(parts[2])
             doc = self.doc_store.get_document(doc_id)
-            if doc.empty:
+            if doc is None:
                 print("Document not found.")
                 return
-            body = doc.iloc[0]['body']
+            body = doc['body'] or ""
             links = self.parse_links(body)
             if link_id > len(links):
                 print("Invalid link ID.")
@@ -119,38 +265,60 @@ class CommandProcessor:
 
         elif cmd == 'ASK':
             prompt = ' '.join(parts[1:])
-            reply = self.ai.ask(prompt)
+            reply = self.ai.query(prompt)
             print("AI Response:\n", reply)
-            self.logger.log("user", "ASK", details=prompt)
+            self.logger.info(f"ASK: {prompt}")
 
         elif cmd == 'SUMMARIZE':
             if len(parts) < 2:
-                print("Usage: SUMMARIZE <doc_id>")
+                print("Usage: SUMMARIZE <doc_id> | --all | --ids 1,2,3 | --query <text> [--workers N] [--restart]")
+                print("       SUMMARIZE ... --local [--sentences N]   (extractive, no AI call)")
+                return
+            ids = self._batch_ids(parts)
+            if '--local' in parts:
+                self._summarize_local(parts, ids)
+                return
+            if ids is not None:
+                self._run_batch(cmd, parts, ids)
                 return
             doc_id = int(parts[1])
-            doc = self.doc_store.get_document(doc_id)
-            if doc.empty:
+            try:
+                print("Summary:\n", summarize_document(self.doc_store, self.summarizer, doc_id))
+            except KeyError:
                 print("Document not found.")
                 return
-            text = doc.iloc[0]['body']
-            reply = self.ai.ask(f"Please summarize the following document:\n{text}")
-            print("Summary:\n", reply)
-            self.logger.log("user", "SUMMARIZE", doc_id)
+            self.logger.info(f"SUMMARIZE {doc_id}")
 
         elif cmd == 'AUTOLINK':
             if len(parts) < 2:
-                print("Usage: AUTOLINK <doc_id>")
+                print("Usage: AUTOLINK <doc_id> | --all | --ids 1,2,3 [--workers N] [--restart]")
+                print("       AUTOLINK <doc_id> | --all | --ids 1,2,3 | --query <text> --local [--apply]")
+                return
+            ids = self._batch_ids(parts)
+            if '--local' in parts:
+                self._autolink_local(parts, ids)
+                return
+            if ids is not None:
+                self._run_batch(cmd, parts, ids)
                 return
             doc_id = int(parts[1])
-            doc = self.doc_store.get_document(doc_id)
-            if doc.empty:
+            try:
+                autolink_document(self.doc_store, self.ai, doc_id)
+            except KeyError:
                 print("Document not found.")
                 return
-            text = doc.iloc[0]['body']
-            suggestion = self.ai.ask(f"Analyze this text and suggest hypertext links using Engelbart [[Text | Target]] syntax:\n{text}")
-            self.doc_store.edit_document(doc_id, "\n" + suggestion)
             print("AI link suggestions appended.")
-            self.logger.log("user", "AUTOLINK", doc_id)
+            self.logger.info(f"AUTOLINK {doc_id}")
+
+        elif cmd == 'STATS':
+            if len(parts) < 2 or parts[1].lower() != 'ai':
+                print("Usage: STATS ai [--days N]")
+                return
+            if self.ai.call_log is None:
+                print("AI call metrics are disabled.")
+                return
+            days = int(parts[parts.index('--days') + 1]) if '--days' in parts else 7
+            print(format_summary(self.ai.call_log.summary(days), days))
 
         elif cmd == 'SETOPENAI':
             key = input("Enter OpenAI API Key: ").strip()
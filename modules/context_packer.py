@@ -0,0 +1,137 @@
+import math
+import re
+from collections import Counter
+
+from modules.link_validator import LINK_PATTERN
+from modules.logger import Logger
+from modules.semantic_cache import terms
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text: str) -> int:
+    """Local approximation of a BPE token count.
+
+    Each punctuation mark is one token and each word one token per four
+    characters, which tracks OpenAI's tokenizers closely on English prose
+    without needing a vocabulary file.
+    """
+    return sum(1 if not p[0].isalnum() else (len(p) + 3) // 4 for p in _PIECE.findall(text))
+
+
+def _plain(body: str) -> str:
+    """Body text with `[label](doc:N)` links reduced to their labels."""
+    return LINK_PATTERN.sub(r"\1", body or "")
+
+
+def split_passages(body: str, max_tokens: int = 120):
+    """Paragraphs of *body*, with long ones cut on sentence boundaries."""
+    passages = []
+    for para in _PARAGRAPH.split(_plain(body)):
+        para = " ".join(para.split())
+        if not para:
+            continue
+        if count_tokens(para) <= max_tokens:
+            passages.append(para)
+            continue
+        current = []
+        for sentence in _SENTENCE.split(para):
+            if current and count_tokens(" ".join(current + [sentence])) > max_tokens:
+                passages.append(" ".join(current))
+                current = []
+            current.append(sentence)
+        if current:
+            passages.append(" ".join(current))
+    return passages
+
+
+def bm25_scores(query_terms, passages_terms, k1: float = 1.5, b: float = 0.75):
+    """Okapi BM25 score of every passage (a list of terms) against *query_terms*."""
+    n = len(passages_terms)
+    if not n or not query_terms:
+        return [0.0] * n
+    avg_len = sum(len(t) for t in passages_terms) / n or 1.0
+    df = Counter(term for t in passages_terms for term in set(t))
+    query = set(query_terms)
+    idf = {q: math.log(1 + (n - df[q] + 0.5) / (df[q] + 0.5)) for q in query}
+    scores = []
+    for t in passages_terms:
+        tf = Counter(t)
+        norm = k1 * (1 - b + b * len(t) / avg_len)
+        scores.append(sum(idf[q] * tf[q] * (k1 + 1) / (tf[q] + norm) for q in query if tf[q]))
+    return scores
+
+
+class ContextPacker:
+    """Pick the passages most relevant to an ASK from the current document
+    and its link neighbourhood, within a token budget.
+
+    Candidates come from the current document, the documents it links to
+    and the documents linking to it. They are ranked by BM25 against the
+    selection, with a small bonus for the current document, then packed
+    greedily until *budget* tokens are used and printed in document order.
+    """
+
+    CURRENT_DOC_WEIGHT = 1.25
+
+    def __init__(self, doc_store, max_neighbours: int = 20, passage_tokens: int = 120,
+                 logger=None):
+        self.doc_store = doc_store
+        self.max_neighbours = max_neighbours
+        self.passage_tokens = passage_tokens
+        self.logger = logger or Logger()
+
+    def _neighbourhood(self, doc_id: int):
+        doc = self.doc_store.get_document(doc_id)
+        if not doc:
+            return []
+        outgoing = [int(m.group(2)) for m in LINK_PATTERN.finditer(doc["body"] or "")]
+        ids = [doc_id]
+        for other in outgoing + self.doc_store.backlinks(doc_id):
+            if other not in ids:
+                ids.append(other)
+        docs = [doc]
+        for other in ids[1:self.max_neighbours + 1]:
+            rec = self.doc_store.get_document(other)
+            if rec:
+                docs.append(rec)
+        return docs
+
+    def pack(self, selected_text: str, doc_id: int, budget: int = 600) -> str:
+        """Context block for a question about *selected_text*, or "" if nothing scores."""
+        if not doc_id or budget <= 0:
+            return ""
+        query = terms(selected_text)
+        candidates = []  # (doc_rank, position, doc, passage)
+        for rank, doc in enumerate(self._neighbourhood(doc_id)):
+            for pos, passage in enumerate(split_passages(doc["body"], self.passage_tokens)):
+                if passage.strip() != selected_text.strip():
+                    candidates.append((rank, pos, doc, passage))
+        scores = bm25_scores(query, [terms(c[3]) for c in candidates])
+        ranked = sorted(
+            ((s * (self.CURRENT_DOC_WEIGHT if c[0] == 0 else 1.0), c)
+             for s, c in zip(scores, candidates) if s > 0),
+            key=lambda sc: -sc[0],
+        )
+        chosen, used, headers = [], 0, set()
+        for _, cand in ranked:
+            cost = count_tokens(cand[3]) + (0 if cand[0] in headers else 8)
+            if used + cost > budget:
+                continue
+            chosen.append(cand)
+            headers.add(cand[0])
+            used += cost
+        if not chosen:
+            return ""
+        lines, last_doc = [], None
+        for rank, _, doc, passage in sorted(chosen, key=lambda c: (c[0], c[1])):
+            if rank != last_doc:
+                lines.append(f"[Doc {doc['id']}: {doc['title']}]")
+                last_doc = rank
+            lines.append(passage)
+        self.logger.info(
+            f"Packed {len(chosen)} of {len(candidates)} passages (~{used} tokens) as ASK context"
+        )
+        return "\n".join(lines)
@@ -1,15 +1,41 @@
+import os
+import re
 import sqlite3
 
 class DocumentStore:
-    def __init__(self, db_path):
+    def __init__(self, db_path="storage/documents.db"):
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
         self.conn = sqlite3.connect(db_path)
         self.conn.row_factory = sqlite3.Row
+        self._listeners = []
         self.create_table()
 
+    def close(self):
+        self.conn.close()
+
+    def add_listener(self, callback):
+        """Call `callback(change, doc_ids)` after every committed write to documents.
+
+        *change* is "insert", "update" or "delete". Callbacks run on the
+        thread that made the write.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, change: str, doc_ids):
+        doc_ids = list(doc_ids)
+        if doc_ids:
+            for callback in self._listeners:
+                callback(change, doc_ids)
+
     def create_table(self):
         self.conn.execute(
             "CREATE TABLE IF NOT EXISTS documents (id INTEGER PRIMARY KEY, title TEXT, body TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
         )
+        # Covering index for the sidebar: counting and paging by offset walk
+        # this small index instead of the table pages holding the bodies
+        self.conn.execute("CREATE INDEX IF NOT EXISTS documents_index ON documents (id, title)")
         self.conn.commit()
     # Add this method here clearly:
     def add_document(self, title, body):
@@ -18,6 +44,7 @@ class DocumentStore:
             (title, body)
         )
         self.conn.commit()
+        self._notify("insert", [cur.lastrowid])
         return cur.lastrowid
 
     def update_document(self, doc_id: int, new_body: str):
@@ -29,18 +56,172 @@ class DocumentStore:
         (new_body, doc_id)
     )
         self.conn.commit()
+        self._notify("update", [doc_id])
+
+    def delete_document(self, doc_id: int):
+        cur = self.conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+        self.conn.commit()
+        if cur.rowcount:
+            self._notify("delete", [doc_id])
+
+    def wrap_span_with_link(self, doc_id: int, start: int, end: int, target_id: int,
+                            expected: str = None):
+        """
+        Replace body[start:end] with `[span](doc:target_id)` in a single UPDATE.
+
+        The splice happens inside SQLite, so the body is never read back and
+        rewritten from Python. If *expected* is given the update only applies
+        when the span still holds that text. Returns the inserted markdown, or
+        None when nothing was changed.
+        """
+        if expected is None:
+            row = self.conn.execute(
+                "SELECT substr(body, ? + 1, ? - ?) FROM documents WHERE id = ?",
+                (start, end, start, doc_id)
+            ).fetchone()
+            if row is None:
+                return None
+            expected = row[0]
+        link_md = f"[{expected}](doc:{target_id})"
+        cur = self.conn.execute(
+            "UPDATE documents SET body = substr(body, 1, ?) || ? || substr(body, ? + 1) "
+            "WHERE id = ? AND substr(body, ? + 1, ? - ?) = ?",
+            (start, link_md, end, doc_id, start, end, start, expected)
+        )
+        self.conn.commit()
+        if cur.rowcount != 1:
+            return None
+        self._notify("update", [doc_id])
+        return link_md
+
+    def unwrap_links(self, doc_id: int, target_id: int) -> bool:
+        """Turn every `[label](doc:target_id)` in *doc_id* back into plain `label`."""
+        row = self.conn.execute("SELECT body FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        if row is None or not row[0]:
+            return False
+        body = re.sub(rf"\[([^\]]+)]\(doc:{int(target_id)}\)", r"\1", row[0])
+        if body == row[0]:
+            return False
+        self.update_document(doc_id, body)
+        return True
+
+    _DESCRIPTION = "replace(replace(substr(COALESCE(body, ''), 1, 60), char(10), ' '), char(13), ' ')"
 
     def get_document_index(self):
-        cur = self.conn.execute("SELECT id, title, body FROM documents ORDER BY id DESC")
-        result = []
-        for row in cur.fetchall():
-            description = (row['body'] or "")[:60].replace("\n", " ").replace("\r", " ")
-            result.append({'id': row['id'], 'title': row['title'], 'description': description})
-            print("DEBUG: get_document_index returns:", result)
-        return result
+        cur = self.conn.execute(
+            f"SELECT id, title, {self._DESCRIPTION} AS description FROM documents ORDER BY id DESC"
+        )
+        return [dict(row) for row in cur]
+
+    def count_documents(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def get_index_rows(self, doc_ids):
+        """Index rows (as in `get_document_index`) of *doc_ids* that still exist."""
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return []
+        cur = self.conn.execute(
+            f"SELECT id, title, {self._DESCRIPTION} AS description FROM documents "
+            f"WHERE id IN ({', '.join('?' * len(doc_ids))})", doc_ids
+        )
+        return [dict(row) for row in cur]
+
+    def get_index_page(self, offset: int, limit: int):
+        """Index rows *offset* .. *offset* + *limit*, newest first, like `get_document_index`.
+
+        Only the bodies of the rows on the page are read.
+        """
+        rows = self.conn.execute(
+            "SELECT id, title FROM documents ORDER BY id DESC LIMIT ? OFFSET ?", (limit, offset)
+        ).fetchall()
+        if not rows:
+            return []
+        descriptions = dict(self.conn.execute(
+            f"SELECT id, {self._DESCRIPTION} FROM documents "
+            f"WHERE id IN ({', '.join('?' * len(rows))})",
+            [row["id"] for row in rows]
+        ).fetchall())
+        return [{"id": row["id"], "title": row["title"], "description": descriptions[row["id"]]}
+                for row in rows]
 
     def get_document(self, doc_id):
         cur = self.conn.execute("SELECT id, title, body FROM documents WHERE id=?", (doc_id,))
         return cur.fetchone()
 
+    def document_ids(self, query: str = None):
+        """All document ids, or those whose title or body contains *query*."""
+        if query:
+            pattern = f"%{query}%"
+            cur = self.conn.execute(
+                "SELECT id FROM documents WHERE title LIKE ? OR body LIKE ? ORDER BY id",
+                (pattern, pattern)
+            )
+        else:
+            cur = self.conn.execute("SELECT id FROM documents ORDER BY id")
+        return [row[0] for row in cur]
+
+    def backlinks(self, doc_id: int):
+        """Ids of documents that contain a `(doc:doc_id)` link."""
+        cur = self.conn.execute(
+            "SELECT id FROM documents WHERE id != ? AND instr(body, ?) > 0 ORDER BY id",
+            (doc_id, f"](doc:{doc_id})")
+        )
+        return [row[0] for row in cur]
+
+    def save_summaries(self, rows):
+        """Store `(doc_id, summary)` pairs in one transaction."""
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "doc_id INTEGER PRIMARY KEY, summary TEXT, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO summaries (doc_id, summary) VALUES (?, ?)", rows
+            )
+
+    def update_documents(self, rows):
+        """Replace many bodies in one transaction; rows are `(doc_id, body)`."""
+        rows = list(rows)
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE documents SET body = ? WHERE id = ?",
+                [(body, doc_id) for doc_id, body in rows]
+            )
+        self._notify("update", [doc_id for doc_id, _ in rows])
+
+    def append_to_documents(self, rows):
+        """Append text to many bodies in one transaction; rows are `(doc_id, text)`."""
+        rows = list(rows)
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE documents SET body = body || ? WHERE id = ?",
+                [(text, doc_id) for doc_id, text in rows]
+            )
+        self._notify("update", dict.fromkeys(doc_id for doc_id, _ in rows))
+
+    def add_linked_documents(self, rows):
+        """Insert many documents in one transaction and link each from its source.
+
+        Rows are `(title, body, link_from, label)`; when *link_from* is set,
+        `[label](doc:new_id)` is appended to that document on its own line.
+        Returns the new ids in row order.
+        """
+        ids, linked = [], {}
+        with self.conn:
+            for title, body, link_from, label in rows:
+                cur = self.conn.execute(
+                    "INSERT INTO documents (title, body) VALUES (?, ?)", (title, body)
+                )
+                ids.append(cur.lastrowid)
+                if link_from is not None:
+                    self.conn.execute(
+                        "UPDATE documents SET body = body || ? WHERE id = ?",
+                        (f"\n[{label}](doc:{cur.lastrowid})", link_from)
+                    )
+                    linked[link_from] = None
+        self._notify("insert", ids)
+        self._notify("update", linked)
+        return ids
+
     # ... (add your other methods as needed)
@@ -1,4 +1,4 @@
-import requests
+from modules import http_client
 
 class FacebookPoster:
     def __init__(self, credentials):
@@ -15,7 +15,7 @@ class FacebookPoster:
             "access_token": self.credentials.token
         }
 
-        response = requests.post(url, data=payload)
+        response = http_client.post(url, data=payload)
         if response.status_code == 200:
             print("Successfully posted to Facebook!")
             return True
@@ -0,0 +1,101 @@
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+
+from modules.logger import Logger
+
+
+class TaskPump:
+    """The single `after()` loop that hands work from background threads to Tk.
+
+    Any thread may `post(fn, *args)`; the Tk thread runs the callbacks in
+    order every *interval_ms*. The loop doubles as the heartbeat of an
+    event-loop watchdog: a monitor thread notices when the Tk thread goes
+    more than *stall_ms* past its next tick, grabs the stack of whatever it
+    is running, and once the loop is back the stall is logged and passed to
+    `on_stall(milliseconds, where)` on the Tk thread.
+    """
+
+    def __init__(self, tk_root, interval_ms: int = 20, stall_ms: int = 50, on_stall=None,
+                 logger=None):
+        self.root = tk_root
+        self.interval_ms = interval_ms
+        self.stall_ms = stall_ms
+        self.on_stall = on_stall
+        self.logger = logger or Logger()
+        self.stalls = 0
+        self._calls = queue.SimpleQueue()
+        self._tk_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stall_where = None
+        self._running = False
+        self._after_id = None
+
+    def post(self, fn, *args):
+        """Run `fn(*args)` on the Tk thread at the next tick; safe from any thread."""
+        self._calls.put((fn, args))
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._beat = time.monotonic()
+        self._after_id = self.root.after(self.interval_ms, self._tick)
+        threading.Thread(target=self._watch, name="tk-watchdog", daemon=True).start()
+
+    def stop(self):
+        self._running = False
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    # ---------- Tk thread ----------
+    def _tick(self):
+        now = time.monotonic()
+        late_ms = (now - self._beat) * 1000 - self.interval_ms
+        self._beat = now
+        if late_ms > self.stall_ms:
+            self._report_stall(late_ms)
+        while True:
+            try:
+                fn, args = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as exc:
+                self.logger.error(f"Callback {getattr(fn, '__name__', fn)} failed: {exc}")
+        # The next tick's lateness includes the time spent in these callbacks
+        if self._running:
+            self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def _report_stall(self, late_ms: float):
+        where, self._stall_where = self._stall_where or "unknown", None
+        self.stalls += 1
+        self.logger.info(f"Tk event loop blocked for {late_ms:.0f} ms in {where}")
+        if self.on_stall:
+            self.on_stall(late_ms, where)
+
+    # ---------- monitor thread ----------
+    def _watch(self):
+        limit = (self.interval_ms + self.stall_ms) / 1000
+        while self._running:
+            time.sleep(limit / 4)
+            beat = self._beat
+            if self._stall_where is None and time.monotonic() - beat > limit:
+                frame = sys._current_frames().get(self._tk_thread)
+                self._stall_where = _describe(frame) if frame else None
+
+
+def _describe(frame) -> str:
+    """`function (file:line)` of the innermost frame from this project's code."""
+    stack = traceback.extract_stack(frame)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for entry in reversed(stack):
+        if os.path.abspath(entry.filename).startswith(root):
+            return f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
+    entry = stack[-1]
+    return f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
@@ -1,18 +1,38 @@
+import io
 import os
-import threading
+import time
+import zlib
 import tkinter as tk
 from tkinter import ttk, filedialog, simpledialog, messagebox
 from pathlib import Path
 from PIL import ImageTk, Image
 
-from modules import hypertext_parser, image_generator
+from modules import hypertext_parser, image_generator, image_pipeline
+from modules.ai_executor import AIJobExecutor
+from modules.autolinker import headings
+from modules.document_store import DocumentStore
+from modules.gui_tasks import TaskPump
 from modules.logger import Logger
+from modules.sidebar_index import SidebarIndex
+from modules.summarizer import extractive_summary
+from modules.title_index import TitleIndex
 
 
 class DemoKitGUI(tk.Tk):
     """DemoKit GUI – ASK / IMAGE / BACK buttons, context menu, image overlay, and history."""
 
     SIDEBAR_WIDTH = 320
+    STREAM_REPLIES = True  # show ASK answers token by token in a live document
+    REPLAY_WORKERS = 2     # queued ASKs resent at once when the backend is back
+    REPLAY_CHECK_MS = 15000
+    PREVIEW_BATCH = 50     # documents per background preview job
+    SIDEBAR_ROW_HEIGHT = 20
+    FILTER_DEBOUNCE_MS = 60  # quiet time after a keystroke before the sidebar is filtered
+    IMAGE_WORKERS = 3      # image generations running at once
+    IMAGE_VARIANTS = 4     # images per "IMAGE ×N" request (one API call)
+    GALLERY_SIZE = 12      # most recent images kept in the gallery strip
+    STALL_MS = 50          # event-loop blocks longer than this are flagged
+    STATUS_NOTE_MS = 8000  # how long errors and stall warnings stay in the status bar
 
     # ───────── INITIALISATION ─────────
     def __init__(self, doc_store, processor):
@@ -25,9 +45,41 @@ class DemoKitGUI(tk.Tk):
         self.current_doc_id: int | None = None
         self.history: list[int] = []
 
-        self._last_pil_img: Image | None = None
-        self._last_tk_img: ImageTk.PhotoImage | None = None
+        # Background work: every executor hands results back through one
+        # after() pump, which also watches for event-loop stalls
+        self.pump = TaskPump(self, stall_ms=self.STALL_MS, on_stall=self._on_stall,
+                             logger=self.logger)
+        executor = dict(pump=self.pump, on_unhandled_error=self._task_failed, logger=self.logger)
+        self.tasks = AIJobExecutor(self, max_workers=2, **executor)   # file I/O and the like
+        self._status_note: str | None = None
+        self._last_error: str | None = None
+
+        # Current image: encoded bytes plus thumbnail/fit renditions decoded
+        # off the main thread; PhotoImages are made lazily, once per rendition
+        self._image_bytes: bytes | None = None
+        self._renditions: dict[str, Image.Image] = {}
+        self._tk_images: dict[str, ImageTk.PhotoImage] = {}
         self._image_enlarged: bool = False
+        # Image generation has its own bounded queue; results collect in the gallery
+        self.image_jobs = AIJobExecutor(self, max_workers=self.IMAGE_WORKERS, **executor)
+        self._images_submitted = 0   # since the image queue was last empty
+        self._gallery: list[tk.Label] = []
+
+        self.ai_jobs = AIJobExecutor(self, **executor)
+        self._replaying: set[str] = set()
+        # Sidebar previews: extractive one-liners computed off the main thread
+        self.preview_jobs = AIJobExecutor(self, max_workers=1, **executor)
+        self._previews: dict[int, tuple[int, str]] = {}   # doc_id -> (body crc, preview)
+        self._preview_todo: list[int] = []
+        # Virtual sidebar: only the rows in view exist in the Treeview (iid = doc id)
+        self.sidebar_index = SidebarIndex(doc_store)
+        self._sidebar_top = 0                              # index position of the first row shown
+        self._sidebar_shown: dict[str, tuple] = {}         # iid -> values, in display order
+        self._sidebar_changes: list[tuple[str, list]] = [] # store changes not yet applied
+        # Sidebar filter: an in-memory title index, built in the background on first use
+        self.title_index: TitleIndex | None = None
+        self._title_index_pending: list[tuple[str, list]] | None = None  # changes during the build
+        self._filter_after: str | None = None
 
         # window
         self.title("Engelbart Journal – DemoKit")
@@ -39,13 +91,40 @@ class DemoKitGUI(tk.Tk):
         self._build_sidebar()
         self._build_main_pane()
         self._build_context_menu()
+        self._build_status_bar()
 
+        self.ai_jobs.add_listener(self._update_ai_progress)
+        self.image_jobs.add_listener(self._update_image_progress)
+        for jobs in self._executors():
+            jobs.add_listener(self._update_status_bar)
+        self.doc_store.add_listener(self._on_store_change)
         self._refresh_sidebar()
+        self.pump.start()
+        self.after(1000, self._poll_ask_queue)
+
+    def destroy(self):
+        self.pump.stop()
+        self.tasks.shutdown()
+        self.ai_jobs.shutdown()
+        self.image_jobs.shutdown()
+        self.preview_jobs.shutdown()
+        super().destroy()
 
     # ═════════ UI BUILDERS ═════════
     def _build_sidebar(self):
         frame = tk.Frame(self)
         frame.grid(row=0, column=0, sticky="nswe")
+        search = tk.Frame(frame)
+        search.pack(side=tk.TOP, fill=tk.X)
+        self.filter_var = tk.StringVar()
+        self.filter_entry = ttk.Entry(search, textvariable=self.filter_var)
+        self.filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2, pady=2)
+        self.filter_status = tk.Label(search, text="", anchor="e", fg="gray40")
+        self.filter_status.pack(side=tk.RIGHT, padx=2)
+        self.filter_var.trace_add("write", self._on_filter_edit)
+        self.filter_entry.bind("<FocusIn>", lambda _e: self._ensure_title_index())
+        self.filter_entry.bind("<Escape>", lambda _e: self.filter_var.set(""))
+        ttk.Style(self).configure("Treeview", rowheight=self.SIDEBAR_ROW_HEIGHT)
         self.sidebar = ttk.Treeview(
             frame, columns=("ID", "Title", "Description"), show="headings"
         )
@@ -53,10 +132,15 @@ class DemoKitGUI(tk.Tk):
             self.sidebar.heading(col, text=col)
             self.sidebar.column(col, width=w, anchor="w", stretch=col == "Description")
         self.sidebar.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        ttk.Scrollbar(frame, orient="vertical", command=self.sidebar.yview).pack(
-            side=tk.RIGHT, fill=tk.Y
-        )
+        # The scrollbar tracks the position in the whole index, not the Treeview
+        self.sidebar_scroll = ttk.Scrollbar(frame, orient="vertical", command=self._scroll_sidebar)
+        self.sidebar_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         self.sidebar.bind("<<TreeviewSelect>>", self._on_select)
+        self.sidebar.bind("<Configure>", lambda _e: self._render_sidebar())
+        for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.sidebar.bind(seq, self._on_sidebar_wheel)
+        for seq in ("<Up>", "<Down>", "<Prior>", "<Next>"):
+            self.sidebar.bind(seq, self._on_sidebar_key)
 
     def _build_main_pane(self):
         pane = tk.Frame(self)
@@ -76,21 +160,58 @@ class DemoKitGUI(tk.Tk):
         self.img_label.grid(row=1, column=0, sticky="ew", pady=(8, 0))
         self.img_label.bind("<Button-1>", self._toggle_image)
 
+        # gallery strip of generated images, with image-job progress and cancel
+        self.gallery = tk.Frame(pane)
+        self.gallery_tiles = tk.Frame(self.gallery)
+        self.gallery_tiles.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.image_progress = ttk.Progressbar(self.gallery, mode="determinate", length=100)
+        self.image_status = tk.Label(self.gallery, text="", anchor="e")
+        self.image_cancel = ttk.Menubutton(self.gallery, text="Cancel")
+        self.image_cancel_menu = tk.Menu(
+            self.image_cancel, tearoff=0,
+            postcommand=lambda: self._fill_cancel_menu(self.image_cancel_menu, self.image_jobs),
+        )
+        self.image_cancel["menu"] = self.image_cancel_menu
+
         # button row
         btns = tk.Frame(pane)
-        btns.grid(row=2, column=0, sticky="we", pady=(6, 0))
+        btns.grid(row=3, column=0, sticky="we", pady=(6, 0))
         for c in range(3):
             btns.columnconfigure(c, weight=1)
         ttk.Button(btns, text="ASK",   command=self._handle_ask).grid(row=0, column=0, sticky="we", padx=(0, 4))
         ttk.Button(btns, text="BACK",  command=self._go_back).grid(row=0, column=1, sticky="we", padx=(0, 4))
         ttk.Button(btns, text="IMAGE", command=self._handle_image).grid(row=0, column=2, sticky="we")
 
+        # AI job progress: spinner, count and a per-job cancel menu
+        self.ai_progress = ttk.Progressbar(btns, mode="indeterminate", length=80)
+        self.ai_status = tk.Label(btns, text="", anchor="w")
+        self.ai_cancel = ttk.Menubutton(btns, text="Cancel")
+        self.ai_cancel_menu = tk.Menu(
+            self.ai_cancel, tearoff=0,
+            postcommand=lambda: self._fill_cancel_menu(self.ai_cancel_menu, self.ai_jobs),
+        )
+        self.ai_cancel["menu"] = self.ai_cancel_menu
+
+    def _build_status_bar(self):
+        bar = tk.Frame(self, relief="sunken", borderwidth=1)
+        bar.grid(row=1, column=0, columnspan=2, sticky="we")
+        self.status_label = tk.Label(bar, text="Ready", anchor="w")
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=4)
+        self.status_label.bind("<Button-1>", self._show_last_error)
+        self.tasks_button = ttk.Menubutton(bar, text="Tasks")
+        self.tasks_menu = tk.Menu(self.tasks_button, tearoff=0, postcommand=self._fill_tasks_menu)
+        self.tasks_button["menu"] = self.tasks_menu
+        self.tasks_button.pack(side=tk.RIGHT)
+
     def _build_context_menu(self):
         self.ctx_menu = tk.Menu(self, tearoff=0)
         for lbl, fn in (
             ("ASK", self._handle_ask),
             ("IMAGE", self._handle_image),
+            (f"IMAGE ×{self.IMAGE_VARIANTS}", lambda: self._handle_image(self.IMAGE_VARIANTS)),
+            ("Illustrate Headings", self._illustrate_headings),
             ("Load API Key", self._load_api_key),
+            ("AI Status", self._show_ai_status),
         ):
             self.ctx_menu.add_command(label=lbl, command=fn)
         self.ctx_menu.add_separator()
@@ -113,17 +234,233 @@ class DemoKitGUI(tk.Tk):
 
     # ═════════ SIDEBAR / DOC VIEW ═════════
     def _refresh_sidebar(self):
-        self.sidebar.delete(*self.sidebar.get_children())
-        for rec in self.doc_store.get_document_index():
-            self.sidebar.insert(
-                "", "end", values=(rec["id"], rec["title"], rec["description"])
+        """Re-read the index (the store changed) and redraw the rows in view."""
+        self.sidebar_index.invalidate()
+        self._render_sidebar()
+
+    def _visible_rows(self) -> int:
+        height = self.sidebar.winfo_height() - self.SIDEBAR_ROW_HEIGHT - 4  # minus the heading
+        return max(1, height // self.SIDEBAR_ROW_HEIGHT)
+
+    def _on_store_change(self, change, doc_ids):
+        """Store listener: collect changes and apply them together once Tk is idle."""
+        if not self._sidebar_changes:
+            self.after_idle(self._apply_sidebar_changes)
+        self._sidebar_changes.append((change, doc_ids))
+
+    def _apply_sidebar_changes(self):
+        changes, self._sidebar_changes = self._sidebar_changes, []
+        first_shown = int(next(iter(self._sidebar_shown), 0))
+        filtered = self.filter_var.get().strip() != ""
+        updated = set()
+        for change, doc_ids in changes:
+            if change == "update":
+                updated.update(doc_ids)
+            elif self._sidebar_top and not filtered:
+                # Rows added or removed above the view shift it, so the same documents stay in view
+                above = sum(1 for doc_id in doc_ids if doc_id > first_shown)
+                self._sidebar_top += above if change == "insert" else -above
+            self.sidebar_index.apply(change, doc_ids)
+            self._update_title_index(change, doc_ids)
+        if filtered and self.title_index is not None:
+            # Edits may move documents in or out of the matches
+            self.sidebar_index.set_filter(self.title_index.search(self.filter_var.get()))
+        self._render_sidebar(updated)
+
+    def _render_sidebar(self, updated=()):
+        """Make the Treeview show exactly the index rows in view.
+
+        Only rows that appear, disappear, move or change values are touched,
+        so selection and focus survive and a new document costs one insert.
+        Rows new to the view or in *updated* get their preview (re)checked.
+        """
+        total, visible = len(self.sidebar_index), self._visible_rows()
+        self._sidebar_top = max(0, min(self._sidebar_top, total - visible))
+        rows = self.sidebar_index.rows(self._sidebar_top, visible)
+        wanted = {
+            str(rec["id"]): (rec["id"], rec["title"],
+                             self._previews.get(rec["id"], (None, rec["description"]))[1])
+            for rec in rows
+        }
+        stale = [iid for iid in self._sidebar_shown if iid not in wanted]
+        if stale:
+            self.sidebar.delete(*stale)
+        order = [iid for iid in self._sidebar_shown if iid in wanted]
+        for pos, (iid, values) in enumerate(wanted.items()):
+            if iid not in self._sidebar_shown:
+                self.sidebar.insert("", pos, iid=iid, values=values)
+                order.insert(pos, iid)
+                continue
+            if self._sidebar_shown[iid] != values:
+                self.sidebar.item(iid, values=values)
+            if order[pos] != iid:
+                self.sidebar.move(iid, "", pos)
+                order.remove(iid)
+                order.insert(pos, iid)
+        fresh = [rec["id"] for rec in rows
+                 if str(rec["id"]) not in self._sidebar_shown or rec["id"] in updated]
+        self._sidebar_shown = wanted
+        if total:
+            self.sidebar_scroll.set(self._sidebar_top / total, (self._sidebar_top + len(rows)) / total)
+        else:
+            self.sidebar_scroll.set(0, 1)
+        current = str(self.current_doc_id)
+        if current in wanted and self.sidebar.selection() != (current,):
+            self.sidebar.selection_set(current)
+        # Previews still owed for rows in view, plus the new ones; top of the view first
+        owed = set(self._preview_todo).union(fresh)
+        start_pump = not self._preview_todo
+        self._preview_todo = [rec["id"] for rec in reversed(rows) if rec["id"] in owed]
+        if start_pump and self._preview_todo:
+            self.after_idle(self._queue_previews)
+
+    # ---------- Filter ----------
+    def _on_filter_edit(self, *_):
+        """Filter box changed: filter once typing pauses for FILTER_DEBOUNCE_MS."""
+        if self._filter_after is not None:
+            self.after_cancel(self._filter_after)
+        self._filter_after = self.after(self.FILTER_DEBOUNCE_MS, self._filter_sidebar)
+
+    def _filter_sidebar(self):
+        self._filter_after = None
+        query = self.filter_var.get()
+        if not query.strip():
+            self.sidebar_index.set_filter(None)
+            self.filter_status.configure(text="")
+        elif self.title_index is None:
+            self._ensure_title_index()   # filters again once the index is ready
+            self.filter_status.configure(text="indexing…")
+            return
+        else:
+            started = time.perf_counter()
+            ids = self.title_index.search(query)
+            self.logger.debug(f"Filter {query!r}: {len(ids)} matches "
+                              f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+            self.sidebar_index.set_filter(ids)
+            self.filter_status.configure(text=f"{len(ids)} found")
+        self._sidebar_top = 0
+        self._render_sidebar()
+
+    def _ensure_title_index(self):
+        """Start building the title index, unless it is built or being built."""
+        if self.title_index is not None or self._title_index_pending is not None:
+            return
+        self._title_index_pending = []
+        self.tasks.submit(
+            self._build_title_index, self.doc_store.db_path, self.logger,
+            on_done=self._title_index_ready, on_error=self._title_index_failed,
+            on_cancel=self._title_index_failed, label="indexing titles",
+        )
+
+    @staticmethod
+    def _build_title_index(db_path, logger):
+        """Worker side: reads through its own connection, the GUI's belongs to the Tk thread."""
+        store = DocumentStore(db_path)
+        try:
+            return TitleIndex(logger).build(store.get_document_index())
+        finally:
+            store.close()
+
+    def _title_index_ready(self, index):
+        pending, self._title_index_pending = self._title_index_pending, None
+        self.title_index = index
+        # Changes made while the worker was reading; re-applying ones it already saw is harmless
+        for change, doc_ids in pending:
+            self._update_title_index(change, doc_ids)
+        if self.filter_var.get().strip():
+            self._filter_sidebar()
+
+    def _title_index_failed(self, exc=None):
+        """Build failed or was cancelled: the next edit of the filter box retries."""
+        self._title_index_pending = None
+        self.filter_status.configure(text="")
+        if exc is not None:
+            self._task_failed("indexing titles", exc)
+
+    def _update_title_index(self, change, doc_ids):
+        if self.title_index is None:
+            if self._title_index_pending is not None:
+                self._title_index_pending.append((change, doc_ids))
+            return
+        rows = self.doc_store.get_index_rows(doc_ids) if change != "delete" else ()
+        self.title_index.apply(change, rows=rows, doc_ids=doc_ids)
+
+    def _scroll_sidebar(self, *args):
+        """Scrollbar command: ("moveto", fraction) or ("scroll", n, "units" | "pages")."""
+        total, visible = len(self.sidebar_index), self._visible_rows()
+        if args[0] == "moveto":
+            top = round(float(args[1]) * total)
+        else:
+            top = self._sidebar_top + int(args[1]) * (visible if args[2] == "pages" else 1)
+        top = max(0, min(top, total - visible))
+        if top != self._sidebar_top:
+            self._sidebar_top = top
+            self._render_sidebar()
+
+    def _on_sidebar_wheel(self, event):
+        up = event.num == 4 or getattr(event, "delta", 0) > 0
+        self._scroll_sidebar("scroll", -3 if up else 3, "units")
+        return "break"
+
+    def _on_sidebar_key(self, event):
+        """Arrow keys past the first/last row in view, and Page Up/Down, scroll the index."""
+        rows = self.sidebar.get_children()
+        if not rows:
+            return None
+        focus = self.sidebar.focus()
+        if event.keysym in ("Prior", "Next"):
+            self._scroll_sidebar("scroll", -1 if event.keysym == "Prior" else 1, "pages")
+            return "break"
+        if event.keysym == "Up" and focus == rows[0]:
+            step, edge = -1, 0
+        elif event.keysym == "Down" and focus == rows[-1]:
+            step, edge = 1, -1
+        else:
+            return None  # normal Treeview navigation within the view
+        self._scroll_sidebar("scroll", step, "units")
+        target = self.sidebar.get_children()[edge]
+        self.sidebar.focus(target)
+        self.sidebar.selection_set(target)
+        return "break"
+
+    def _queue_previews(self):
+        """Hand the next few documents whose preview is missing or stale to a worker."""
+        batch = []
+        while self._preview_todo and len(batch) < self.PREVIEW_BATCH:
+            doc_id = self._preview_todo.pop()
+            rec = self.doc_store.get_document(doc_id)
+            if not rec:
+                continue
+            body = rec["body"] or ""
+            crc = zlib.crc32(body.encode("utf-8"))
+            if self._previews.get(doc_id, (None,))[0] != crc:
+                batch.append((doc_id, crc, body))
+        if batch:
+            self.preview_jobs.submit(
+                self._make_previews, batch, on_done=self._show_previews, label="previews"
             )
+        elif self._preview_todo:
+            self.after_idle(self._queue_previews)
+
+    @staticmethod
+    def _make_previews(batch):
+        return [(doc_id, crc, " ".join(extractive_summary(body, 1).split())[:160])
+                for doc_id, crc, body in batch]
+
+    def _show_previews(self, results):
+        for doc_id, crc, preview in results:
+            self._previews[doc_id] = (crc, preview)
+            iid = str(doc_id)
+            if iid in self._sidebar_shown:
+                self.sidebar.set(iid, "Description", preview)
+                self._sidebar_shown[iid] = self._sidebar_shown[iid][:2] + (preview,)
+        if self._preview_todo:
+            self._queue_previews()
 
     def _on_select(self, _evt=None):
         sel = self.sidebar.selection()
-        if sel:
-            doc_id = int(self.sidebar.item(sel[0])["values"][0])
-            self._open_doc(doc_id)
+        if sel and int(sel[0]) != self.current_doc_id:
+            self._open_doc(int(sel[0]))
 
     def _open_doc(self, doc_id: int):
         if self._image_enlarged:
@@ -145,342 +482,325 @@ class DemoKitGUI(tk.Tk):
             messagebox.showwarning("No selection", "Select text first.")
             return
         snippet = self.text.get(tk.SEL_FIRST, tk.SEL_LAST)
+        sel_start = self._char_offset(tk.SEL_FIRST)
         prefix = simpledialog.askstring(
             "Prompt", "Edit prompt:", initialvalue="Please expand on this: "
         )
         if prefix is None:
             return
-        full_prompt = prefix + snippet
+        prefix = prefix.strip()
         cid = self.current_doc_id
 
+        def on_link_created(link_md, start):
+            if self.current_doc_id == cid:
+                self._apply_link(start, len(snippet), link_md)
+
         def on_success(new_id):
             self.logger.info(f"AI reply stored as doc {new_id}")
-            self._refresh_sidebar()
-            self._insert_link(snippet, new_id)
-
-        self.processor.query_ai(
-            full_prompt, cid, on_success=on_success, on_link_created=lambda _: None
-        )
-
-    def _handle_image(self):
-        if not self.text.tag_ranges(tk.SEL):
-            messagebox.showwarning("No selection", "Select text first.")
-            return
-        prompt = self.text.get(tk.SEL_FIRST, tk.SEL_LAST).strip()
-        if not prompt:
-            return
-
-        def worker():
-            try:
-                pil_img = image_generator.generate_image(prompt)
-                tk_img = ImageTk.PhotoImage(pil_img)
-                self.after(0, lambda: self._show_image(tk_img, pil_img))
-            except Exception as exc:
-                self.after(
-                    0, lambda: messagebox.showerror("Image error", str(exc))
-                )
-
-        threading.Thread(target=worker, daemon=True).start()
-
-    def _show_image(self, tk_img, pil_img):
-        self._last_pil_img = pil_img
-        self._last_tk_img = tk_img
-        self._image_enlarged = False
-        self.img_label.grid(row=1, column=0, sticky="ew", pady=(8, 0))
-        self.img_label.configure(image=tk_img)
-        self.img_label.image = tk_img
 
-    def _toggle_image(self, _=None):
-        if self._last_pil_img is None:
-            return
-        if self._image_enlarged:
-            default = f"doc_{self.current_doc_id or 'unknown'}_image.png"
-            path = filedialog.asksaveasfilename(
-                title="Save image",
-                defaultextension=".png",
-                initialfile=default,
-                initialdir=str(Path.home()),
+        hit = self.processor.find_similar(snippet, prefix)
+        if hit and self._offer_cached_answer(hit):
+            self.processor.reuse_answer(
+                hit, snippet, cid, on_success, on_link_created,
+                sel_start=sel_start, sel_end=sel_start + len(snippet),
             )
-            if path:
-                self._last_pil_img.save(path)
-            self._restore_layout()
-        else:
-            self.text.grid_remove()
-            self.img_label.grid(row=0, column=0, columnspan=2, sticky="nsew")
-            self._image_enlarged = True
-
-    def _restore_layout(self):
-        self.img_label.grid(row=1, column=0, sticky="ew", pady=(8, 0))
-        self.text.grid(row=0, column=1, rowspan=2, sticky="nsew")
-        self._image_enlarged = False
-
-    # ═════════ NAVIGATION ═════════
-    def _go_back(self):
-        if self._image_enlarged:
-            self._restore_layout()
             return
-        if self.history:
-            self._open_doc(self.history.pop())
-        self.img_label.configure(image="")
-        self.img_label.grid_remove()
-        self._last_pil_img = None
-        self._last_tk_img = None
 
-    # ═════════ HELPERS ═════════
-    def _insert_link(self, text, doc_id):
-        idx = self.text.search(text, "1.0", tk.END)
-        if not idx:
+        if self.STREAM_REPLIES:
+            self._stream_ask(snippet, prefix, cid, sel_start, on_link_created, on_success)
             return
-        end_idx = f"{idx}+{len(text)}c"
-        self.text.delete(idx, end_idx)
-        self.text.insert(idx, f"[{text}](doc:{doc_id})")
-        body = self.text.get("1.0", tk.END)
-        hypertext_parser.parse_links(self.text, body, self._open_doc)
-        if self.current_doc_id:
-            self.doc_store.update_document(self.current_doc_id, body)
 
-    def _load_api_key(self):
-        key = simpledialog.askstring("API Key", "Paste OpenAI key:", show="*")
-        if key:
-            self.processor.ai.set_api_key(key.strip())
-
-    # ---------- Import ----------
-    def _import_doc(self):
-        path = filedialog.askopenfilename(title="Import text file")
-        if not path:
-            return
-        try:
-            text = Path(path).read_text(errors="ignore")
-            text = "".join(
-                ch for ch in text if 32 <= ord(ch) < 127 or ch in "\n\r\t"
+        def send(prompt):
+            entry_id = self.processor.journal_ask(
+                snippet, cid, prefix, sel_start=sel_start, sel_end=sel_start + len(snippet),
+                prompt=prompt,
             )
-            title = Path(path).name
-            new_id = self.doc_store.add_document(title, text)
-            self.logger.info(f"Imported doc {new_id}")
-            self._refresh_sidebar()
-        except Exception as exc:
-            messagebox.showerror("Import error", str(exc))
 
-    # ---------- Export ----------
-    def _export_doc(self):
-        if self.current_doc_id is None:
-            messagebox.showwarning("No document", "Nothing to export.")
-            return
-        path = filedialog.asksaveasfilename(
-            title="Export", defaultextension=".txt"
-        )
-        if not path:
-            return
-        try:
-            rec = self.doc_store.get_document(self.current_doc_id)
-            body = rec["body"] if isinstance(rec, dict) else rec[2]
-            Path(path).write_text(body)
-            self.logger.info(f"Exported doc {self.current_doc_id} -> {path}")
-        except Exception as exc:
-            messagebox.showerror("Export error", str(exc))
-
-
-if __name__ == "__main__":
-    from modules import document_store, command_processor
-
-    store = document_store.DocumentStore("storage/documents.db")
-    proc = command_processor.CommandProcessor(store)
-    DemoKitGUI(store, proc).mainloop()
-
-import os
-import threading
-import tkinter as tk
-from tkinter import ttk, filedialog, simpledialog, messagebox
-from pathlib import Path
-from PIL import ImageTk, Image
-
-from modules import hypertext_parser, image_generator
-from modules.logger import Logger
-
-
-class DemoKitGUI(tk.Tk):
-    """DemoKit GUI – ASK / IMAGE / BACK buttons, context menu, image overlay, and history."""
-
-    SIDEBAR_WIDTH = 320
-
-    # ───────── INITIALISATION ─────────
-    def __init__(self, doc_store, processor):
-        super().__init__()
-
-        # state
-        self.doc_store = doc_store
-        self.processor = processor
-        self.logger: Logger = getattr(processor, "logger", Logger())
-        self.current_doc_id: int | None = None
-        self.history: list[int] = []
+            def on_reply(result):
+                reply, latency = result
+                new_id = self.processor.complete_query(
+                    reply, snippet, cid, on_success, on_link_created,
+                    sel_start=sel_start, sel_end=sel_start + len(snippet),
+                    prefix=prefix, latency=latency,
+                )
+                self.processor.journal_done(entry_id, new_id)
+
+            self.ai_jobs.submit(
+                self.processor.run_query, prompt,
+                on_done=on_reply,
+                on_error=lambda exc: self._ask_failed(entry_id, exc),
+                on_cancel=lambda: self.processor.cancel_ask(entry_id),
+                label=snippet[:40].replace("\n", " "),
+            )
 
-        self._last_pil_img: Image | None = None
-        self._last_tk_img: ImageTk.PhotoImage | None = None
-        self._image_enlarged: bool = False
+        self._pack_ask(snippet, prefix, cid, send)
 
-        # window
-        self.title("Engelbart Journal – DemoKit")
-        self.geometry("1200x800")
-        self.columnconfigure(0, minsize=self.SIDEBAR_WIDTH, weight=0)
-        self.columnconfigure(1, weight=1)
-        self.rowconfigure(0, weight=1)
+    def _pack_ask(self, snippet, prefix, cid, on_prompt, on_failed=None):
+        """Build the ASK prompt on a worker, since packing context reads many documents,
+        then call `on_prompt(prompt)` on the Tk thread."""
+        def failed(exc):
+            if on_failed:
+                on_failed()
+            messagebox.showerror("AI error", f"Could not prepare the question: {exc}")
 
-        self._build_sidebar()
-        self._build_main_pane()
-        self._build_context_menu()
-
-        self._refresh_sidebar()
+        self.ai_jobs.submit(
+            self.processor.build_prompt_in_worker, snippet, prefix, cid,
+            on_done=on_prompt, on_error=failed, on_cancel=on_failed,
+            label=f"context: {snippet[:30]}".replace("\n", " "),
+        )
 
-    # ═════════ UI BUILDERS ═════════
-    def _build_sidebar(self):
-        frame = tk.Frame(self)
-        frame.grid(row=0, column=0, sticky="nswe")
-        self.sidebar = ttk.Treeview(
-            frame, columns=("ID", "Title", "Description"), show="headings"
+    def _stream_ask(self, snippet, prefix, cid, sel_start, on_link_created, on_success):
+        """Open the answer document immediately and append tokens as they arrive."""
+        writer = self.processor.start_streamed_reply(
+            snippet, cid, on_link_created,
+            sel_start=sel_start, sel_end=sel_start + len(snippet),
         )
-        for col, w in (("ID", 60), ("Title", 120), ("Description", 160)):
-            self.sidebar.heading(col, text=col)
-            self.sidebar.column(col, width=w, anchor="w", stretch=col == "Description")
-        self.sidebar.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        ttk.Scrollbar(frame, orient="vertical", command=self.sidebar.yview).pack(
-            side=tk.RIGHT, fill=tk.Y
+        self._open_doc(writer.doc_id)
+        self._pack_ask(snippet, prefix, cid,
+                       lambda prompt: self._send_streamed(prompt, writer, snippet, prefix, cid,
+                                                          sel_start, on_success),
+                       on_failed=lambda: self._discard_answer(cid, writer.doc_id))
+
+    def _send_streamed(self, prompt, writer, snippet, prefix, cid, sel_start, on_success):
+        entry_id = self.processor.journal_ask(
+            snippet, cid, prefix, sel_start=sel_start, sel_end=sel_start + len(snippet),
+            answer_id=writer.doc_id, prompt=prompt,
         )
-        self.sidebar.bind("<<TreeviewSelect>>", self._on_select)
-
-    def _build_main_pane(self):
-        pane = tk.Frame(self)
-        pane.grid(row=0, column=1, sticky="nswe", padx=4, pady=4)
-        pane.rowconfigure(0, weight=3)  # text 3/4
-        pane.rowconfigure(1, weight=1)  # image 1/4
-        pane.columnconfigure(0, weight=1)
-
-        # text
-        self.text = tk.Text(pane, wrap="word")
-        self.text.grid(row=0, column=0, sticky="nswe")
-        self.text.tag_configure("green_link", foreground="green", underline=True)
-        self.text.bind("<Button-3>", self._show_context_menu)
-
-        # image thumbnail / overlay
-        self.img_label = tk.Label(pane)
-        self.img_label.grid(row=1, column=0, sticky="ew", pady=(8, 0))
-        self.img_label.bind("<Button-1>", self._toggle_image)
 
-        # button row
-        btns = tk.Frame(pane)
-        btns.grid(row=2, column=0, sticky="we", pady=(6, 0))
-        for c in range(3):
-            btns.columnconfigure(c, weight=1)
-        ttk.Button(btns, text="ASK",   command=self._handle_ask).grid(row=0, column=0, sticky="we", padx=(0, 4))
-        ttk.Button(btns, text="BACK",  command=self._go_back).grid(row=0, column=1, sticky="we", padx=(0, 4))
-        ttk.Button(btns, text="IMAGE", command=self._handle_image).grid(row=0, column=2, sticky="we")
-
-    def _build_context_menu(self):
-        self.ctx_menu = tk.Menu(self, tearoff=0)
-        for lbl, fn in (
-            ("ASK", self._handle_ask),
-            ("IMAGE", self._handle_image),
-            ("Load API Key", self._load_api_key),
-        ):
-            self.ctx_menu.add_command(label=lbl, command=fn)
-        self.ctx_menu.add_separator()
-        self.ctx_menu.add_command(label="Import", command=self._import_doc)
-        self.ctx_menu.add_command(label="Export", command=self._export_doc)
-        self.ctx_menu.add_separator()
-        self.ctx_menu.add_command(label="Quit", command=self.destroy)
-
-    # alias for widget bindings
-    def _show_context_menu(self, event):
-        return self._show_ctx(event)
+        def on_item(fragment):
+            writer.append(fragment)
+            if self.current_doc_id == writer.doc_id:
+                self.text.insert("end-1c", fragment)
+                self.text.see(tk.END)
+
+        def on_done(_):
+            self.processor.finish_streamed_reply(writer, snippet, on_success, prefix)
+            self.processor.journal_done(entry_id, writer.doc_id)
+            if self.current_doc_id == writer.doc_id:
+                body = "".join(writer.parts).strip()
+                self.text.delete("1.0", tk.END)
+                self.text.insert("1.0", body)
+                hypertext_parser.parse_links(self.text, body, self._open_doc)
+
+        def on_error(exc):
+            writer.finish()
+            self._ask_failed(entry_id, exc, writer.doc_id, cid)
+
+        def on_cancel():
+            self.processor.cancel_ask(entry_id)
+            self._discard_answer(cid, writer.doc_id)
+
+        self.ai_jobs.submit_stream(
+            self.processor.ai.query, prompt,
+            stream=True, on_item=on_item, on_done=on_done, on_error=on_error,
+            on_cancel=on_cancel, label=snippet[:40].replace("\n", " "),
+        )
 
-    def _show_ctx(self, event):
-        try:
-            (self.ctx_menu.tk_popup if hasattr(self.ctx_menu, "tk_popup") else self.ctx_menu.post)(
-                event.x_root, event.y_root
-            )
-        finally:
-            self.ctx_menu.grab_release()
+    def _ask_failed(self, entry_id, exc, answer_id=None, source_id=None):
+        if not self.processor.defer_ask(entry_id, exc, answer_id):
+            if answer_id:
+                self._discard_answer(source_id, answer_id)
+            messagebox.showerror("AI error", str(exc))
+            return
+        if answer_id and self.current_doc_id == answer_id:
+            self._open_doc(answer_id)
+        self._update_ai_progress(self.ai_jobs.in_flight())
+        messagebox.showinfo(
+            "ASK queued",
+            f"The AI backend is unreachable ({exc}).\n"
+            "Your question was saved and will be sent automatically once it is back.",
+        )
 
-    # ═════════ SIDEBAR / DOC VIEW ═════════
-    def _refresh_sidebar(self):
-        self.sidebar.delete(*self.sidebar.get_children())
-        for rec in self.doc_store.get_document_index():
-            self.sidebar.insert(
-                "", "end", values=(rec["id"], rec["title"], rec["description"])
+    def _discard_answer(self, source_id, answer_id):
+        """Drop the answer document of a streamed ASK that will never be answered."""
+        self.processor.discard_reply(source_id, answer_id)
+        if self.current_doc_id == answer_id:
+            self.current_doc_id = None   # gone; don't keep it in the history
+        if source_id and self.current_doc_id in (None, source_id):
+            self._open_doc(source_id)    # shows the selection without its link
+
+    def _poll_ask_queue(self):
+        self._replay_queued()
+        self.after(self.REPLAY_CHECK_MS, self._poll_ask_queue)
+
+    def _replay_queued(self):
+        """Resend queued ASKs, at most REPLAY_WORKERS at a time, while the backend is up."""
+        if not self.processor.ai.available():
+            return
+        free = self.REPLAY_WORKERS - len(self._replaying)
+        for entry in self.processor.claim_queued(free) if free > 0 else []:
+            self._replaying.add(entry["id"])
+            self.ai_jobs.submit(
+                self.processor.run_query, entry["prompt"],
+                on_done=lambda result, e=entry: self._replay_done(e, *result),
+                on_error=lambda exc, e=entry: self._replay_failed(e, exc),
+                on_cancel=lambda e=entry: self._replay_cancelled(e),
+                label=f"(queued) {entry['selected_text'][:30]}".replace("\n", " "),
             )
 
-    def _on_select(self, _evt=None):
-        sel = self.sidebar.selection()
-        if sel:
-            doc_id = int(self.sidebar.item(sel[0])["values"][0])
-            self._open_doc(doc_id)
+    def _replay_done(self, entry, reply, latency):
+        self._replaying.discard(entry["id"])
 
-    def _open_doc(self, doc_id: int):
-        if self._image_enlarged:
-            self._restore_layout()
-        if self.current_doc_id and doc_id != self.current_doc_id:
-            self.history.append(self.current_doc_id)
-        rec = self.doc_store.get_document(doc_id)
-        if not rec:
-            return
-        self.current_doc_id = doc_id
-        body = rec["body"] if isinstance(rec, dict) else rec[2]
-        self.text.delete("1.0", tk.END)
-        self.text.insert("1.0", body)
-        hypertext_parser.parse_links(self.text, body, self._open_doc)
+        def on_link_created(link_md, start):
+            if self.current_doc_id == entry["doc_id"]:
+                self._apply_link(start, len(entry["selected_text"]), link_md)
 
-    # ═════════ ASK / IMAGE ═════════
-    def _handle_ask(self):
-        if not self.text.tag_ranges(tk.SEL):
-            messagebox.showwarning("No selection", "Select text first.")
-            return
-        snippet = self.text.get(tk.SEL_FIRST, tk.SEL_LAST)
-        prefix = simpledialog.askstring(
-            "Prompt", "Edit prompt:", initialvalue="Please expand on this: "
+        new_id = self.processor.complete_queued(
+            entry, reply, latency, lambda _id: None, on_link_created
         )
-        if prefix is None:
-            return
-        full_prompt = prefix + snippet
-        cid = self.current_doc_id
-
-        def on_success(new_id):
-            self.logger.info(f"AI reply stored as doc {new_id}")
-            self._refresh_sidebar()
-            self._insert_link(snippet, new_id)
-
-        self.processor.query_ai(
-            full_prompt, cid, on_success=on_success, on_link_created=lambda _: None
+        if self.current_doc_id == new_id:
+            self._open_doc(new_id)
+        self._replay_queued()
+
+    def _replay_failed(self, entry, exc):
+        self._replaying.discard(entry["id"])
+        if self.processor.defer_ask(entry["id"], exc):
+            return  # still offline; the next poll tries again
+        self.logger.error(f"Queued ASK {entry['id']} failed: {exc}")
+        if entry.get("answer_id"):
+            self._discard_answer(entry.get("doc_id"), entry["answer_id"])
+        self._replay_queued()
+
+    def _replay_cancelled(self, entry):
+        self._replaying.discard(entry["id"])
+        self.processor.cancel_ask(entry["id"])
+        if entry.get("answer_id"):
+            self._discard_answer(entry.get("doc_id"), entry["answer_id"])
+
+    def _offer_cached_answer(self, hit) -> bool:
+        saved = self.processor.semantic_cache.stats()
+        return messagebox.askyesno(
+            "Similar question",
+            f"This was asked before as:\n\n“{hit['prompt']}”\n\n"
+            f"Answer is doc {hit['doc_id']} ({hit['score']:.0%} similar, "
+            f"took {hit['latency'] or 0:.1f}s). Link to it instead of asking again?\n\n"
+            f"Reused answers so far: {saved['saved_calls']} API calls, "
+            f"{saved['saved_seconds']:.1f}s saved.",
         )
 
-    def _handle_image(self):
+    def _update_ai_progress(self, in_flight: int):
+        queued = len(self.processor.pending_asks())
+        if in_flight:
+            text = f"{in_flight} AI job{'s' if in_flight > 1 else ''}"
+            self.ai_status.configure(text=text + (f", {queued} queued" if queued else ""))
+            self.ai_progress.grid(row=1, column=0, sticky="we", pady=(4, 0), padx=(0, 4))
+            self.ai_status.grid(row=1, column=1, sticky="we", pady=(4, 0))
+            self.ai_cancel.grid(row=1, column=2, sticky="e", pady=(4, 0))
+            self.ai_progress.start(15)
+        else:
+            self.ai_progress.stop()
+            for w in (self.ai_progress, self.ai_cancel):
+                w.grid_remove()
+            if queued:
+                self.ai_status.configure(text=f"{queued} ASK{'s' if queued > 1 else ''} queued (offline)")
+                self.ai_status.grid(row=1, column=1, sticky="we", pady=(4, 0))
+            else:
+                self.ai_status.grid_remove()
+
+    @staticmethod
+    def _fill_cancel_menu(menu, executor):
+        menu.delete(0, tk.END)
+        for job_id, label in executor.jobs():
+            menu.add_command(label=f"#{job_id} {label}", command=lambda j=job_id: executor.cancel(j))
+        menu.add_separator()
+        menu.add_command(label="Cancel all", command=executor.cancel_all)
+
+    def _handle_image(self, n: int = 1):
         if not self.text.tag_ranges(tk.SEL):
             messagebox.showwarning("No selection", "Select text first.")
             return
         prompt = self.text.get(tk.SEL_FIRST, tk.SEL_LAST).strip()
-        if not prompt:
+        if prompt:
+            self._submit_image(prompt, n, show=True)
+
+    def _illustrate_headings(self):
+        """Queue one image per markdown heading of the current document."""
+        rec = self.doc_store.get_document(self.current_doc_id) if self.current_doc_id else None
+        titles = list(dict.fromkeys(headings(rec["body"]))) if rec else []
+        if not titles:
+            messagebox.showinfo("Illustrate Headings", "This document has no markdown headings.")
             return
+        for title in titles:
+            self._submit_image(title)
+
+    def _submit_image(self, prompt: str, n: int = 1, show: bool = False):
+        """Queue *n* variants of *prompt*; they land in the gallery (and the pane if *show*)."""
+        self._images_submitted += 1
+        self.image_jobs.submit(
+            self._render_images, prompt, n, self.processor.ai.backend, self._image_boxes(),
+            on_done=lambda results: self._add_to_gallery(results, show),
+            on_error=lambda exc: self._image_failed(prompt, exc, show),
+            label=(f"{prompt[:30]} ×{n}" if n > 1 else prompt[:30]).replace("\n", " "),
+        )
 
-        def worker():
-            try:
-                pil_img = image_generator.generate_image(prompt)
-                tk_img = ImageTk.PhotoImage(pil_img)
-                self.after(0, lambda: self._show_image(tk_img, pil_img))
-            except Exception as exc:
-                self.after(
-                    0, lambda: messagebox.showerror("Image error", str(exc))
-                )
-
-        threading.Thread(target=worker, daemon=True).start()
+    def _image_failed(self, prompt, exc, show):
+        self.logger.error(f"Image for {prompt[:40]!r} failed: {exc}")
+        if show:
+            messagebox.showerror("Image error", str(exc))
+
+    def _image_boxes(self) -> dict:
+        """Target sizes, measured now on the main thread: the strip under the text and the whole pane."""
+        pane = self.text.master
+        width, height = max(pane.winfo_width(), 200), max(pane.winfo_height(), 200)
+        return {image_pipeline.THUMBNAIL: (width, max(height // 4 - 8, 64)),
+                image_pipeline.FIT: (width, height)}
+
+    @staticmethod
+    def _render_images(prompt, n, backend, boxes):
+        """Worker side: fetch (or load from cache) *n* variants and decode every rendition."""
+        boxes = dict(boxes, **{image_pipeline.TILE: image_pipeline.TILE_BOX})
+        return [(data, image_pipeline.renditions.render(data, boxes))
+                for data in image_generator.image_variants(prompt, n=n, backend=backend)]
+
+    def _add_to_gallery(self, results, show: bool):
+        for result in results:
+            tk_img = ImageTk.PhotoImage(result[1][image_pipeline.TILE])
+            tile = tk.Label(self.gallery_tiles, image=tk_img, borderwidth=1, relief="solid")
+            tile.image = tk_img
+            tile.bind("<Button-1>", lambda _e, r=result: self._show_image(r))
+            tile.pack(side=tk.LEFT, padx=(0, 4))
+            self._gallery.append(tile)
+        while len(self._gallery) > self.GALLERY_SIZE:
+            self._gallery.pop(0).destroy()
+        self._update_image_progress(self.image_jobs.in_flight())
+        if show and results:
+            self._show_image(results[0])
+
+    def _update_image_progress(self, in_flight: int):
+        for w in (self.image_cancel, self.image_status, self.image_progress):
+            w.pack_forget()
+        if in_flight:
+            done = self._images_submitted - in_flight
+            self.image_progress.configure(maximum=self._images_submitted, value=done)
+            self.image_status.configure(text=f"Images {done}/{self._images_submitted}")
+            self.image_cancel.pack(side=tk.RIGHT)
+            self.image_status.pack(side=tk.RIGHT, padx=4)
+            self.image_progress.pack(side=tk.RIGHT)
+        else:
+            self._images_submitted = 0
+        if in_flight or self._gallery:
+            self.gallery.grid(row=2, column=0, sticky="we", pady=(6, 0))
+        else:
+            self.gallery.grid_remove()
 
-    def _show_image(self, tk_img, pil_img):
-        self._last_pil_img = pil_img
-        self._last_tk_img = tk_img
-        self._image_enlarged = False
+    def _show_image(self, result):
+        self._image_bytes, self._renditions = result
+        self._tk_images = {}
+        if self._image_enlarged:
+            self._restore_layout()
         self.img_label.grid(row=1, column=0, sticky="ew", pady=(8, 0))
+        self._set_image(image_pipeline.THUMBNAIL)
+
+    def _set_image(self, name: str):
+        """Show rendition *name*, creating its PhotoImage only the first time."""
+        tk_img = self._tk_images.get(name)
+        if tk_img is None:
+            tk_img = self._tk_images[name] = ImageTk.PhotoImage(self._renditions[name])
         self.img_label.configure(image=tk_img)
         self.img_label.image = tk_img
 
     def _toggle_image(self, _=None):
-        if self._last_pil_img is None:
+        if self._image_bytes is None:
             return
         if self._image_enlarged:
             default = f"doc_{self.current_doc_id or 'unknown'}_image.png"
@@ -491,18 +811,78 @@ class DemoKitGUI(tk.Tk):
                 initialdir=str(Path.home()),
             )
             if path:
-                self._last_pil_img.save(path)
+                self.tasks.submit(
+                    self._save_image, self._image_bytes, path,
+                    on_done=lambda _: self.logger.info(f"Saved image to {path}"),
+                    on_error=lambda exc: messagebox.showerror("Save error", str(exc)),
+                    label=f"save {Path(path).name}",
+                )
             self._restore_layout()
         else:
             self.text.grid_remove()
             self.img_label.grid(row=0, column=0, columnspan=2, sticky="nsew")
+            self._set_image(image_pipeline.FIT)
             self._image_enlarged = True
 
+    @staticmethod
+    def _save_image(data, path):
+        Image.open(io.BytesIO(data)).save(path)
+
     def _restore_layout(self):
         self.img_label.grid(row=1, column=0, sticky="ew", pady=(8, 0))
         self.text.grid(row=0, column=1, rowspan=2, sticky="nsew")
+        if self._renditions:
+            self._set_image(image_pipeline.THUMBNAIL)
         self._image_enlarged = False
 
+    # ═════════ TASKS / STATUS BAR ═════════
+    def _executors(self):
+        return (self.tasks, self.ai_jobs, self.image_jobs, self.preview_jobs)
+
+    def _update_status_bar(self, _in_flight=None):
+        running = [label for jobs in self._executors() for _, label in jobs.jobs()]
+        if running:
+            more = f" (+{len(running) - 1} more)" if len(running) > 1 else ""
+            self.status_label.configure(text=f"Working: {running[0]}{more}", fg="black")
+        elif self._status_note:
+            self.status_label.configure(text=self._status_note, fg="firebrick")
+        else:
+            self.status_label.configure(text="Ready", fg="black")
+
+    def _note(self, text: str):
+        """Show *text* in the status bar for STATUS_NOTE_MS (while no task is running)."""
+        self._status_note = text
+        self._update_status_bar()
+
+        def clear():
+            if self._status_note == text:
+                self._status_note = None
+                self._update_status_bar()
+        self.after(self.STATUS_NOTE_MS, clear)
+
+    def _task_failed(self, label, exc):
+        self._last_error = f"{label or 'Task'} failed:\n{type(exc).__name__}: {exc}"
+        self._note(f"{label or 'Task'} failed: {exc} (click for details)")
+
+    def _on_stall(self, ms, where):
+        self._note(f"UI blocked for {ms:.0f} ms in {where}")
+
+    def _show_last_error(self, _=None):
+        if self._last_error:
+            messagebox.showerror("Task error", self._last_error)
+
+    def _fill_tasks_menu(self):
+        self.tasks_menu.delete(0, tk.END)
+        for jobs in self._executors():
+            for job_id, label in jobs.jobs():
+                self.tasks_menu.add_command(
+                    label=label or f"#{job_id}", command=lambda j=jobs, i=job_id: j.cancel(i)
+                )
+        self.tasks_menu.add_separator()
+        self.tasks_menu.add_command(
+            label="Cancel all", command=lambda: [jobs.cancel_all() for jobs in self._executors()]
+        )
+
     # ═════════ NAVIGATION ═════════
     def _go_back(self):
         if self._image_enlarged:
@@ -512,21 +892,57 @@ class DemoKitGUI(tk.Tk):
             self._open_doc(self.history.pop())
         self.img_label.configure(image="")
         self.img_label.grid_remove()
-        self._last_pil_img = None
-        self._last_tk_img = None
+        self._image_bytes = None
+        self._renditions = {}
+        self._tk_images = {}
 
     # ═════════ HELPERS ═════════
-    def _insert_link(self, text, doc_id):
-        idx = self.text.search(text, "1.0", tk.END)
-        if not idx:
+    def _char_offset(self, index) -> int:
+        """Character offset of a Text *index* from the start of the buffer."""
+        counted = self.text.count("1.0", index, "chars")
+        return counted[0] if counted else 0
+
+    def _apply_link(self, start: int, length: int, link_md: str):
+        """Swap the span for its already-stored link markdown in one widget op."""
+        match = hypertext_parser.LINK_PATTERN.fullmatch(link_md)
+        if not match:
             return
-        end_idx = f"{idx}+{len(text)}c"
-        self.text.delete(idx, end_idx)
-        self.text.insert(idx, f"[{text}](doc:{doc_id})")
-        body = self.text.get("1.0", tk.END)
-        hypertext_parser.parse_links(self.text, body, self._open_doc)
-        if self.current_doc_id:
-            self.doc_store.update_document(self.current_doc_id, body)
+        first, last = f"1.0+{start}c", f"1.0+{start + length}c"
+        if self.text.get(first, last) != match.group(1):
+            return  # widget edited since the ASK was sent
+        tags = hypertext_parser.link_tags(self.text, match.group(2), self._open_doc)
+        self.text.replace(first, last, link_md, tags)
+
+    def _show_ai_status(self):
+        self.tasks.submit(self._collect_ai_status, on_done=self._present_ai_status,
+                          label="AI status")
+
+    def _collect_ai_status(self):
+        """Worker side: the metrics DB query and cache stats; no widgets touched."""
+        today = None
+        if self.processor.ai.call_log is not None:
+            today = self.processor.ai.call_log.summary(days=1)
+        return self.processor.ai.metrics(), image_generator.default_cache().stats(), today
+
+    def _present_ai_status(self, result):
+        m, images, today = result
+        latency = ""
+        if today is not None:
+            p = today["latency"]
+            latency = (f"\nLast 24h: {today['upstream']} API calls, latency p50 {p[50]:.1f}s "
+                       f"p95 {p[95]:.1f}s p99 {p[99]:.1f}s, first token p50 {today['ttft'][50]:.1f}s")
+        messagebox.showinfo(
+            "AI Status",
+            f"Backend circuit: {m['breaker_state']} (opened {m['breaker_opened']}x, "
+            f"{m['consecutive_failures']} consecutive failures)\n"
+            f"Calls: {m['calls']}  Retries: {m['retries']}  "
+            f"Failed: {m['failures']}  Refused while open: {m['short_circuited']}\n"
+            f"Duplicate requests coalesced: {m['coalesced']} replies, "
+            f"{image_generator.inflight.stats()['coalesced']} images\n"
+            f"Image cache: {images['entries']} images, {images['bytes'] / 1e6:.1f} MB, "
+            f"{images['hits']} hits / {images['misses']} misses\n"
+            f"UI stalls over {self.STALL_MS} ms: {self.pump.stalls}" + latency,
+        )
 
     def _load_api_key(self):
         key = simpledialog.askstring("API Key", "Paste OpenAI key:", show="*")
@@ -538,17 +954,26 @@ class DemoKitGUI(tk.Tk):
         path = filedialog.askopenfilename(title="Import text file")
         if not path:
             return
-        try:
-            text = Path(path).read_text(errors="ignore")
-            text = "".join(
-                ch for ch in text if 32 <= ord(ch) < 127 or ch in "\n\r\t"
-            )
-            title = Path(path).name
-            new_id = self.doc_store.add_document(title, text)
-            self.logger.info(f"Imported doc {new_id}")
-            self._refresh_sidebar()
-        except Exception as exc:
-            messagebox.showerror("Import error", str(exc))
+        self.tasks.submit(
+            self._read_import, path,
+            on_done=self._store_import,
+            on_error=lambda exc: messagebox.showerror("Import error", str(exc)),
+            label=f"import {Path(path).name}",
+        )
+
+    @staticmethod
+    def _read_import(path):
+        """Worker side: read and clean the file; the store write happens on the Tk thread."""
+        text = Path(path).read_text(errors="ignore")
+        text = "".join(
+            ch for ch in text if 32 <= ord(ch) < 127 or ch in "\n\r\t"
+        )
+        return Path(path).name, text
+
+    def _store_import(self, result):
+        title, text = result
+        new_id = self.doc_store.add_document(title, text)
+        self.logger.info(f"Imported doc {new_id}")
 
     # ---------- Export ----------
     def _export_doc(self):
@@ -560,13 +985,16 @@ class DemoKitGUI(tk.Tk):
         )
         if not path:
             return
-        try:
-            rec = self.doc_store.get_document(self.current_doc_id)
-            body = rec["body"] if isinstance(rec, dict) else rec[2]
-            Path(path).write_text(body)
-            self.logger.info(f"Exported doc {self.current_doc_id} -> {path}")
-        except Exception as exc:
-            messagebox.showerror("Export error", str(exc))
+        rec = self.doc_store.get_document(self.current_doc_id)
+        if not rec:
+            return
+        doc_id = self.current_doc_id
+        self.tasks.submit(
+            Path(path).write_text, rec["body"] or "",
+            on_done=lambda _: self.logger.info(f"Exported doc {doc_id} -> {path}"),
+            on_error=lambda exc: messagebox.showerror("Export error", str(exc)),
+            label=f"export {Path(path).name}",
+        )
 
 
 if __name__ == "__main__":
@@ -575,4 +1003,3 @@ if __name__ == "__main__":
     store = document_store.DocumentStore("storage/documents.db")
     proc = command_processor.CommandProcessor(store)
     DemoKitGUI(store, proc).mainloop()
-
@@ -0,0 +1,181 @@
+"""
+Shared HTTP client for every outbound call (AI backends, image downloads,
+Facebook, Google Drive).
+
+One process-wide `requests.Session` keeps connections alive, so repeated
+calls to the same host reuse their TCP/TLS connection instead of
+reconnecting. When `httpx` with HTTP/2 support (the `h2` package) is
+installed, requests go over a shared HTTP/2 client instead, multiplexing
+concurrent calls on one connection per host. Set PIKIT_HTTP2=0 to stay on
+HTTP/1.1.
+
+Pool size and timeouts come from PIKIT_HTTP_POOL_SIZE (default 16),
+PIKIT_HTTP_CONNECT_TIMEOUT (5 s) and PIKIT_HTTP_READ_TIMEOUT (60 s), or
+from `configure()`.
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_settings = {
+    "pool_size": int(os.environ.get("PIKIT_HTTP_POOL_SIZE", 16)),
+    "connect_timeout": float(os.environ.get("PIKIT_HTTP_CONNECT_TIMEOUT", 5)),
+    "read_timeout": float(os.environ.get("PIKIT_HTTP_READ_TIMEOUT", 60)),
+    "http2": os.environ.get("PIKIT_HTTP2", "1") != "0",
+}
+_lock = threading.Lock()
+_session = None
+_h2_client = None
+_h2_checked = False
+
+
+class TransportError(ConnectionError):
+    """The request never got an HTTP response (DNS, connect, TLS, reset)."""
+
+
+class RequestTimeout(TimeoutError):
+    """Connecting or reading took longer than the timeout."""
+
+
+def configure(pool_size: int = None, connect_timeout: float = None, read_timeout: float = None,
+              http2: bool = None):
+    """Change pool size, default timeouts or HTTP/2 use; open clients are rebuilt."""
+    global _session, _h2_client, _h2_checked
+    for key, value in (("pool_size", pool_size), ("connect_timeout", connect_timeout),
+                       ("read_timeout", read_timeout), ("http2", http2)):
+        if value is not None:
+            _settings[key] = value
+    with _lock:
+        old = (_session, _h2_client)
+        _session, _h2_client, _h2_checked = None, None, False
+    for client in old:
+        if client is not None:
+            client.close()
+
+
+def default_timeout():
+    return (_settings["connect_timeout"], _settings["read_timeout"])
+
+
+def _timeout(timeout):
+    if timeout is None:
+        return default_timeout()
+    if isinstance(timeout, (int, float)):
+        # A single number bounds the read; connecting keeps the short default
+        return (min(_settings["connect_timeout"], timeout), timeout)
+    return timeout
+
+
+def session() -> requests.Session:
+    """The shared keep-alive session (also handed to the openai SDK)."""
+    global _session
+    with _lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=_settings["pool_size"],
+                                  pool_maxsize=_settings["pool_size"])
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+        return _session
+
+
+def http2_client():
+    """A shared HTTP/2 `httpx.Client`, or None if httpx/h2 are not installed."""
+    global _h2_client, _h2_checked
+    with _lock:
+        if not _h2_checked:
+            _h2_checked = True
+            if _settings["http2"]:
+                try:
+                    import h2  # noqa: F401  (httpx needs it for http2=True)
+                    import httpx
+                    _h2_client = httpx.Client(
+                        http2=True,
+                        limits=httpx.Limits(max_connections=_settings["pool_size"],
+                                            max_keepalive_connections=_settings["pool_size"]),
+                    )
+                except ImportError:
+                    _h2_client = None
+        return _h2_client
+
+
+class Response:
+    """The parts of a requests/httpx response the callers use."""
+
+    def __init__(self, raw, streamed_httpx: bool = False):
+        self.raw = raw
+        self.status_code = raw.status_code
+        self.headers = dict(raw.headers)
+        self._streamed_httpx = streamed_httpx
+
+    def _read(self):
+        if self._streamed_httpx:
+            self.raw.read()
+            self._streamed_httpx = False
+
+    @property
+    def content(self) -> bytes:
+        self._read()
+        return self.raw.content
+
+    @property
+    def text(self) -> str:
+        self._read()
+        return self.raw.text
+
+    def json(self):
+        self._read()
+        return self.raw.json()
+
+    def iter_lines(self):
+        """Decoded lines of a streamed body."""
+        if hasattr(self.raw, "iter_content"):
+            return self.raw.iter_lines(decode_unicode=True)
+        return self.raw.iter_lines()
+
+    def iter_bytes(self, chunk_size: int = 64 * 1024):
+        if hasattr(self.raw, "iter_content"):
+            return self.raw.iter_content(chunk_size)
+        return self.raw.iter_bytes(chunk_size)
+
+    def close(self):
+        self.raw.close()
+
+
+def request(method: str, url: str, timeout=None, stream: bool = False, **kwargs) -> Response:
+    """Send a request over the shared pool.
+
+    Connection failures raise `TransportError` and timeouts `RequestTimeout`
+    (a ConnectionError and a TimeoutError), so retry logic can tell them
+    apart from HTTP error statuses, which are returned, not raised.
+    """
+    timeout = _timeout(timeout)
+    client = http2_client()
+    if client is not None:
+        import httpx
+        try:
+            req = client.build_request(
+                method, url, timeout=httpx.Timeout(timeout[1], connect=timeout[0]), **kwargs
+            )
+            return Response(client.send(req, stream=stream), streamed_httpx=stream)
+        except httpx.TimeoutException as exc:
+            raise RequestTimeout(f"{method} {url}: {exc}") from exc
+        except httpx.TransportError as exc:
+            raise TransportError(f"{method} {url}: {exc}") from exc
+    try:
+        return Response(session().request(method, url, timeout=timeout, stream=stream, **kwargs))
+    except requests.Timeout as exc:
+        raise RequestTimeout(f"{method} {url}: {exc}") from exc
+    except requests.ConnectionError as exc:
+        raise TransportError(f"{method} {url}: {exc}") from exc
+
+
+def get(url: str, **kwargs) -> Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> Response:
+    return request("POST", url, **kwargs)
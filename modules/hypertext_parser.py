@@ -4,6 +4,20 @@ import tkinter as tk
 LINK_PATTERN = re.compile(r"\[([^\]]+)]\(doc:(\d+)\)")
 
 
+def link_tags(text_widget: tk.Text, doc_id, on_open_doc) -> tuple:
+    """Return the tags for a link to *doc_id*, binding its click handler.
+
+    Every link carries the shared `link` style tag plus a per-target
+    `doc:<id>` tag, so each span opens its own document rather than the one
+    bound last.
+    """
+    target_tag = f"doc:{int(doc_id)}"
+    text_widget.tag_bind(
+        target_tag, "<Button-1>", lambda _evt, _did=int(doc_id): on_open_doc(_did)
+    )
+    return ("link", target_tag)
+
+
 def parse_links(text_widget: tk.Text, raw_text: str, on_open_doc):
     """Scan *raw_text* for markdown links like `[label](doc:123)`.
 
@@ -21,10 +35,5 @@ def parse_links(text_widget: tk.Text, raw_text: str, on_open_doc):
         end_idx = f"1.0+{match.end()}c"
 
         # Tag this span so it appears as a clickable link
-        text_widget.tag_add("link", start_idx, end_idx)
-
-        # Need a closure to capture doc_id for each match
-        def _make_callback(did):
-            return lambda _evt, _did=did: on_open_doc(int(_did))
-
-        text_widget.tag_bind("link", "<Button-1>", _make_callback(doc_id))
+        for tag in link_tags(text_widget, doc_id, on_open_doc):
+            text_widget.tag_add(tag, start_idx, end_idx)
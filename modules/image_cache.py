@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from modules.logger import Logger
+
+
+class ImageCache:
+    """Generated images on disk, keyed by (model, prompt, size, variant).
+
+    Image bytes are stored as one file per key under *directory*; a small
+    SQLite index tracks sizes and last access so the least recently used
+    files are deleted once the total exceeds *max_bytes*.
+    """
+
+    def __init__(self, directory="storage/image_cache", max_bytes: int = None, logger=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("PIKIT_IMAGE_CACHE_MB", 200)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.logger = logger or Logger()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            "key TEXT PRIMARY KEY, model TEXT, prompt TEXT, size TEXT, bytes INTEGER, "
+            "created_at REAL, last_access REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS images_lru ON images (last_access)")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, size: str, variant: int = 0) -> str:
+        """Key of image *variant* of an `n > 1` request; variant 0 is the single image."""
+        parts = [model, " ".join(prompt.split()), size] + ([variant] if variant else [])
+        raw = json.dumps(parts)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.img")
+
+    def get(self, key: str):
+        """Cached image bytes for *key*, or None."""
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = None
+        with self._lock:
+            if data is None:
+                self.conn.execute("DELETE FROM images WHERE key = ?", (key,))
+                self.conn.commit()
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE images SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            self.hits += 1
+        return data
+
+    def put(self, key: str, model: str, prompt: str, size: str, data: bytes):
+        # Write then rename, so a crash never leaves a truncated image behind;
+        # the temp name is unique, so concurrent writers never share it
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, prompt, size, len(data), now, now)
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM images").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self.conn.execute("SELECT key, bytes FROM images ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM images WHERE key = ?", victims)
+        for (key,) in victims:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+        self.logger.info(f"Image cache evicted {len(victims)} images")
+
+    def clear(self):
+        with self._lock:
+            keys = [k for (k,) in self.conn.execute("SELECT key FROM images")]
+            self.conn.execute("DELETE FROM images")
+            self.conn.commit()
+            for key in keys:
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+        self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM images"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
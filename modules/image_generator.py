@@ -1,11 +1,62 @@
 import io
-import requests
-import openai
 from PIL import Image
 
-def generate_image(prompt: str, size: str = "512x512"):
-    """Generate a DALL·E image and return as PIL.Image."""
-    resp = openai.Image.create(prompt=prompt, n=1, size=size)
-    url = resp["data"][0]["url"]
-    img_bytes = requests.get(url, timeout=20).content
-    return Image.open(io.BytesIO(img_bytes))
+from modules.ai_backends import backend_from_env
+from modules.image_cache import ImageCache
+from modules.single_flight import SingleFlight
+
+_default_backend = None
+_default_cache = None
+# Concurrent requests for the same image share one upstream call
+inflight = SingleFlight()
+
+
+def default_cache() -> ImageCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ImageCache()
+    return _default_cache
+
+
+def generate_image(prompt: str, size: str = "512x512", backend=None, cache=None):
+    """Generate an image with *backend* (DALL·E by default) and return it as PIL.Image."""
+    return Image.open(io.BytesIO(image_bytes(prompt, size, backend, cache)))
+
+
+def image_bytes(prompt: str, size: str = "512x512", backend=None, cache=None) -> bytes:
+    """Encoded bytes of the image for *prompt*, as returned by the backend."""
+    return image_variants(prompt, size, 1, backend, cache)[0]
+
+
+def image_variants(prompt: str, size: str = "512x512", n: int = 1, backend=None,
+                   cache=None) -> list:
+    """Encoded bytes of *n* images for *prompt*, drawn in a single backend call.
+
+    Images are served from *cache* (the shared on-disk `ImageCache` when
+    None) if this backend already drew all *n* variants of *prompt* at
+    *size*; pass ``cache=False`` to always call the backend.
+    """
+    global _default_backend
+    if backend is None:
+        if _default_backend is None:
+            _default_backend = backend_from_env()
+        backend = _default_backend
+    if cache is None:
+        cache = default_cache()
+    model = f"{backend.name}/{backend.image_model}"
+    if cache:
+        keys = [ImageCache.make_key(model, prompt, size, i) for i in range(n)]
+        images = [cache.get(key) for key in keys]
+        if all(data is not None for data in images):
+            return images
+    return inflight.do((id(backend), prompt, size, n), _fetch, backend, prompt, size, n,
+                       cache, model)
+
+
+def _fetch(backend, prompt, size, n, cache=None, model=""):
+    """Single-flight leader: one backend call, and only this thread writes the cache."""
+    images = backend.image(prompt, size=size, n=n, timeout=20 + 10 * (n - 1))
+    if cache:
+        for i, data in enumerate(images):
+            cache.put(ImageCache.make_key(model, prompt, size, i), model, prompt, size, data)
+    return images
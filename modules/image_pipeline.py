@@ -0,0 +1,89 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+THUMBNAIL = "thumbnail"
+FIT = "fit"
+TILE = "tile"         # gallery strip
+TILE_BOX = (96, 96)
+
+
+def decode_scaled(data: bytes, box) -> Image.Image:
+    """Decode *data* straight to at most *box* (width, height), keeping the aspect ratio.
+
+    JPEGs are decoded at reduced scale with `draft()` (the DCT does the
+    downsampling), anything else is shrunk by an integer factor with
+    `reduce()` before the final high-quality resample, so large images are
+    never resampled at full resolution.
+    """
+    img = Image.open(io.BytesIO(data))
+    img.draft("RGB", box)
+    factor = min(img.width // max(box[0], 1), img.height // max(box[1], 1))
+    if factor >= 2:
+        img = img.reduce(factor)
+    else:
+        img.load()
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+    if img.width > box[0] or img.height > box[1]:
+        img.thumbnail(box, Image.LANCZOS)
+    return img
+
+
+def render(data: bytes, boxes: dict) -> dict:
+    """Renditions of *data* for every `name -> (width, height)` in *boxes*.
+
+    The image is decoded once, at the largest box; smaller renditions are
+    resampled from that rather than from the original.
+    """
+    order = sorted(boxes, key=lambda name: boxes[name][0] * boxes[name][1], reverse=True)
+    largest = decode_scaled(data, boxes[order[0]])
+    out = {order[0]: largest}
+    for name in order[1:]:
+        img = largest.copy()
+        img.thumbnail(boxes[name], Image.LANCZOS)
+        out[name] = img
+    return out
+
+
+class RenditionCache:
+    """Decoded, downsampled images keyed by (image content, name, box).
+
+    Thread-safe, so workers can fill it while the Tk thread reads it; the
+    least recently used renditions are dropped past *max_items*.
+    """
+
+    def __init__(self, max_items: int = 64):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha1(data).hexdigest()
+
+    def render(self, data: bytes, boxes: dict, digest: str = None) -> dict:
+        """Like `render()`, decoding only if some rendition is not cached yet."""
+        digest = digest or self.digest(data)
+        keys = {name: (digest, name, tuple(box)) for name, box in boxes.items()}
+        with self._lock:
+            found = {name: self._items[k] for name, k in keys.items() if k in self._items}
+            for k in keys.values():
+                if k in self._items:
+                    self._items.move_to_end(k)
+        missing = {name: boxes[name] for name in boxes if name not in found}
+        if missing:
+            fresh = render(data, missing)
+            with self._lock:
+                for name, img in fresh.items():
+                    self._items[keys[name]] = img
+                while len(self._items) > self.max_items:
+                    self._items.popitem(last=False)
+            found.update(fresh)
+        return found
+
+
+renditions = RenditionCache()
@@ -0,0 +1,98 @@
+import re
+from modules.logger import Logger
+
+# Same grammar as hypertext_parser.LINK_PATTERN, kept here so the
+# validator can run from the CLI without importing tkinter.
+LINK_PATTERN = re.compile(r"\[([^\]]+)]\(doc:(\d+)\)")
+
+# Rows are pushed into SQLite in batches rather than one INSERT per link.
+BATCH_SIZE = 10000
+
+
+class LinkValidator:
+    """Check every `[label](doc:N)` link in the store with set-based SQL.
+
+    All link occurrences are collected into a temporary table once; dangling,
+    self-referencing and duplicate links then fall out of three joins instead
+    of one `get_document` lookup per link.
+    """
+
+    def __init__(self, doc_store, logger=None):
+        self.doc_store = doc_store
+        self.conn = doc_store.conn
+        self.logger = logger or Logger()
+
+    def collect(self) -> int:
+        """Scan all bodies into the temp `link_refs` table; return the link count."""
+        self.conn.execute("DROP TABLE IF EXISTS temp.link_refs")
+        self.conn.execute(
+            "CREATE TEMP TABLE link_refs ("
+            "src_id INTEGER, target_id INTEGER, start_off INTEGER, end_off INTEGER, label TEXT)"
+        )
+        total = 0
+        batch = []
+        for doc_id, body in self.conn.execute("SELECT id, body FROM documents"):
+            for match in LINK_PATTERN.finditer(body or ""):
+                batch.append(
+                    (doc_id, int(match.group(2)), match.start(), match.end(), match.group(1))
+                )
+            if len(batch) >= BATCH_SIZE:
+                self.conn.executemany("INSERT INTO link_refs VALUES (?, ?, ?, ?, ?)", batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            self.conn.executemany("INSERT INTO link_refs VALUES (?, ?, ?, ?, ?)", batch)
+            total += len(batch)
+        self.conn.execute("CREATE INDEX temp.link_refs_pair ON link_refs (src_id, target_id)")
+        self.conn.commit()
+        self.logger.info(f"Collected {total} links")
+        return total
+
+    def _rows(self, sql):
+        return [
+            {"src_id": r[0], "target_id": r[1], "start": r[2], "end": r[3], "label": r[4]}
+            for r in self.conn.execute(sql)
+        ]
+
+    def dangling(self):
+        return self._rows(
+            "SELECT l.src_id, l.target_id, l.start_off, l.end_off, l.label FROM link_refs l "
+            "LEFT JOIN documents d ON d.id = l.target_id "
+            "WHERE d.id IS NULL ORDER BY l.src_id, l.start_off"
+        )
+
+    def self_links(self):
+        return self._rows(
+            "SELECT src_id, target_id, start_off, end_off, label FROM link_refs "
+            "WHERE src_id = target_id ORDER BY src_id, start_off"
+        )
+
+    def duplicates(self):
+        """Every occurrence of a (source, target) pair that appears more than once."""
+        return self._rows(
+            "SELECT l.src_id, l.target_id, l.start_off, l.end_off, l.label FROM link_refs l "
+            "JOIN (SELECT src_id, target_id FROM link_refs "
+            "      GROUP BY src_id, target_id HAVING COUNT(*) > 1) g "
+            "ON g.src_id = l.src_id AND g.target_id = l.target_id "
+            "ORDER BY l.src_id, l.target_id, l.start_off"
+        )
+
+    def validate(self) -> dict:
+        total = self.collect()
+        report = {
+            "total": total,
+            "dangling": self.dangling(),
+            "self": self.self_links(),
+            "duplicate": self.duplicates(),
+        }
+        self.conn.execute("DROP TABLE IF EXISTS temp.link_refs")
+        self.logger.info(
+            f"Link check: {len(report['dangling'])} dangling, "
+            f"{len(report['self'])} self, {len(report['duplicate'])} duplicate"
+        )
+        return report
+
+
+def validate_links(doc_store, logger=None) -> dict:
+    """Convenience wrapper: validate every link in *doc_store*."""
+    return LinkValidator(doc_store, logger).validate()
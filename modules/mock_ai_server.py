@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI REST API, for offline load tests.
+
+Serves /v1/chat/completions (with SSE streaming), /v1/images/generations
+(b64_json) and /v1/embeddings using FakeBackend content. Latency, jitter
+and the rate of injected 429/503 errors are configurable:
+
+    python -m modules.mock_ai_server --port 8800 --latency 0.4 --error-rate 0.05
+    PIKIT_AI_BACKEND=http python -m modules.ai_bench --requests 200
+"""
+import argparse
+import base64
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from modules.ai_backends import BackendError, FakeBackend
+
+
+class MockAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    backend: FakeBackend = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, exc: BackendError):
+        status = exc.http_status or 500
+        self._send_json(status, {"error": {"message": str(exc), "type": "mock_error"}}, exc.headers)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid JSON"}})
+            return
+        routes = {
+            "/v1/chat/completions": self._chat,
+            "/v1/images/generations": self._images,
+            "/v1/embeddings": self._embeddings,
+        }
+        handler = routes.get(self.path.rstrip("/"))
+        if handler is None:
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        try:
+            handler(payload)
+        except BackendError as exc:
+            self._send_error(exc)
+
+    def _chat(self, payload):
+        messages = payload.get("messages") or [{"role": "user", "content": ""}]
+        model = payload.get("model", "mock")
+        if not payload.get("stream"):
+            reply = self.backend.chat(messages, model)
+            self._send_json(200, {
+                "id": f"mock-{time.time_ns()}",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": reply}}],
+            })
+            return
+        fragments = self.backend.stream(messages, model)
+        first = next(fragments, None)  # raises before any headers go out
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for delta in ([first] if first is not None else []):
+            self._send_event(model, delta)
+        for delta in fragments:
+            self._send_event(model, delta)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_event(self, model, delta):
+        chunk = {"object": "chat.completion.chunk", "model": model,
+                 "choices": [{"index": 0, "delta": {"content": delta}}]}
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _images(self, payload):
+        images = self.backend.image(payload.get("prompt", ""), payload.get("size", "512x512"),
+                                    int(payload.get("n", 1)))
+        self._send_json(200, {
+            "created": int(time.time()),
+            "data": [{"b64_json": base64.b64encode(img).decode("ascii")} for img in images],
+        })
+
+    def _embeddings(self, payload):
+        texts = payload.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        vectors = self.backend.embed(texts)
+        self._send_json(200, {
+            "object": "list",
+            "data": [{"object": "embedding", "index": i, "embedding": v}
+                     for i, v in enumerate(vectors)],
+        })
+
+
+def serve(host="127.0.0.1", port=8800, backend: FakeBackend = None):
+    """Build (but do not start) a threaded mock server bound to *host*:*port*."""
+    handler = type("BoundMockAIHandler", (MockAIHandler,), {"backend": backend or FakeBackend()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible server for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", type=float, default=0.3, help="Base seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- seconds added to latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 429/5xx")
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0, help="Streaming speed")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    backend = FakeBackend(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          tokens_per_sec=args.tokens_per_sec, seed=args.seed)
+    server = serve(args.host, args.port, backend)
+    print(f"Mock AI server on http://{args.host}:{args.port}/v1 "
+          f"(latency {args.latency}s ±{args.jitter}s, error rate {args.error_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,108 @@ Command-line interface for DemoKit using the existing SQLite-backed DocumentStor
 Supports import/export of CSV, listing, viewing, and invoking the AI.
 """
 import argparse
+import json
+import os
 import sys
+from modules.batch_runner import BatchRunner
 from modules.document_store import DocumentStore
 from modules.ai_interface import AIInterface
+from modules.ai_metrics import format_summary
 from modules.command_processor import CommandProcessor
+from modules.commands import (autolink_document, autolink_local, run_batch, summarize_document,
+                              summarize_local)
+from modules.link_validator import validate_links
+from modules.summarizer import MapReduceSummarizer, extractive_summary
+
+def _link_label(prompt: str) -> str:
+    label = " ".join(prompt.replace("[", "(").replace("]", ")").split())
+    return label if len(label) <= 60 else label[:57] + "..."
+
+
+def batch_ask(store, ai, infile, outfile, workers=4, rpm=60, tpm=90000, flush_every=25):
+    """Answer every `{"prompt", "link_from"}` line of *infile* and store the replies.
+
+    The input is read lazily, so only a few lines per worker are held in
+    memory. Each flush stores its answers in one transaction and then appends
+    them to *outfile*. Lines already present in *outfile* are skipped, so an
+    interrupted run resumes where it stopped.
+    """
+    done = set()
+    if os.path.exists(outfile):
+        with open(outfile, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["line"])
+                except (ValueError, KeyError):
+                    continue  # torn last line from an interrupted run
+    records = {}
+    counts = {"resumed": 0, "invalid": 0}
+
+    def items():
+        with open(infile, encoding="utf-8") as f:
+            for n, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                if n in done:
+                    counts["resumed"] += 1
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    rec = None
+                if not isinstance(rec, dict) or not str(rec.get("prompt") or "").strip():
+                    counts["invalid"] += 1
+                    print(f"Line {n}: expected {{\"prompt\": ..., \"link_from\": doc_id}}", file=sys.stderr)
+                    continue
+                records[n] = rec
+                yield n
+
+    def on_flush(results):
+        recs = [records.pop(n) for n, _ in results]
+        ids = store.add_linked_documents([
+            ("AI Response", reply, rec.get("link_from"), _link_label(rec["prompt"]))
+            for rec, (_, reply) in zip(recs, results)
+        ])
+        with open(outfile, "a", encoding="utf-8") as out:
+            for rec, (n, reply), doc_id in zip(recs, results, ids):
+                out.write(json.dumps({"line": n, "prompt": rec["prompt"],
+                                      "link_from": rec.get("link_from"),
+                                      "doc_id": doc_id, "reply": reply},
+                                     ensure_ascii=False) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+        print(f"Stored {len(ids)} answers (up to document {ids[-1]})")
+
+    runner = BatchRunner(ai.query, max_workers=workers, rpm=rpm, tpm=tpm,
+                         flush_every=flush_every, logger=ai.logger)
+    # Failed lines never reach the output, so the next run retries them
+    stats = runner.run(items(), lambda n: records[n]["prompt"], on_flush,
+                       on_failure=lambda n, _exc: records.pop(n, None))
+    stats.update(counts)
+    return stats
+
+
+def _add_selection(sub):
+    """Arguments choosing the documents for `summarize` / `autolink`: one id or a batch."""
+    sub.add_argument('doc_id', nargs='?', type=int, help='A single document')
+    group = sub.add_mutually_exclusive_group()
+    group.add_argument('--all', action='store_true', help='Every document')
+    group.add_argument('--ids', help='Comma-separated document IDs, e.g. 1,2,3')
+    group.add_argument('--query', help='Documents whose title or body contains this text')
+    sub.add_argument('--workers', type=int, default=4, help='Concurrent requests')
+    sub.add_argument('--restart', action='store_true', help='Ignore the checkpoint of an earlier run')
+
+
+def _selected_ids(store, args):
+    """Batch ids, or None for the single *doc_id*."""
+    if args.doc_id is not None:
+        return None
+    if args.all:
+        return store.document_ids()
+    if args.ids:
+        return [int(x) for x in args.ids.split(',') if x.strip()]
+    return store.document_ids(args.query)
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -35,6 +133,47 @@ def main():
     ask = subparsers.add_parser('ask', help='Ask the AI to expand on a prompt or existing document')
     ask.add_argument('doc_id', nargs='?', type=int, help='Optional source document ID to link from')
     ask.add_argument('prompt', nargs='+', help='Prompt text for the AI')
+    ask.add_argument('--no-cache', action='store_true', help='Skip the response cache and query the API')
+    ask.add_argument('--context', type=int, default=None, metavar='TOKENS',
+                     help='Token budget for passages from the source doc and its links (0 = none)')
+
+    # AI response cache
+    cache = subparsers.add_parser('cache', help='Show AI response cache statistics')
+    cache.add_argument('--clear', action='store_true', help='Drop every cached reply')
+
+    # Bulk prompting from JSONL
+    bat = subparsers.add_parser('batch-ask', help='Answer many prompts from a JSONL file and store linked replies')
+    bat.add_argument('infile', help='JSONL with one {"prompt": ..., "link_from": doc_id} per line')
+    bat.add_argument('-o', '--output', help='Result JSONL (default: <infile>.answers.jsonl); also used to resume')
+    bat.add_argument('--workers', type=int, default=4, help='Concurrent requests')
+    bat.add_argument('--rpm', type=float, default=60, help='Requests per minute limit')
+    bat.add_argument('--tpm', type=float, default=90000, help='Tokens per minute limit')
+    bat.add_argument('--flush-every', type=int, default=25, help='Answers stored per transaction')
+
+    # Batch summaries / AI link suggestions (resumable; see commands.run_batch)
+    summ = subparsers.add_parser('summarize', help='Summarize a document (printed) or many (stored)')
+    _add_selection(summ)
+    summ.add_argument('--local', action='store_true',
+                      help='Extractive LexRank summary, no AI call')
+    summ.add_argument('--sentences', type=int, default=5, help='Sentences per --local summary')
+    link = subparsers.add_parser('autolink', help='Append AI link suggestions to one or many documents')
+    _add_selection(link)
+    link.add_argument('--local', action='store_true',
+                      help='Link titles and key phrases of other documents, no AI call')
+    link.add_argument('--apply', action='store_true', help='With --local: write the links (default: list them)')
+
+    # Offline ASK queue
+    q = subparsers.add_parser('queue', help='Show or resend ASKs queued while the AI backend was unreachable')
+    q.add_argument('--flush', action='store_true', help='Resend queued ASKs now')
+    q.add_argument('--workers', type=int, default=2, help='Concurrent requests when flushing')
+
+    # Per-call AI metrics
+    st = subparsers.add_parser('stats', help='Show recorded AI call metrics (latency, tokens, errors)')
+    st.add_argument('what', choices=['ai'], help='Which statistics to show')
+    st.add_argument('--days', type=int, default=7, help='Window in days')
+
+    # Validate links
+    subparsers.add_parser('validate-links', help='Report dangling, self-referencing and duplicate doc links')
 
     args = parser.parse_args()
 
@@ -72,23 +211,157 @@ def main():
         print(doc['body'])
 
     elif args.command == 'ask':
+        ai.bypass_cache = args.no_cache
         prompt_text = ' '.join(args.prompt)
+        hit = None if args.no_cache else processor.find_similar(prompt_text)
+        if hit:
+            processor.semantic_cache.mark_reused(hit)
+            print(f"Similar question already answered in document {hit['doc_id']} "
+                  f"({hit['score']:.0%} similar): {hit['prompt']}")
+            print("Use --no-cache to ask anyway.")
+            return
+        answered = []
         if args.doc_id:
             # Use the interactive query flow: insert link back to source doc
+            def on_success(new_id):
+                answered.append(new_id)
+                print(f"\nAI response saved as document {new_id}")
+
             processor.query_ai(
                 prompt_text,
                 args.doc_id,
-                lambda new_id: print(f"AI response saved as document {new_id}"),
-                lambda: None
+                on_success,
+                lambda *_: None,
+                stream=True,
+                on_token=lambda t: print(t, end="", flush=True),
+                on_error=lambda e: print(f"AI request failed: {e}", file=sys.stderr),
+                on_queued=lambda entry_id: print(
+                    f"AI backend unreachable; ASK queued as {entry_id} "
+                    "(resend with `queue --flush`)", file=sys.stderr),
+                context_budget=args.context,
             )
         else:
             # Simple ask without linking
-            reply = processor.ask_question(prompt_text)
-            if reply:
-                new_id = store.add_document("AI Response", reply)
-                print(f"AI response saved as document {new_id}")
+            entry_id = processor.journal_ask(prompt_text, None, prompt=prompt_text)
+            try:
+                reply, latency = processor.run_query(prompt_text)
+            except Exception as e:
+                if processor.defer_ask(entry_id, e):
+                    print(f"AI backend unreachable; ASK queued as {entry_id} "
+                          "(resend with `queue --flush`)", file=sys.stderr)
+                else:
+                    print(f"No reply from AI: {e}", file=sys.stderr)
+                return
+            new_id = store.add_document("AI Response", reply)
+            if processor.semantic_cache is not None:
+                processor.semantic_cache.record(prompt_text, new_id, latency)
+            processor.journal_done(entry_id, new_id)
+            answered.append(new_id)
+            print(f"AI response saved as document {new_id}")
+        # The backend answered, so anything queued earlier can go now
+        if answered and processor.pending_asks():
+            stats = processor.flush_queue(
+                lambda new_id: print(f"Queued ASK answered as document {new_id}")
+            )
+            print(f"Queue: {stats['done']} sent, {stats['failed']} failed, {stats['queued']} still queued")
+
+    elif args.command == 'batch-ask':
+        outfile = args.output or os.path.splitext(args.infile)[0] + ".answers.jsonl"
+        try:
+            stats = batch_ask(store, ai, args.infile, outfile, args.workers,
+                              args.rpm, args.tpm, args.flush_every)
+        except KeyboardInterrupt:
+            print(f"\nInterrupted; run again to resume from {outfile}", file=sys.stderr)
+            sys.exit(130)
+        print(f"{stats['done']} answered, {stats['failed']} failed, {stats['resumed']} already done, "
+              f"{stats['invalid']} invalid lines; results in {outfile}")
+        if stats['failed']:
+            sys.exit(4)
+
+    elif args.command in ('summarize', 'autolink'):
+        if (args.doc_id is not None) == bool(args.all or args.ids or args.query):
+            print("Give either a document ID or one of --all, --ids, --query", file=sys.stderr)
+            sys.exit(2)
+        ids = _selected_ids(store, args)
+        if args.command == 'summarize' and args.local:
+            if ids is None:
+                doc = store.get_document(args.doc_id)
+                if not doc:
+                    print(f"No document found with ID {args.doc_id}", file=sys.stderr)
+                    sys.exit(2)
+                print(extractive_summary(doc['body'] or "", args.sentences))
             else:
-                print("No reply from AI.")
+                summarize_local(store, ids, args.sentences)
+            return
+        if args.command == 'autolink' and args.local:
+            autolink_local(store, ids, args.doc_id, apply=args.apply, logger=ai.logger)
+            return
+        summarizer = MapReduceSummarizer(ai, logger=ai.logger)
+        if ids is None:
+            try:
+                if args.command == 'summarize':
+                    print(summarize_document(store, summarizer, args.doc_id))
+                else:
+                    print(autolink_document(store, ai, args.doc_id))
+                    print(f"Link suggestions appended to document {args.doc_id}")
+            except KeyError:
+                print(f"No document found with ID {args.doc_id}", file=sys.stderr)
+                sys.exit(2)
+            return
+        try:
+            stats = run_batch(args.command.upper(), ids, store, ai, summarizer, args.workers,
+                              restart=args.restart, logger=ai.logger)
+        except KeyboardInterrupt:
+            print("\nInterrupted; run the same command again to resume", file=sys.stderr)
+            sys.exit(130)
+        if stats['failed']:
+            sys.exit(4)
+
+    elif args.command == 'queue':
+        if args.flush:
+            stats = processor.flush_queue(
+                lambda new_id: print(f"Queued ASK answered as document {new_id}"),
+                max_workers=args.workers,
+            )
+            print(f"{stats['done']} sent, {stats['failed']} failed, {stats['queued']} still queued")
+            return
+        pending = processor.pending_asks()
+        print(f"{len(pending)} ASKs queued")
+        for entry in pending:
+            source = f"doc {entry['doc_id']}" if entry.get('doc_id') else "standalone"
+            print(f"  {entry['id']} ({source}): {entry['prompt'][:70]}")
+
+    elif args.command == 'cache':
+        if processor.semantic_cache is not None:
+            saved = processor.semantic_cache.stats()
+            print(f"Similar-question cache: {saved['prompts']} prompts, "
+                  f"{saved['saved_calls']} API calls and {saved['saved_seconds']:.1f}s saved")
+        if ai.cache is None:
+            print("AI response cache is disabled.")
+            return
+        if args.clear:
+            ai.cache.clear()
+            print("AI response cache cleared.")
+        stats = ai.cache.stats()
+        print(f"{stats['entries']} entries, {stats['bytes']} bytes")
+        print(f"hits {stats['hits']}, misses {stats['misses']}, hit rate {stats['hit_rate']:.1%}")
+
+    elif args.command == 'stats':
+        if ai.call_log is None:
+            print("AI call metrics are disabled.")
+            return
+        print(format_summary(ai.call_log.summary(args.days), args.days))
+
+    elif args.command == 'validate-links':
+        report = validate_links(store)
+        print(f"Checked {report['total']} links")
+        for kind, heading in (('dangling', 'Dangling'), ('self', 'Self-referencing'), ('duplicate', 'Duplicate')):
+            rows = report[kind]
+            print(f"{heading}: {len(rows)}")
+            for r in rows:
+                print(f"  doc {r['src_id']} @{r['start']}-{r['end']}: [{r['label']}](doc:{r['target_id']})")
+        if report['dangling']:
+            sys.exit(3)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,157 @@
+import random
+import threading
+import time
+
+from modules.logger import Logger
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the backend while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated transient failures.
+
+    After *failure_threshold* consecutive failures the breaker opens and
+    every call is refused for *reset_timeout* seconds. Then a single trial
+    call is let through (half-open): success closes the breaker, failure
+    opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == self.OPEN or (state == self.HALF_OPEN and self._trial_running):
+                wait = self.reset_timeout - (time.monotonic() - self.opened_at)
+                raise CircuitOpenError(
+                    f"AI backend unavailable; next attempt in {max(wait, 0):.0f}s"
+                )
+            if state == self.HALF_OPEN:
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._trial_running:
+                    self.times_opened += 1
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for rate limits and server errors."""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 20.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @staticmethod
+    def status_of(exc):
+        return getattr(exc, "http_status", None) or getattr(exc, "status_code", None)
+
+    def is_transient(self, exc) -> bool:
+        status = self.status_of(exc)
+        if status is not None:
+            return status == 429 or status >= 500
+        # No HTTP status: connection failures and timeouts
+        name = type(exc).__name__
+        return isinstance(exc, (ConnectionError, TimeoutError)) or name in (
+            "APIConnectionError", "Timeout", "ServiceUnavailableError",
+            "ConnectionError", "ReadTimeout", "ConnectTimeout",
+        )
+
+    def delay(self, attempt: int, exc=None) -> float:
+        """Seconds to wait before retry *attempt* (1-based); honours Retry-After."""
+        headers = getattr(exc, "headers", None) or {}
+        retry_after = headers.get("Retry-After") or headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class ResilientCaller:
+    """Run backend calls through a circuit breaker and a retry policy, with counters."""
+
+    def __init__(self, policy: RetryPolicy = None, breaker: CircuitBreaker = None, logger=None):
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.logger = logger or Logger()
+        self.counters = {"calls": 0, "retries": 0, "failures": 0, "short_circuited": 0}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def call(self, fn, *args, **kwargs):
+        self._count("calls")
+        attempt = self._local.retries = 0
+        while True:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self._count("short_circuited")
+                raise
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as exc:
+                if not self.policy.is_transient(exc):
+                    self.breaker.record_success()  # the backend answered
+                    self._count("failures")
+                    raise
+                self.breaker.record_failure()
+                attempt += 1
+                if attempt > self.policy.max_retries or self.breaker.state != CircuitBreaker.CLOSED:
+                    self._count("failures")
+                    raise
+                wait = self.policy.delay(attempt, exc)
+                self._count("retries")
+                self._local.retries = attempt
+                self.logger.info(f"Transient AI error ({exc}); retry {attempt} in {wait:.1f}s")
+                time.sleep(wait)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def last_retries(self) -> int:
+        """Retries made by the most recent `call()` on this thread."""
+        return getattr(self._local, "retries", 0)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self.counters)
+        stats["breaker_state"] = self.breaker.state
+        stats["breaker_opened"] = self.breaker.times_opened
+        stats["consecutive_failures"] = self.breaker.failures
+        return stats
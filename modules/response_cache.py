@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from modules.logger import Logger
+
+
+class ResponseCache:
+    """SQLite-backed cache of AI replies keyed by (model, messages, temperature).
+
+    Entries expire after *ttl* seconds and the least recently used ones are
+    evicted once the stored replies exceed *max_bytes*. Hit and miss counts
+    are kept in the same file, so `stats()` covers every process that used
+    it. The connection is shared between threads, so every access goes
+    through one lock.
+    """
+
+    def __init__(self, db_path="storage/ai_cache.db", ttl: float = 7 * 24 * 3600,
+                 max_bytes: int = 50 * 1024 * 1024, logger=None):
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.logger = logger or Logger()
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ai_cache ("
+            "key TEXT PRIMARY KEY, model TEXT, reply TEXT, size INTEGER, "
+            "created_at REAL, last_access REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ai_cache_lru ON ai_cache (last_access)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ai_cache_stats (name TEXT PRIMARY KEY, count INTEGER)"
+        )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO ai_cache_stats VALUES (?, 0)", [("hits",), ("misses",)]
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: list, temperature: float) -> str:
+        """Hash a normalised request; whitespace-only differences share a key."""
+        norm = [
+            {"role": m["role"], "content": " ".join(str(m["content"]).split())}
+            for m in messages
+        ]
+        raw = json.dumps([model, norm, round(float(temperature), 3)], sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT reply, created_at FROM ai_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                self.conn.commit()
+                return None
+            if self.ttl and now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM ai_cache WHERE key = ?", (key,))
+                self._count("misses")
+                self.conn.commit()
+                return None
+            self.conn.execute("UPDATE ai_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._count("hits")
+            self.conn.commit()
+            return row[0]
+
+    def _count(self, name: str):
+        self.conn.execute("UPDATE ai_cache_stats SET count = count + 1 WHERE name = ?", (name,))
+
+    def put(self, key: str, model: str, reply: str):
+        now = time.time()
+        size = len(reply.encode("utf-8"))
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ai_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, reply, size, now, now)
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM ai_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM ai_cache ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM ai_cache WHERE key = ?", victims)
+        self.logger.info(f"AI cache evicted {len(victims)} entries")
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM ai_cache")
+            self.conn.execute("UPDATE ai_cache_stats SET count = 0")
+            self.conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ai_cache"
+            ).fetchone()
+            counts = dict(self.conn.execute("SELECT name, count FROM ai_cache_stats"))
+        hits, misses = counts.get("hits", 0), counts.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "bytes": total,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
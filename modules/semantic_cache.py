@@ -0,0 +1,140 @@
+import os
+import re
+import sqlite3
+import threading
+import zlib
+
+import numpy as np
+
+from modules.logger import Logger
+
+DIM = 1024
+_WORD = re.compile(r"[a-z0-9]+")
+_CONTRACTIONS = (("what's", "what is"), ("'s", ""), ("n't", " not"), ("'re", " are"))
+_STOPWORDS = frozenset("a an the is are was were of in on to for and or do does what which".split())
+
+
+def _stem(word: str) -> str:
+    """Porter step 1a: plural endings only, enough to match "weakness(es)"."""
+    if word.endswith("sses"):
+        return word[:-2]
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def terms(text: str) -> list:
+    """Lower-cased, stemmed content words of *text*, in order."""
+    text = text.lower()
+    for src, dst in _CONTRACTIONS:
+        text = text.replace(src, dst)
+    return [_stem(w) for w in _WORD.findall(text) if w not in _STOPWORDS]
+
+
+def embed(text: str) -> np.ndarray:
+    """Hash words, word bigrams and character trigrams into a unit vector.
+
+    Purely local and deterministic (crc32, not Python's salted hash), so
+    vectors written to disk stay comparable across runs.
+    """
+    words = terms(text)
+    vec = np.zeros(DIM, dtype=np.float32)
+    features = [(w, 1.0) for w in words]
+    features += [(f"{a} {b}", 0.5) for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f" {w} "
+        features += [(padded[i:i + 3], 0.25) for i in range(len(padded) - 2)]
+    for feat, weight in features:
+        vec[zlib.crc32(feat.encode("utf-8")) % DIM] += weight
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class SemanticCache:
+    """Find earlier ASK prompts that mean roughly the same as a new one.
+
+    Only the question is embedded; the instruction around it ("Please expand
+    on this:") must match exactly, otherwise a shared boilerplate prefix
+    would make unrelated short questions look alike. Vectors live in SQLite
+    and in an in-memory matrix, so a lookup is one matrix-vector product.
+    Calls and seconds saved by reused answers are persisted alongside.
+    """
+
+    def __init__(self, db_path="storage/semantic_cache.db", threshold: float = 0.8, logger=None):
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.threshold = threshold
+        self.logger = logger or Logger()
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS prompts ("
+            "id INTEGER PRIMARY KEY, instruction TEXT, prompt TEXT, doc_id INTEGER, "
+            "latency REAL, vec BLOB, UNIQUE (instruction, prompt))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS savings (id INTEGER PRIMARY KEY CHECK (id = 1), "
+            "calls INTEGER, seconds REAL)"
+        )
+        self.conn.execute("INSERT OR IGNORE INTO savings VALUES (1, 0, 0.0)")
+        self.conn.commit()
+        rows = self.conn.execute(
+            "SELECT instruction, prompt, doc_id, latency, vec FROM prompts ORDER BY id"
+        ).fetchall()
+        self._meta = [(r[0], r[1], r[2], r[3]) for r in rows]
+        self._matrix = (
+            np.vstack([np.frombuffer(r[4], dtype=np.float32) for r in rows])
+            if rows else np.zeros((0, DIM), dtype=np.float32)
+        )
+
+    @staticmethod
+    def _norm(instruction: str) -> str:
+        return " ".join((instruction or "").lower().split())
+
+    def lookup(self, prompt: str, instruction: str = ""):
+        """Best earlier prompt at or above the threshold, or None."""
+        instruction = self._norm(instruction)
+        with self._lock:
+            if not self._meta:
+                return None
+            scores = self._matrix @ embed(prompt)
+            same = np.fromiter((m[0] == instruction for m in self._meta), dtype=bool,
+                               count=len(self._meta))
+            scores = np.where(same, scores, -1.0)
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < self.threshold:
+                return None
+            _, prev, doc_id, latency = self._meta[best]
+        return {"prompt": prev, "doc_id": doc_id, "latency": latency, "score": score}
+
+    def record(self, prompt: str, doc_id: int, latency: float, instruction: str = ""):
+        instruction = self._norm(instruction)
+        vec = embed(prompt)
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO prompts (instruction, prompt, doc_id, latency, vec) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (instruction, prompt, doc_id, latency, vec.tobytes())
+            )
+            self.conn.commit()
+            if cur.rowcount:
+                self._meta.append((instruction, prompt, doc_id, latency))
+                self._matrix = np.vstack([self._matrix, vec])
+
+    def mark_reused(self, hit: dict):
+        """Count *hit* as an API call (and its latency) that was not needed."""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE savings SET calls = calls + 1, seconds = seconds + ? WHERE id = 1",
+                (hit.get("latency") or 0.0,)
+            )
+            self.conn.commit()
+        self.logger.info(f"Reused answer doc {hit['doc_id']} (similarity {hit['score']:.2f})")
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls, seconds = self.conn.execute("SELECT calls, seconds FROM savings").fetchone()
+        return {"prompts": len(self._meta), "saved_calls": calls, "saved_seconds": seconds}
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+
+
+class SidebarIndex:
+    """Paged, read-through view of the document index (newest first) for the sidebar.
+
+    Rows are fetched from `DocumentStore.get_index_page` a page at a time and
+    the most recently used *max_pages* pages are kept, so showing any window
+    of the list costs one or two small queries however many documents exist.
+    With a filter set (see `set_filter`) the view lists only the given ids.
+    """
+
+    def __init__(self, doc_store, page_size: int = 100, max_pages: int = 32):
+        self.doc_store = doc_store
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._pages = OrderedDict()   # page number -> list of index rows
+        self._count = None
+        self._filter = None           # doc ids shown instead of the whole index
+
+    def __len__(self):
+        if self._filter is not None:
+            return len(self._filter)
+        if self._count is None:
+            self._count = self.doc_store.count_documents()
+        return self._count
+
+    def _page(self, number: int):
+        page = self._pages.get(number)
+        if page is None:
+            start = number * self.page_size
+            if self._filter is None:
+                page = self.doc_store.get_index_page(start, self.page_size)
+            else:
+                ids = self._filter[start:start + self.page_size]
+                found = {row["id"]: row for row in self.doc_store.get_index_rows(ids)}
+                page = [found[doc_id] for doc_id in ids if doc_id in found]
+            self._pages[number] = page
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(number)
+        return page
+
+    def rows(self, offset: int, limit: int):
+        """Up to *limit* index rows starting at position *offset*."""
+        if limit <= 0:
+            return []
+        first, last = offset // self.page_size, (offset + limit - 1) // self.page_size
+        rows = []
+        for number in range(first, last + 1):
+            rows.extend(self._page(number))
+        start = offset - first * self.page_size
+        return rows[start:start + limit]
+
+    def apply(self, change: str, doc_ids):
+        """Fold a store change (see `DocumentStore.add_listener`) into the cache.
+
+        Updated rows are re-read and patched in place. Inserts and deletes
+        shift every later position, so cached pages are dropped and only the
+        count is adjusted.
+        """
+        if change == "update":
+            fresh = {row["id"]: row for row in self.doc_store.get_index_rows(doc_ids)}
+            for page in self._pages.values():
+                for i, row in enumerate(page):
+                    if row["id"] in fresh:
+                        page[i] = fresh[row["id"]]
+            return
+        self._pages.clear()
+        if self._count is not None:
+            self._count += len(doc_ids) if change == "insert" else -len(doc_ids)
+
+    def set_filter(self, doc_ids):
+        """Show only *doc_ids*, in that order; None shows the whole index again."""
+        self._filter = doc_ids
+        self._pages.clear()
+
+    def invalidate(self):
+        """Forget cached pages and the count, e.g. after the store changed."""
+        self._pages.clear()
+        self._count = None
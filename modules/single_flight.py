@@ -0,0 +1,160 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _SharedStream:
+    """Fan one upstream iterator out to any number of readers.
+
+    Fragments are buffered so a late reader replays what it missed. Whichever
+    reader runs out of buffered fragments pulls the next one from upstream, so
+    the stream keeps going even if the reader that started it stops early.
+    Once every reader has stopped, `close()` abandons it.
+    """
+
+    def __init__(self, source, on_finish):
+        self.source = source
+        self.on_finish = on_finish
+        self.parts = []
+        self.finished = False
+        self.error = None
+        self.pulling = False
+        self.readers = 0   # counted by SingleFlight under its lock
+        self.cond = threading.Condition()
+
+    def reader(self):
+        i = 0
+        while True:
+            with self.cond:
+                while i >= len(self.parts) and not self.finished and self.pulling:
+                    self.cond.wait()
+                if i < len(self.parts):
+                    part = self.parts[i]
+                elif self.finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    self.pulling = True
+                    part = None
+            if part is None:
+                self._pull()
+                continue
+            i += 1
+            yield part
+
+    def _pull(self):
+        try:
+            part = next(self.source)
+        except StopIteration:
+            self._finish(None)
+            return
+        except Exception as exc:
+            self._finish(exc)
+            return
+        with self.cond:
+            self.parts.append(part)
+            self.pulling = False
+            self.cond.notify_all()
+
+    def close(self):
+        """Stop the upstream iterator; nobody is reading any more."""
+        with self.cond:
+            if self.finished:
+                return
+            self.finished = True
+            self.cond.notify_all()
+        close = getattr(self.source, "close", None)
+        if close:
+            close()
+
+    def _finish(self, error):
+        self.on_finish()
+        with self.cond:
+            self.finished = True
+            self.error = error
+            self.pulling = False
+            self.cond.notify_all()
+
+
+class SingleFlight:
+    """Share one call between concurrent callers asking for the same *key*.
+
+    `do()` runs `fn` once per key at a time; callers arriving while it runs
+    wait and get the same result (or exception). `stream()` does the same for
+    iterators. Once a call finishes, or all readers of a stream stop early,
+    its key is forgotten, so later callers start a fresh call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self.counters = {"upstream": 0, "coalesced": 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.counters["upstream"] += 1
+            else:
+                self.counters["coalesced"] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stream(self, key, fn, *args, **kwargs):
+        """Iterate `fn(*args, **kwargs)`, sharing it with concurrent identical streams."""
+        with self._lock:
+            shared = self._streams.get(key)
+            if shared is None:
+                shared = self._streams[key] = _SharedStream(
+                    iter(fn(*args, **kwargs)), lambda: self._forget_stream(key, shared)
+                )
+                self.counters["upstream"] += 1
+            else:
+                self.counters["coalesced"] += 1
+            shared.readers += 1
+        return self._read(key, shared)
+
+    def _read(self, key, shared):
+        try:
+            yield from shared.reader()
+        finally:
+            with self._lock:
+                shared.readers -= 1
+                abandoned = shared.readers == 0 and not shared.finished
+                # Every reader stopped early (e.g. a cancelled ASK): don't let
+                # a later identical request join and replay this half-read stream
+                if abandoned and self._streams.get(key) is shared:
+                    del self._streams[key]
+            if abandoned:
+                shared.close()
+
+    def _forget_stream(self, key, shared):
+        with self._lock:
+            if self._streams.get(key) is shared:
+                del self._streams[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, in_flight=len(self._calls) + len(self._streams))
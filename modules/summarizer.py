@@ -0,0 +1,232 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from modules.batch_runner import estimate_tokens
+from modules.logger import Logger
+from modules.semantic_cache import terms
+
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[a-z0-9']+")
+
+MAP_PROMPT = "Summarize this section of a longer document:\n"
+REDUCE_PROMPT = "Combine these section summaries into one coherent summary:\n"
+DIRECT_PROMPT = "Please summarize the following document:\n"
+
+
+def _split_oversized(piece: str, max_tokens: int):
+    """Break *piece* on sentences, then words, then characters until each part fits."""
+    if estimate_tokens(piece) <= max_tokens:
+        return [piece]
+    units = _SENTENCE.split(piece)
+    if len(units) == 1:
+        units = piece.split()
+    if len(units) == 1:
+        step = max_tokens * 4
+        return [piece[i:i + step] for i in range(0, len(piece), step)]
+    parts, current = [], []
+    for unit in units:
+        if current and estimate_tokens(" ".join(current + [unit])) > max_tokens:
+            parts.append(" ".join(current))
+            current = []
+        current.append(unit)
+    parts.append(" ".join(current))
+    return [p for part in parts for p in _split_oversized(part, max_tokens)]
+
+
+def chunk_text(body: str, max_tokens: int = 2000):
+    """Split *body* into chunks of at most *max_tokens* on paragraph boundaries.
+
+    Once a chunk is at least half full it is also closed after any paragraph
+    whose hash hits 1-in-4. Boundaries therefore depend on nearby content
+    rather than on everything before them, so an edit early in a document
+    leaves most later chunks (and their cached summaries) unchanged.
+    """
+    paragraphs = []
+    for para in _PARAGRAPH.split(body):
+        para = para.strip()
+        if para:
+            paragraphs.extend(_split_oversized(para, max_tokens))
+    chunks, current, size = [], [], 0
+    for para in paragraphs:
+        tokens = estimate_tokens(para)
+        if current and size + tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(para)
+        size += tokens
+        if size >= max_tokens // 2 and zlib.crc32(para.encode("utf-8")) % 4 == 0:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+class ChunkSummaryCache:
+    """Summaries keyed by sha256 of (model, prompt, chunk text)."""
+
+    def __init__(self, db_path="storage/ai_cache.db"):
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_summaries (hash TEXT PRIMARY KEY, summary TEXT)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def key(model: str, prompt: str, chunk: str) -> str:
+        return hashlib.sha256(f"{model}\0{prompt}\0{chunk}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT summary FROM chunk_summaries WHERE hash = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, rows):
+        with self._lock:
+            self.conn.executemany("INSERT OR REPLACE INTO chunk_summaries VALUES (?, ?)", rows)
+            self.conn.commit()
+
+
+class MapReduceSummarizer:
+    """Summarize documents larger than the model's context window.
+
+    The body is chunked, chunks are summarized in parallel (map), and the
+    chunk summaries are combined (reduce), re-chunking the combined text as
+    often as needed. Every chunk summary is cached by content hash, so after
+    an edit only the changed chunks go back to the API.
+
+    Inside a batch, pass the batch's `RateLimiter` to `summarize`: chunks are
+    then summarized one after another on the batch worker, and every API
+    call is charged to the limiter, so the batch limits hold.
+    """
+
+    def __init__(self, ai, max_chunk_tokens: int = 2000, max_workers: int = 4,
+                 cache: ChunkSummaryCache = None, logger=None):
+        self.ai = ai
+        self.max_chunk_tokens = max_chunk_tokens
+        self.max_workers = max_workers
+        self.cache = cache or ChunkSummaryCache()
+        self.logger = logger or Logger()
+        self.api_calls = 0
+
+    def summarize(self, body: str, limiter=None) -> str:
+        chunks = chunk_text(body, self.max_chunk_tokens)
+        if len(chunks) <= 1:
+            return self._summarize_all(DIRECT_PROMPT, chunks or [body], limiter)[0]
+        level = 0
+        while len(chunks) > 1:
+            summaries = self._summarize_all(MAP_PROMPT if level == 0 else REDUCE_PROMPT, chunks,
+                                            limiter)
+            regrouped = chunk_text("\n\n".join(summaries), self.max_chunk_tokens)
+            if len(regrouped) >= len(chunks):
+                # Summaries did not shrink; pair them up so every level halves
+                regrouped = ["\n\n".join(summaries[i:i + 2]) for i in range(0, len(summaries), 2)]
+            self.logger.info(f"Summary level {level}: {len(chunks)} chunks -> {len(regrouped)}")
+            chunks = regrouped
+            level += 1
+        return self._summarize_all(REDUCE_PROMPT, chunks, limiter)[0]
+
+    def _summarize_all(self, prompt: str, chunks, limiter=None):
+        model = getattr(self.ai, "model", "")
+        keys = [ChunkSummaryCache.key(model, prompt, c) for c in chunks]
+        results = [self.cache.get(k) for k in keys]
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            if limiter is not None:
+                fresh = []
+                for i in missing:
+                    limiter.acquire(estimate_tokens(prompt + chunks[i]))
+                    fresh.append(self.ai.query(prompt + chunks[i]))
+            else:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                    fresh = list(pool.map(lambda i: self.ai.query(prompt + chunks[i]), missing))
+            self.api_calls += len(missing)
+            for i, summary in zip(missing, fresh):
+                results[i] = summary
+            self.cache.put_many([(keys[i], results[i]) for i in missing])
+        self.logger.info(f"Summarized {len(chunks)} chunks ({len(chunks) - len(missing)} cached)")
+        return results
+
+
+def split_sentences(body: str, min_words: int = 4):
+    """Sentences of *body* with at least *min_words* words, in order."""
+    sentences = []
+    for para in _PARAGRAPH.split(body):
+        for sentence in _SENTENCE.split(" ".join(para.split())):
+            if len(sentence.split()) >= min_words and not sentence.startswith("#"):
+                sentences.append(sentence)
+    return sentences
+
+
+def lexrank_scores(sentences, dim: int = 1024, damping: float = 0.85, iterations: int = 30):
+    """Continuous LexRank centrality of each sentence.
+
+    Sentences become hashed TF-IDF rows of X (unit length), so the cosine
+    similarity matrix is S = X Xᵀ. The power iteration only ever computes
+    S·v as X (Xᵀ v), which costs O(n·dim) per step instead of O(n²) and
+    never materialises the n×n matrix.
+    """
+    n = len(sentences)
+    column = {}  # word -> hashed column of its stemmed term, -1 for stopwords
+    cells = []
+    for i, sentence in enumerate(sentences):
+        for word in _WORD.findall(sentence.lower()):
+            col = column.get(word)
+            if col is None:
+                term = terms(word)
+                col = column[word] = zlib.crc32(term[0].encode("utf-8")) % dim if term else -1
+            if col >= 0:
+                cells.append(i * dim + col)
+    counts = np.bincount(np.array(cells, dtype=np.int64), minlength=n * dim)
+    x = counts.reshape(n, dim).astype(np.float32)
+    df = np.count_nonzero(x, axis=0)
+    x *= np.log((1.0 + n) / (1.0 + df)) + 1.0
+    norms = np.linalg.norm(x, axis=1)
+    x /= np.where(norms > 0, norms, 1.0)[:, None]
+
+    def similarity_times(v):
+        # S·v without self-similarity (the diagonal of S is 1 for non-empty rows)
+        return x @ (x.T @ v) - v * (norms > 0)
+
+    degree = similarity_times(np.ones(n, dtype=np.float32))
+    degree = np.where(degree > 0, degree, 1.0)
+    p = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(iterations):
+        new_p = (1.0 - damping) / n + damping * similarity_times(p / degree)
+        if np.abs(new_p - p).sum() < 1e-6:
+            p = new_p
+            break
+        p = new_p
+    return p, x
+
+
+def extractive_summary(body: str, max_sentences: int = 5, redundancy: float = 0.7) -> str:
+    """The *max_sentences* most central sentences of *body*, in document order.
+
+    A sentence too similar (cosine > *redundancy*) to one already picked is
+    skipped. No API call; a 100-page document takes a fraction of a second.
+    """
+    sentences = split_sentences(body)
+    if len(sentences) <= max_sentences:
+        return " ".join(sentences) if sentences else body.strip()[:500]
+    scores, x = lexrank_scores(sentences)
+    chosen = []
+    for i in np.argsort(-scores):
+        if all(float(x[i] @ x[j]) <= redundancy for j in chosen):
+            chosen.append(int(i))
+            if len(chosen) == max_sentences:
+                break
+    return " ".join(sentences[i] for i in sorted(chosen))
@@ -0,0 +1,122 @@
+import re
+import time
+from array import array
+
+from modules.logger import Logger
+
+_WORD = re.compile(r"\w+")
+
+
+def _fold(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+class TitleIndex:
+    """In-memory search over document titles and descriptions (the sidebar text).
+
+    Queries of three or more characters are answered from trigram posting
+    lists, intersected smallest first and checked with a substring test;
+    shorter ones from word-prefix postings. Results are document ids,
+    newest first, like the sidebar. Postings are `array('i')`, so 200k
+    documents cost tens of megabytes.
+
+    Changed documents are re-indexed by appending to the postings; their
+    old entries are filtered out at query time by re-checking the text.
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger or Logger()
+        self._texts = {}        # doc_id -> folded "title description"
+        self._grams = {}        # trigram -> array of doc ids
+        self._prefixes = {}     # 1-2 character word prefix -> array of doc ids
+        self._unsorted = set()  # keys whose postings are no longer in id order
+        self._changed = set()   # doc ids re-indexed or deleted since the build
+
+    def __len__(self):
+        return len(self._texts)
+
+    def build(self, rows):
+        """Index `{"id", "title", "description"}` rows (any order)."""
+        started = time.perf_counter()
+        grams, prefixes = {}, {}
+        for row in sorted(rows, key=lambda r: r["id"]):
+            doc_id, text = row["id"], _fold(f"{row['title'] or ''} {row['description'] or ''}")
+            self._texts[doc_id] = text
+            for gram in {text[i:i + 3] for i in range(len(text) - 2)}:
+                grams.setdefault(gram, []).append(doc_id)
+            for prefix in {w[:n] for w in _WORD.findall(text) for n in (1, 2)}:
+                prefixes.setdefault(prefix, []).append(doc_id)
+        self._grams = {g: array("i", ids) for g, ids in grams.items()}
+        self._prefixes = {p: array("i", ids) for p, ids in prefixes.items()}
+        self.logger.info(
+            f"Title index: {len(self._texts)} documents, {len(self._grams)} trigrams "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return self
+
+    def _add(self, doc_id: int, text: str):
+        self._texts[doc_id] = text
+        self._changed.add(doc_id)
+        keys = [(self._grams, {text[i:i + 3] for i in range(len(text) - 2)}),
+                (self._prefixes, {w[:n] for w in _WORD.findall(text) for n in (1, 2)})]
+        for postings, new_keys in keys:
+            for key in new_keys:
+                ids = postings.setdefault(key, array("i"))
+                if ids and ids[-1] >= doc_id:
+                    self._unsorted.add(key)
+                ids.append(doc_id)
+
+    def apply(self, change: str, rows=(), doc_ids=()):
+        """Fold a store change in: index *rows* (inserts/updates), drop *doc_ids* (deletes)."""
+        if change == "delete":
+            for doc_id in doc_ids:
+                self._texts.pop(doc_id, None)
+                self._changed.add(doc_id)
+            return
+        for row in rows:
+            text = _fold(f"{row['title'] or ''} {row['description'] or ''}")
+            if self._texts.get(row["id"]) != text:
+                self._add(row["id"], text)
+
+    def _postings(self, table, key):
+        ids = table.get(key)
+        if ids is None:
+            return ()
+        return sorted(set(ids)) if key in self._unsorted else ids
+
+    def search(self, query: str):
+        """Ids of documents whose title or description contains *query*, newest first."""
+        q = _fold(query)
+        if not q:
+            return None
+        if len(q) < 3:
+            candidates, exact = self._postings(self._prefixes, q), True
+        else:
+            lists = sorted((self._postings(self._grams, q[i:i + 3]) for i in range(len(q) - 2)),
+                           key=len)
+            candidates = lists[0]
+            if len(lists) > 1 and candidates:
+                keep = set(candidates)
+                for ids in lists[1:]:
+                    keep.intersection_update(ids)
+                    if not keep:
+                        break
+                candidates = sorted(keep)
+            exact = len(lists) == 1
+        if exact:
+            # A single posting list is the answer, except for documents changed since the build
+            stale = {d for d in self._changed if not self._contains(d, q, len(q) < 3)}
+            matches = [d for d in candidates if d not in stale] if stale else list(candidates)
+        else:
+            texts = self._texts
+            matches = [d for d in candidates if q in texts.get(d, "")]
+        matches.reverse()
+        return matches
+
+    def _contains(self, doc_id: int, q: str, prefix: bool) -> bool:
+        text = self._texts.get(doc_id)
+        if text is None:
+            return False
+        if prefix:
+            return any(w.startswith(q) for w in _WORD.findall(text))
+        return q in text
@@ -0,0 +1,49 @@
+from modules.autolinker import AhoCorasick, LocalAutolinker
+from modules.document_store import DocumentStore
+
+
+def _store(tmp_path):
+    store = DocumentStore(str(tmp_path / "docs.db"))
+    store.add_document("Neural Networks", "## Backpropagation\nGradient details.")
+    store.add_document("Networks", "Plain networks.")
+    store.add_document("Optimizers", "Uses **learning rate** schedules.")
+    store.add_document("AI Response", "")
+    store.add_document("AI Response", "")
+    return store
+
+
+def test_automaton_finds_overlapping_patterns():
+    matcher = AhoCorasick()
+    for word in ("he", "she", "hers"):
+        matcher.add(word, word)
+    matcher.build()
+    assert sorted(value for _, _, value in matcher.finditer("ushers")) == ["he", "hers", "she"]
+
+
+def test_suggestions_are_leftmost_longest_whole_word_and_once_per_target(tmp_path):
+    linker = LocalAutolinker(_store(tmp_path)).build()
+    body = ("Neural networks use backpropagation. Networks again, and neural networks "
+            "twice. The learning rate matters; subnetworks do not.")
+    suggestions = linker.suggest(99, body)
+    # "backpropagation" also points at doc 1, which is already linked
+    assert [(s["text"], s["target_id"]) for s in suggestions] == [
+        ("Neural networks", 1), ("Networks", 2), ("learning rate", 3)]
+    for s in suggestions:
+        assert body[s["start"]:s["end"]] == s["text"]
+
+
+def test_skips_own_title_existing_links_and_ambiguous_titles(tmp_path):
+    linker = LocalAutolinker(_store(tmp_path)).build()
+    body = "Optimizers need an AI Response. See [Networks](doc:2) and networks."
+    assert linker.suggest(3, body) == []
+
+
+def test_apply_and_link_all_write_the_links(tmp_path):
+    store = _store(tmp_path)
+    note = store.add_document("Note", "Try other optimizers first.")
+    linker = LocalAutolinker(store)
+    stats = linker.link_all([note], write=False)
+    assert stats["changed"] == 1 and store.get_document(note)["body"] == "Try other optimizers first."
+    linker.link_all([note])
+    assert store.get_document(note)["body"] == "Try other [optimizers](doc:3) first."
+    assert linker.suggest(note, store.get_document(note)["body"]) == []
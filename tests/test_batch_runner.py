@@ -0,0 +1,73 @@
+import pytest
+
+from modules.batch_runner import BatchRunner, Checkpoint, RateLimiter
+
+
+def _collect():
+    stored = []
+    return stored, lambda rows: stored.extend(rows)
+
+
+def test_resume_after_interrupt_skips_flushed_items(tmp_path):
+    path = str(tmp_path / "batch.json")
+    items = list(range(1, 11))
+
+    def interrupted(text):
+        if text == "5":
+            raise KeyboardInterrupt
+        return text.upper()
+
+    first, on_flush = _collect()
+    runner = BatchRunner(interrupted, max_workers=1, rpm=6000, checkpoint_path=path, flush_every=1)
+    with pytest.raises(KeyboardInterrupt):
+        runner.run(items, str, on_flush)
+    assert 5 not in {item_id for item_id, _ in first}
+    assert Checkpoint(path).done == {item_id for item_id, _ in first}
+
+    second, on_flush = _collect()
+    stats = BatchRunner(str.upper, max_workers=2, rpm=6000, checkpoint_path=path).run(
+        items, str, on_flush
+    )
+    assert stats["skipped"] == len(first)
+    assert sorted(i for i, _ in first + second) == items
+    assert Checkpoint(path).done == set(items)
+
+
+def test_failed_items_are_reported_and_not_checkpointed(tmp_path):
+    path = str(tmp_path / "batch.json")
+    failures = []
+
+    def work(text):
+        if int(text) % 3 == 0:
+            raise ValueError(text)
+        return text
+
+    stored, on_flush = _collect()
+    stats = BatchRunner(work, max_workers=3, rpm=6000, checkpoint_path=path).run(
+        range(1, 10), str, on_flush, on_failure=lambda i, exc: failures.append(i)
+    )
+    assert stats == {"done": 6, "failed": 3, "skipped": 0}
+    assert sorted(failures) == [3, 6, 9]
+    assert Checkpoint(path).done == {1, 2, 4, 5, 7, 8}
+
+
+def test_items_loaded_as_none_are_skipped():
+    stored, on_flush = _collect()
+    stats = BatchRunner(str.upper, rpm=6000).run(
+        [1, 2, 3], lambda i: None if i == 2 else "x", on_flush
+    )
+    assert stats["skipped"] == 1
+    assert sorted(i for i, _ in stored) == [1, 3]
+
+
+def test_pass_limiter_hands_the_limiter_to_work():
+    seen = []
+
+    def work(text, limiter):
+        seen.append(limiter)
+        return text
+
+    runner = BatchRunner(work, rpm=6000, pass_limiter=True)
+    runner.run([1, 2], str, lambda rows: None)
+    assert seen == [runner.limiter, runner.limiter]
+    assert isinstance(runner.limiter, RateLimiter)
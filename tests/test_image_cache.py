@@ -0,0 +1,57 @@
+import os
+import threading
+
+from modules import image_generator
+from modules.ai_backends import FakeBackend
+from modules.image_cache import ImageCache
+
+
+def test_put_get_and_variant_keys(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=10_000)
+    single = ImageCache.make_key("m", "a  cat", "256x256")
+    assert single == ImageCache.make_key("m", "a cat", "256x256")
+    assert single != ImageCache.make_key("m", "a cat", "256x256", variant=1)
+    assert cache.get(single) is None
+    cache.put(single, "m", "a cat", "256x256", b"png")
+    assert cache.get(single) == b"png"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_images_are_evicted(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=250)
+    for name in "abc":
+        cache.put(name, "m", name, "s", b"x" * 100)
+        cache.get("a")   # keep "a" fresh
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.stats()["bytes"] <= 250
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+
+
+def test_coalesced_callers_write_the_cache_once(tmp_path):
+    cache = ImageCache(str(tmp_path))
+    backend = FakeBackend(latency=0.2, jitter=0.0)
+    puts, put = [], cache.put
+    cache.put = lambda *args: (puts.append(args[0]), put(*args))
+    before = image_generator.inflight.stats()
+    results, errors = [], []
+
+    def draw():
+        try:
+            results.append(image_generator.image_bytes("same prompt", "256x256", backend, cache))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=draw) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    after = image_generator.inflight.stats()
+    assert errors == []
+    assert len(set(results)) == 1 and len(results) == 8
+    assert after["upstream"] - before["upstream"] == 1
+    assert len(puts) == 1
+    # A later call is served from the cache without touching the backend
+    assert image_generator.image_bytes("same prompt", "256x256", backend, cache) == results[0]
+    assert image_generator.inflight.stats()["upstream"] == after["upstream"]
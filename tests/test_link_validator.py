@@ -0,0 +1,30 @@
+from modules.document_store import DocumentStore
+from modules.link_validator import validate_links
+
+
+def test_reports_dangling_self_and_duplicate_links(tmp_path):
+    store = DocumentStore(str(tmp_path / "docs.db"))
+    a = store.add_document("A", "")
+    b = store.add_document("B", "Back to [A](doc:1).")
+    store.update_document(a, "See [B](doc:2), [b again](doc:2), [me](doc:1) and [gone](doc:99).")
+
+    report = validate_links(store)
+
+    assert report["total"] == 5
+    assert [(r["src_id"], r["target_id"], r["label"]) for r in report["dangling"]] == [
+        (a, 99, "gone")]
+    assert [(r["src_id"], r["label"]) for r in report["self"]] == [(a, "me")]
+    assert [r["label"] for r in report["duplicate"]] == ["B", "b again"]
+    body = store.get_document(a)["body"]
+    first = report["duplicate"][0]
+    assert body[first["start"]:first["end"]] == "[B](doc:2)"
+    assert b not in [r["src_id"] for r in report["dangling"] + report["self"]]
+
+
+def test_clean_store_reports_nothing(tmp_path):
+    store = DocumentStore(str(tmp_path / "docs.db"))
+    store.add_document("Only", "No links here.")
+    report = validate_links(store)
+    assert report == {"total": 0, "dangling": [], "self": [], "duplicate": []}
+    # The temp table is dropped, so a second run starts from scratch
+    assert validate_links(store)["total"] == 0
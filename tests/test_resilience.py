@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from modules.resilience import CircuitBreaker, CircuitOpenError, ResilientCaller, RetryPolicy
+
+
+class HTTPError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.http_status = status
+        self.headers = headers or {}
+
+
+class Flaky:
+    def __init__(self, errors, result="ok"):
+        self.errors = list(errors)
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+
+def test_transient_errors_are_retried_until_success():
+    caller = ResilientCaller(RetryPolicy(max_retries=3, base_delay=0))
+    fn = Flaky([HTTPError(429), TimeoutError(), HTTPError(503)])
+    assert caller.call(fn) == "ok"
+    assert fn.calls == 4
+    assert caller.last_retries() == 3
+    assert caller.metrics()["retries"] == 3
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_permanent_errors_are_raised_at_once():
+    caller = ResilientCaller(RetryPolicy(max_retries=3, base_delay=0))
+    fn = Flaky([HTTPError(400)])
+    with pytest.raises(HTTPError):
+        caller.call(fn)
+    assert fn.calls == 1
+    assert caller.metrics()["failures"] == 1
+    assert caller.breaker.failures == 0
+
+
+def test_retries_stop_after_max_retries():
+    caller = ResilientCaller(RetryPolicy(max_retries=2, base_delay=0))
+    fn = Flaky([HTTPError(500)] * 5)
+    with pytest.raises(HTTPError):
+        caller.call(fn)
+    assert fn.calls == 3
+
+
+def test_breaker_opens_then_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    caller = ResilientCaller(RetryPolicy(max_retries=0, base_delay=0), breaker)
+    for _ in range(2):
+        with pytest.raises(HTTPError):
+            caller.call(Flaky([HTTPError(502)]))
+    assert breaker.state == CircuitBreaker.OPEN
+    fn = Flaky([])
+    with pytest.raises(CircuitOpenError):
+        caller.call(fn)
+    assert fn.calls == 0
+    assert caller.metrics()["short_circuited"] == 1
+
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()                  # the trial call
+    with pytest.raises(CircuitOpenError):  # everyone else waits for it
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.times_opened == 1
+
+
+def test_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+
+
+def test_delay_honours_retry_after_and_caps_backoff():
+    policy = RetryPolicy(base_delay=1, max_delay=5)
+    assert policy.delay(1, HTTPError(429, {"Retry-After": "3"})) == 3
+    assert policy.delay(1, HTTPError(429, {"Retry-After": "60"})) == 5
+    assert all(0 <= policy.delay(10) <= 5 for _ in range(50))
+    assert policy.is_transient(ConnectionError())
+    assert not policy.is_transient(ValueError())
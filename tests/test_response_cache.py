@@ -0,0 +1,48 @@
+import time
+
+from modules.response_cache import ResponseCache
+
+
+def _messages(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_whitespace_variants_share_a_key():
+    a = ResponseCache.make_key("m", _messages("hello   world"), 0.7)
+    b = ResponseCache.make_key("m", _messages(" hello world\n"), 0.70001)
+    assert a == b
+    assert a != ResponseCache.make_key("m", _messages("hello world"), 0.2)
+    assert a != ResponseCache.make_key("other", _messages("hello world"), 0.7)
+
+
+def test_hit_and_miss_counts_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path)
+    assert cache.get("k") is None
+    cache.put("k", "m", "reply")
+    assert cache.get("k") == "reply"
+
+    stats = ResponseCache(path).stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+    cache.clear()
+    assert ResponseCache(path).stats()["hits"] == 0
+
+
+def test_expired_entries_count_as_misses(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), ttl=0.01)
+    cache.put("k", "m", "reply")
+    time.sleep(0.02)
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"), max_bytes=10)
+    cache.put("a", "m", "aaaa")
+    cache.put("b", "m", "bbbb")
+    cache.get("a")
+    cache.put("c", "m", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa" and cache.get("c") == "cccc"
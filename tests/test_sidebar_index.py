@@ -0,0 +1,50 @@
+from modules.document_store import DocumentStore
+from modules.sidebar_index import SidebarIndex
+
+
+def _store(tmp_path, n=25):
+    store = DocumentStore(str(tmp_path / "docs.db"))
+    for i in range(1, n + 1):
+        store.add_document(f"Doc {i}", f"Body of document {i}\nsecond line")
+    return store
+
+
+def _ids(rows):
+    return [row["id"] for row in rows]
+
+
+def test_rows_page_through_the_index_newest_first(tmp_path):
+    store = _store(tmp_path)
+    index = SidebarIndex(store, page_size=4, max_pages=2)
+    assert len(index) == 25
+    assert _ids(index.rows(0, 3)) == [25, 24, 23]
+    assert _ids(index.rows(6, 5)) == [19, 18, 17, 16, 15]   # spans two pages
+    assert _ids(index.rows(23, 10)) == [2, 1]
+    assert index.rows(0, 0) == []
+    assert "\n" not in index.rows(0, 1)[0]["description"]
+    assert len(index._pages) <= 2
+
+
+def test_store_changes_are_folded_in(tmp_path):
+    store = _store(tmp_path)
+    index = SidebarIndex(store, page_size=4)
+    store.add_listener(index.apply)
+    index.rows(0, 8)
+    store.update_document(24, "Edited body")
+    assert index.rows(1, 1)[0]["description"] == "Edited body"
+    new_id = store.add_document("Newest", "")
+    store.delete_document(3)
+    assert len(index) == 25
+    assert _ids(index.rows(0, 2)) == [new_id, 25]
+    assert 3 not in _ids(index.rows(0, 30))
+
+
+def test_filter_lists_only_the_given_ids_in_order(tmp_path):
+    store = _store(tmp_path)
+    index = SidebarIndex(store, page_size=2)
+    index.set_filter([20, 7, 3, 11, 1])
+    assert len(index) == 5
+    assert _ids(index.rows(0, 5)) == [20, 7, 3, 11, 1]
+    assert _ids(index.rows(3, 5)) == [11, 1]
+    index.set_filter(None)
+    assert len(index) == 25
@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from modules.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    flight, calls = SingleFlight(), []
+    gate = threading.Event()
+
+    def slow():
+        calls.append(1)
+        gate.wait(2)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+    assert results == ["answer"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"upstream": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_errors_reach_every_caller_and_the_key_is_forgotten():
+    flight = SingleFlight()
+
+    def boom():
+        raise ValueError("nope")
+
+    with pytest.raises(ValueError):
+        flight.do("k", boom)
+    assert flight.do("k", lambda: 42) == 42
+
+
+def _counting_stream(calls, n=3):
+    def stream():
+        calls.append(1)
+        for i in range(n):
+            yield f"{len(calls)}-{i}"
+    return stream
+
+
+def test_a_late_reader_replays_the_shared_stream():
+    flight, calls = SingleFlight(), []
+    first = flight.stream("k", _counting_stream(calls))
+    assert next(first) == "1-0"
+    second = flight.stream("k", _counting_stream(calls))
+    assert list(second) == ["1-0", "1-1", "1-2"]
+    assert list(first) == ["1-1", "1-2"]
+    assert len(calls) == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_a_stream_abandoned_by_every_reader_is_not_replayed():
+    flight, calls = SingleFlight(), []
+    reader = flight.stream("k", _counting_stream(calls))
+    assert next(reader) == "1-0"
+    reader.close()
+    assert flight.stats()["in_flight"] == 0
+    assert list(flight.stream("k", _counting_stream(calls))) == ["2-0", "2-1", "2-2"]
+
+
+def test_a_stream_keeps_going_while_one_reader_remains():
+    flight, calls = SingleFlight(), []
+    first = flight.stream("k", _counting_stream(calls))
+    second = flight.stream("k", _counting_stream(calls))
+    assert next(first) == "1-0"
+    first.close()
+    assert list(second) == ["1-0", "1-1", "1-2"]
+    assert len(calls) == 1
@@ -0,0 +1,93 @@
+import threading
+
+from modules.batch_runner import estimate_tokens
+from modules.summarizer import (
+    DIRECT_PROMPT, ChunkSummaryCache, MapReduceSummarizer, chunk_text, extractive_summary,
+    split_sentences,
+)
+
+
+class FakeAI:
+    model = "fake-model"
+
+    def __init__(self):
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def query(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+        return f"summary {len(self.prompts)}"
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.calls = 0
+        self.tokens = 0
+
+    def acquire(self, tokens):
+        self.calls += 1
+        self.tokens += tokens
+
+
+def _document(n=60):
+    return "\n\n".join(
+        f"Paragraph {i} talks about topic {i} at some length, " * 3 for i in range(n)
+    )
+
+
+def _summarizer(tmp_path, ai):
+    cache = ChunkSummaryCache(str(tmp_path / "cache.db"))
+    return MapReduceSummarizer(ai, max_chunk_tokens=200, cache=cache)
+
+
+def test_chunks_respect_the_token_bound_and_keep_the_text():
+    body = _document() + "\n\n" + "word " * 2000
+    chunks = chunk_text(body, 200)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(c) <= 200 for c in chunks)
+    assert " ".join(" ".join(chunks).split()) == " ".join(body.split())
+
+
+def test_short_body_is_summarized_in_one_call(tmp_path):
+    ai = FakeAI()
+    assert _summarizer(tmp_path, ai).summarize("A short note.") == "summary 1"
+    assert ai.prompts == [DIRECT_PROMPT + "A short note."]
+
+
+def test_edit_resummarizes_only_changed_chunks(tmp_path):
+    body = _document()
+    first = _summarizer(tmp_path, FakeAI())
+    first.summarize(body)
+    map_calls = len(chunk_text(body, 200))
+    assert first.api_calls > map_calls
+
+    edited = body.replace("Paragraph 2 talks", "Paragraph two talks", 1)
+    ai = FakeAI()
+    again = _summarizer(tmp_path, ai)        # new instance, same cache file
+    again.summarize(edited)
+    changed = set(chunk_text(edited, 200)) - set(chunk_text(body, 200))
+    assert len(changed) < map_calls
+    map_prompts = [p for p in ai.prompts if p.startswith("Summarize this section")]
+    assert len(map_prompts) == len(changed)
+
+
+def test_limiter_is_charged_for_every_api_call(tmp_path):
+    ai = FakeAI()
+    limiter = CountingLimiter()
+    summarizer = _summarizer(tmp_path, ai)
+    summarizer.summarize(_document(), limiter=limiter)
+    assert limiter.calls == summarizer.api_calls == len(ai.prompts)
+    assert limiter.tokens == sum(estimate_tokens(p) for p in ai.prompts)
+
+
+def test_extractive_summary_picks_sentences_from_the_body():
+    body = ("Solar panels convert sunlight into electricity for homes. "
+            "Wind turbines convert moving air into electricity as well. "
+            "Both solar panels and wind turbines produce clean electricity. "
+            "My cat enjoys sleeping on the warm windowsill all afternoon.")
+    summary = extractive_summary(body, max_sentences=2)
+    picked = [s for s in split_sentences(body) if s in summary]
+    assert len(picked) == 2
+    assert summary == " ".join(picked)                 # document order
+    assert "cat" not in summary
@@ -0,0 +1,73 @@
+import random
+import re
+
+from modules.title_index import TitleIndex
+
+WORDS = ["apple", "apricot", "banana", "band", "cherry", "chart", "delta", "deltoid", "echo", "ember"]
+
+
+def _row(doc_id, rng):
+    return {"id": doc_id,
+            "title": " ".join(rng.choices(WORDS, k=2)).title(),
+            "description": " ".join(rng.choices(WORDS, k=4))}
+
+
+def _brute(docs, query):
+    """Reference answer: substring match, or word-prefix match for 1-2 characters."""
+    q = " ".join(query.lower().split())
+    hits = []
+    for doc_id, row in docs.items():
+        text = " ".join(f"{row['title']} {row['description']}".lower().split())
+        if len(q) < 3:
+            found = any(word.startswith(q) for word in re.findall(r"\w+", text))
+        else:
+            found = q in text
+        if found:
+            hits.append(doc_id)
+    return sorted(hits, reverse=True)
+
+
+QUERIES = ["a", "ap", "ch", "del", "delta", "ban", "nd ch", "Cherry Apple", "xyz", "e"]
+
+
+def test_search_matches_brute_force_after_updates_and_deletes():
+    rng = random.Random(7)
+    docs = {i: _row(i, rng) for i in range(1, 301)}
+    index = TitleIndex().build(list(docs.values()))
+    for q in QUERIES:
+        assert index.search(q) == _brute(docs, q), q
+
+    for step in range(200):
+        kind = rng.choice(["insert", "update", "delete"])
+        if kind == "insert":
+            row = _row(max(docs) + 1, rng)
+            docs[row["id"]] = row
+            index.apply("insert", rows=[row])
+        elif kind == "update":
+            row = _row(rng.choice(list(docs)), rng)
+            docs[row["id"]] = row
+            index.apply("update", rows=[row])
+        else:
+            doc_id = rng.choice(list(docs))
+            del docs[doc_id]
+            index.apply("delete", doc_ids=[doc_id])
+        if step % 20 == 0:
+            for q in QUERIES:
+                assert index.search(q) == _brute(docs, q), (step, q)
+    for q in QUERIES:
+        assert index.search(q) == _brute(docs, q), q
+    assert len(index) == len(docs)
+
+
+def test_reindexing_an_older_document_keeps_results_unique_and_ordered():
+    index = TitleIndex().build([{"id": i, "title": f"note {i}", "description": ""}
+                                for i in range(1, 6)])
+    index.apply("update", rows=[{"id": 2, "title": "note again", "description": ""}])
+    assert index.search("note") == [5, 4, 3, 2, 1]
+    assert index.search("again") == [2]
+    assert index.search("no") == [5, 4, 3, 2, 1]
+
+
+def test_empty_query_means_no_filter():
+    index = TitleIndex().build([{"id": 1, "title": "x", "description": None}])
+    assert index.search("   ") is None